@@ -0,0 +1,489 @@
+"""FIFO chick allocation engine.
+
+This module has no Streamlit dependency so it can be unit tested and reused
+outside the app. Remaining stock per date is kept in a max segment tree over
+date ordinals, so "first date >= earliest_allowed with stock >= qty" is an
+O(log d) query instead of a scan over every date for every order. The
+optional split mode (`allocate_split()`) keeps stock in a Fenwick tree
+instead, so window sums and consumption are O(log d) as well.
+"""
+import bisect
+import datetime
+from collections import defaultdict
+
+from records import HatchRecord, Order, normalise_list
+
+HATCH_RATE = 0.85
+INCUBATION = datetime.timedelta(weeks=3)
+
+
+def build_availability(chicks_inventory, hatchery, egg_inventory, today, models=None):
+    """Return {date: chicks} expected to be available from `today` onwards.
+
+    Combines the current chicks inventory (available today), scheduled
+    hatchery entries and incubating eggs (incubation_date + 3 weeks, 85%
+    hatch rate, unless `models` (see hatch_models.py) gives the batch's own).
+    """
+    availability = defaultdict(int)
+    # current immediate inventory
+    try:
+        availability[today] += int(chicks_inventory or 0)
+    except Exception:
+        availability[today] += 0
+
+    # hatchery scheduled hatches (records are validated at ingest; dicts are coerced once here)
+    for h in hatchery:
+        if h.__class__ is not HatchRecord:
+            try:
+                h = HatchRecord.coerce(h)
+            except Exception:
+                continue
+        d = h.date
+        if d is not None and d >= today:
+            availability[d] += h.chicks
+
+    # eggs in incubator forecast
+    for incubation_date, egg_count in egg_inventory.items():
+        if models is not None:
+            model = models.model_for(incubation_date)
+            try:
+                hatch_day = model.hatch_day(incubation_date)
+            except Exception:
+                continue
+            if hatch_day >= today:
+                availability[hatch_day] += model.chicks(egg_count)
+            continue
+        try:
+            hatch_day = incubation_date + INCUBATION
+        except Exception:
+            # skip invalid keys
+            continue
+        if hatch_day >= today:
+            availability[hatch_day] += int(egg_count * HATCH_RATE)
+
+    return availability
+
+
+class MaxSegmentTree:
+    """Fixed-size max segment tree over non-negative integer values."""
+
+    def __init__(self, values):
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        tree = [0] * (2 * size)
+        tree[size:size + self.n] = values
+        for i in range(size - 1, 0, -1):
+            left, right = tree[2 * i], tree[2 * i + 1]
+            tree[i] = left if left >= right else right
+        self.tree = tree
+
+    def get(self, idx):
+        return self.tree[idx + self.size]
+
+    def add(self, idx, delta):
+        tree = self.tree
+        i = idx + self.size
+        tree[i] += delta
+        i >>= 1
+        while i:
+            left, right = tree[2 * i], tree[2 * i + 1]
+            tree[i] = left if left >= right else right
+            i >>= 1
+
+    def find_first(self, lo, qty):
+        """Return the first index >= `lo` whose value is >= `qty`, or -1.
+
+        `qty` must be positive so that padding leaves never match.
+        """
+        if lo < 0:
+            lo = 0
+        if lo >= self.n:
+            return -1
+        tree = self.tree
+        size = self.size
+        i = lo + size
+        while True:
+            if tree[i] >= qty:
+                # descend to the leftmost matching leaf of this subtree
+                while i < size:
+                    i = 2 * i if tree[2 * i] >= qty else 2 * i + 1
+                return i - size
+            # climb while we are a right child, then step to the right sibling
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return -1
+            i += 1
+
+
+class StockIndex:
+    """Remaining stock per date, indexed by ordinal offset from `start`.
+
+    `headroom` extra days past the last available date are reserved so that
+    later arrivals can be added without rebuilding the index.
+    """
+
+    def __init__(self, availability, start, headroom=0):
+        self.start = start.toordinal()
+        end = max((d.toordinal() for d in availability), default=self.start)
+        values = [0] * (end - self.start + 1 + headroom)
+        for d, qty in availability.items():
+            offset = d.toordinal() - self.start
+            if offset >= 0:
+                values[offset] += qty
+        self.tree = MaxSegmentTree(values)
+
+    def offset(self, d):
+        """Leaf index for date `d`, or -1 if it falls outside the index."""
+        idx = d.toordinal() - self.start
+        return idx if 0 <= idx < self.tree.n else -1
+
+    def take_first(self, earliest, qty):
+        """Consume `qty` from the first date >= `earliest` that can cover it.
+
+        Returns the date used, or None when no single date has enough stock.
+        """
+        idx = self.tree.find_first(earliest.toordinal() - self.start, qty)
+        if idx < 0:
+            return None
+        self.tree.add(idx, -qty)
+        return datetime.date.fromordinal(self.start + idx)
+
+
+def fifo_key(order):
+    return order.order_date or datetime.date.min
+
+
+def allocate_fifo(orders, availability, today):
+    """Assign pickup dates to `orders` in FIFO (order date) order.
+
+    Each order must be fully satisfied from a single date (no split). Orders
+    already picked up keep their pickup info. Pickup dates are written onto
+    the orders in place; the FIFO-sorted list is returned. Entries of `orders`
+    that are not yet `Order` records are replaced by validated records.
+    """
+    all_orders = sorted(normalise_list(orders, Order), key=fifo_key)
+    stock = StockIndex(availability, today)
+    for order in all_orders:
+        # do not change pickup info for already collected orders
+        if order.picked_up:
+            continue
+        order_qty = order.order_count
+        order.pickup_date = None
+        if order_qty <= 0:
+            continue
+        # earliest allowable pickup is max(order_date, today)
+        od = order.order_date or today
+        order.pickup_date = stock.take_first(max(today, od), order_qty)
+    return all_orders
+
+
+class FenwickTree:
+    """Prefix sums over non-negative integer values with O(log n) updates."""
+
+    def __init__(self, values):
+        self.n = len(values)
+        self.values = list(values)
+        tree = [0] + self.values
+        for i in range(1, self.n + 1):
+            j = i + (i & -i)
+            if j <= self.n:
+                tree[j] += tree[i]
+        self.tree = tree
+        self.total = sum(self.values)
+        top = 1
+        while top * 2 <= self.n:
+            top *= 2
+        self._top = top
+
+    def add(self, idx, delta):
+        self.values[idx] += delta
+        self.total += delta
+        tree = self.tree
+        i = idx + 1
+        while i <= self.n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, idx):
+        """Sum of the values before index `idx`."""
+        tree = self.tree
+        s = 0
+        i = idx
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def range_sum(self, lo, hi):
+        """Sum of the values at indexes `lo`..`hi - 1`."""
+        return self.prefix(hi) - self.prefix(lo)
+
+    def search(self, target):
+        """Smallest index whose prefix sum including it reaches `target` (> 0), or n."""
+        tree = self.tree
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and tree[nxt] < target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
+
+
+def _split_window(stock, lo, qty, window):
+    """`(start, end)` index range to fill `qty` from, or None.
+
+    `end` is the earliest date by which `qty` can be gathered from dates
+    >= `lo`; with a `window` every part must also lie within `window`
+    consecutive days, so later ends are tried until one window holds enough.
+    """
+    before = stock.prefix(lo)
+    if stock.total - before < qty:
+        return None
+    end = stock.search(before + qty)
+    if not window:
+        return lo, end
+    while end < stock.n:
+        start = max(lo, end - window + 1)
+        covered = stock.range_sum(start, end + 1)
+        if covered >= qty:
+            return start, end
+        # a window ending on an empty day holds less than one ending on the last
+        # stocked day before it, so the next candidate end is the next stocked day
+        end = stock.search(stock.prefix(end + 1) + 1)
+    return None
+
+
+def _records(orders, assign):
+    """`orders` as records: validated in place when assigning, else as copies."""
+    if assign:
+        return normalise_list(orders, Order)
+    return [o if o.__class__ is Order else Order.coerce(o) for o in orders]
+
+
+def plan_fifo(orders, availability, today):
+    """`allocate_fifo()` without side effects: `[(order, pickup_date)]` in FIFO order.
+
+    `orders` and its records are left untouched (collected orders keep their
+    recorded pickup date), so forecasts can be run on hypothetical data.
+    """
+    stock = StockIndex(availability, today)
+    plan = []
+    for order in sorted(_records(orders, False), key=fifo_key):
+        if order.picked_up or order.order_count <= 0:
+            plan.append((order, order.pickup_date if order.picked_up else None))
+            continue
+        od = order.order_date or today
+        plan.append((order, stock.take_first(max(today, od), order.order_count)))
+    return plan
+
+
+def allocate_split(orders, availability, today, window_days=None, assign=True):
+    """FIFO allocation that may fill an order from several dates.
+
+    Open orders take the earliest stock from max(order date, today) onwards,
+    split over as many dates as needed, as long as all parts fall within
+    `window_days` consecutive days (any span when None). An order that
+    cannot be filled completely gets no parts. Each order's `pickup_date` is
+    set to its last part's date unless `assign` is false, which leaves the
+    orders untouched. Returns the FIFO-sorted orders and
+    `{id(order): [(date, qty), ...]}` for the open orders.
+    """
+    all_orders = sorted(_records(orders, assign), key=fifo_key)
+    start = today.toordinal()
+    end = max((d.toordinal() for d in availability), default=start)
+    values = [0] * (end - start + 1)
+    for d, qty in availability.items():
+        offset = d.toordinal() - start
+        if offset >= 0 and qty > 0:
+            values[offset] += qty
+    stock = FenwickTree(values)
+    parts = {}
+    # stock only shrinks during the pass, so an order that found no window from
+    # `lo` rules out larger orders from `lo` or later: keep the minimal (qty, lo) failures
+    failures = []
+    for order in all_orders:
+        if order.picked_up:
+            continue
+        order_parts = parts[id(order)] = []
+        if assign:
+            order.pickup_date = None
+        qty = order.order_count
+        if qty <= 0:
+            continue
+        od = order.order_date or today
+        lo = max(today, od).toordinal() - start
+        if lo >= stock.n:
+            continue
+        if any(q <= qty and l <= lo for q, l in failures):
+            continue
+        span = _split_window(stock, lo, qty, window_days)
+        if span is None:
+            failures = [(q, l) for q, l in failures if not (qty <= q and lo <= l)]
+            failures.append((qty, lo))
+            continue
+        idx = span[0]
+        remaining = qty
+        while remaining:
+            # next stocked day at or after idx
+            idx = stock.search(stock.prefix(idx) + 1)
+            take = min(stock.values[idx], remaining)
+            stock.add(idx, -take)
+            remaining -= take
+            order_parts.append((datetime.date.fromordinal(start + idx), take))
+            idx += 1
+        if assign:
+            order.pickup_date = order_parts[-1][0]
+    return all_orders, parts
+
+
+class IncrementalAllocator:
+    """FIFO allocator that keeps its state between Streamlit reruns.
+
+    `refresh()` detects what changed since the previous call and re-allocates
+    only the suffix of FIFO positions that can be affected:
+
+    - orders appended to the source list are inserted at their FIFO position;
+    - availability changes on a date `d` dirty the first order that was
+      unfilled or allocated on or after `d` (earlier orders cannot see the
+      change);
+    - orders changed in place (e.g. marked as collected) must be reported via
+      `mark_order_changed()`.
+
+    Anything else (a new day, a replaced order list, removed orders or a date
+    outside the stock index) falls back to a full recomputation.
+    """
+
+    HEADROOM_DAYS = 60
+
+    def __init__(self):
+        self.today = None
+        self.source = None
+        self.seen = 0
+        self.fifo = []
+        self.keys = []
+        # per FIFO position: stock index consumed (-1 unfilled, None not allocating) and quantity
+        self.slots = []
+        self.qtys = []
+        self.availability = {}
+        self.stock = None
+        self.dirty = None
+        self.full = True
+        # bumped whenever pickup dates may have changed (for caches keyed on it)
+        self.generation = 0
+
+    def invalidate(self):
+        self.full = True
+
+    def mark_order_changed(self, order):
+        """Flag an order whose pickup-relevant fields were changed in place."""
+        self._mark(bisect.bisect_left(self.keys, fifo_key(Order.coerce(order))))
+
+    def _mark(self, pos):
+        if self.dirty is None or pos < self.dirty:
+            self.dirty = pos
+
+    def refresh(self, orders, availability, today):
+        """Bring pickup dates up to date and return orders in FIFO order."""
+        if self.full or today != self.today or orders is not self.source or len(orders) < self.seen:
+            self._rebuild(orders, availability, today)
+            return list(self.fifo)
+
+        # newly appended orders: stable FIFO puts them after equal keys
+        for i in range(self.seen, len(orders)):
+            order = orders[i]
+            if order.__class__ is not Order:
+                order = orders[i] = Order.coerce(order)
+            key = fifo_key(order)
+            pos = bisect.bisect_right(self.keys, key)
+            self.fifo.insert(pos, order)
+            self.keys.insert(pos, key)
+            self.slots.insert(pos, None)
+            self.qtys.insert(pos, 0)
+            self._mark(pos)
+        self.seen = len(orders)
+
+        if not self._apply_availability(availability):
+            self._rebuild(orders, availability, today)
+            return list(self.fifo)
+
+        if self.dirty is not None:
+            self._undo_from(self.dirty)
+            self._allocate_from(self.dirty)
+            self.generation += 1
+        self.dirty = None
+        return list(self.fifo)
+
+    def _rebuild(self, orders, availability, today):
+        self.today = today
+        self.source = orders
+        self.seen = len(orders)
+        self.fifo = sorted(normalise_list(orders, Order), key=fifo_key)
+        self.keys = [fifo_key(o) for o in self.fifo]
+        self.slots = [None] * len(self.fifo)
+        self.qtys = [0] * len(self.fifo)
+        self.availability = dict(availability)
+        self.stock = StockIndex(self.availability, today, self.HEADROOM_DAYS)
+        self._allocate_from(0)
+        self.dirty = None
+        self.full = False
+        self.generation += 1
+
+    def _apply_availability(self, availability):
+        """Push availability deltas into the stock index. False if a rebuild is needed."""
+        old = self.availability
+        changed = [d for d in set(old) | set(availability) if old.get(d, 0) != availability.get(d, 0)]
+        if not changed:
+            return True
+        stock = self.stock
+        offsets = [stock.offset(d) for d in changed]
+        if min(offsets) < 0:
+            return False
+        for d, idx in zip(changed, offsets):
+            stock.tree.add(idx, availability.get(d, 0) - old.get(d, 0))
+        self.availability = dict(availability)
+        first = min(offsets)
+        for pos, slot in enumerate(self.slots):
+            if slot is not None and (slot < 0 or slot >= first):
+                self._mark(pos)
+                break
+        return True
+
+    def _undo_from(self, start):
+        tree = self.stock.tree
+        for i in range(start, len(self.fifo)):
+            slot = self.slots[i]
+            if slot is not None and slot >= 0:
+                tree.add(slot, self.qtys[i])
+
+    def _allocate_from(self, start):
+        today = self.today
+        stock = self.stock
+        tree = stock.tree
+        fifo, slots, qtys = self.fifo, self.slots, self.qtys
+        for i in range(start, len(fifo)):
+            order = fifo[i]
+            slots[i] = None
+            qtys[i] = 0
+            # do not change pickup info for already collected orders
+            if order.picked_up:
+                continue
+            order_qty = order.order_count
+            order.pickup_date = None
+            if order_qty <= 0:
+                continue
+            od = order.order_date or today
+            idx = tree.find_first(max(today, od).toordinal() - stock.start, order_qty)
+            qtys[i] = order_qty
+            if idx < 0:
+                slots[i] = -1
+                continue
+            tree.add(idx, -order_qty)
+            slots[i] = idx
+            order.pickup_date = datetime.date.fromordinal(stock.start + idx)
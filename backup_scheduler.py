@@ -0,0 +1,148 @@
+"""Background backup scheduler.
+
+Backups run on one daemon thread fed by a job queue, so neither page loads
+nor the Save button wait for serialisation, compression or disk I/O. A
+request that arrives while another is still queued is merged into it. The
+thread also wakes up periodically and starts a backup by itself when
+automatic backups are enabled and the newest one is older than the
+configured interval.
+"""
+import datetime
+import queue
+import threading
+import time
+
+CHECK_INTERVAL = 60.0
+
+
+class BackupScheduler:
+    """Runs `run_backup()` off the render path and records how it went.
+
+    `run_backup()` writes one backup and returns its path, raising on
+    failure. `backup_age_days()` returns the newest backup's age in days, or
+    None when there is none.
+    """
+
+    def __init__(self, run_backup, backup_age_days, check_interval=CHECK_INTERVAL):
+        self._run_backup = run_backup
+        self._backup_age_days = backup_age_days
+        self.check_interval = check_interval
+        self.enabled = False
+        self.interval_days = 1
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = False
+        self._running = False
+        self._stopped = False
+        self._thread = None
+        self.runs = 0
+        self.failures = 0
+        self.merged = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_path = None
+        self.last_reason = None
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='backup-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped = True
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def configure(self, enabled, interval_days):
+        """Set the automatic backup policy; a newly due backup starts promptly."""
+        self.enabled = bool(enabled)
+        self.interval_days = float(interval_days)
+        if self.enabled:
+            # wake the thread so it re-checks the age against the new interval
+            self._queue.put(None)
+
+    def request(self, reason='manual'):
+        """Queue a backup. Returns False when merged into one already queued."""
+        with self._lock:
+            if self._pending:
+                self.merged += 1
+                return False
+            self._pending = True
+        self._queue.put(reason)
+        return True
+
+    def wait_idle(self, timeout=None):
+        """Block until no backup is queued or running. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending and not self._running, timeout)
+
+    def status(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'interval_days': self.interval_days,
+                'pending': self._pending,
+                'running': self._running,
+                'runs': self.runs,
+                'failures': self.failures,
+                'merged': self.merged,
+                'last_run': self.last_run,
+                'last_duration': self.last_duration,
+                'last_path': self.last_path,
+                'last_reason': self.last_reason,
+                'last_error': self.last_error,
+            }
+
+    def _due(self):
+        if not self.enabled:
+            return False
+        try:
+            age = self._backup_age_days()
+        except Exception:
+            return False
+        return age is None or age >= self.interval_days
+
+    def _loop(self):
+        while not self._stopped:
+            try:
+                reason = self._queue.get(timeout=self.check_interval)
+            except queue.Empty:
+                reason = None
+            if self._stopped:
+                break
+            with self._lock:
+                if reason is None:
+                    # periodic check; a queued request will cover it if there is one
+                    if self._pending or not self._due():
+                        continue
+                    reason = 'interval'
+                else:
+                    self._pending = False
+                self._running = True
+            self._run(reason)
+
+    def _run(self, reason):
+        started = time.monotonic()
+        path = error = None
+        try:
+            path = self._run_backup()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        with self._lock:
+            self._running = False
+            self.runs += 1
+            self.last_run = datetime.datetime.now()
+            self.last_duration = time.monotonic() - started
+            self.last_reason = reason
+            if error is None:
+                self.last_path = path
+                self.last_error = None
+            else:
+                self.failures += 1
+                self.last_error = error
+            self._idle.notify_all()
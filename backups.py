@@ -0,0 +1,423 @@
+"""Deduplicated incremental backups.
+
+Each table is cut into fixed-size row partitions. A partition is serialised
+as CSV, named by the SHA-256 of its content and stored gzip-compressed under
+`chunks/` only if no backup has stored it before. A backup is a small
+manifest listing the chunks it references, so unchanged history costs no
+extra disk and no compression, and many more restore points fit in the same
+space. Each directory also remembers the field values of the partitions it
+stored last, so a partition whose records are unchanged reuses its digest
+without being formatted, serialised or hashed again. Chunks no manifest refers to are removed
+by `collect_garbage()`,
+which holds the same per-directory lock as `create_backup()` so it never
+sees chunks a backup has stored but not yet listed in its manifest.
+
+`BackupCatalog` keeps an index of backup and trash files next to the
+backups directory, so listing them and checking the newest backup's age do
+not have to scan the directory on every rerun.
+"""
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import operator
+import os
+import shutil
+import threading
+
+import exporter
+from records import Record
+
+MANIFEST_SUFFIX = '.manifest.json'
+BACKUP_SUFFIXES = ('.zip', MANIFEST_SUFFIX)
+CHUNK_ROWS = 2000
+FORMAT_VERSION = 1
+
+# member -> header; the CSV layout matches the ZIP export
+MEMBERS = {member: header for member, (header, _key) in exporter.CSV_MEMBERS.items()}
+MEMBERS['processed_hatch_dates.csv'] = ['incubation_date']
+
+
+def is_backup_file(name):
+    return name.endswith(BACKUP_SUFFIXES)
+
+
+def _member_items(state, member):
+    """The state items behind one member's rows, in row order."""
+    if member == 'egg_inventory.csv':
+        return list(state['egg_inventory'].items())
+    if member == 'processed_hatch_dates.csv':
+        return list(state['processed_hatch_dates'])
+    return state[exporter.CSV_MEMBERS[member][1]]
+
+
+def _item_rows(member, items):
+    """CSV rows for a slice of `_member_items()`."""
+    if member == 'processed_hatch_dates.csv':
+        return [[d] for d in items]
+    key = exporter.CSV_MEMBERS[member][1]
+    return list(exporter.iter_rows({key: dict(items) if key == 'egg_inventory' else items}, member))
+
+
+def _fingerprint(items):
+    """Comparable field values of a partition's items, without formatting them as rows.
+
+    None when the items aren't all records of one class or plain values, in
+    which case the partition is always serialised.
+    """
+    cls = type(items[0])
+    if issubclass(cls, Record):
+        if not all(type(item) is cls for item in items):
+            return None
+        return tuple(map(operator.attrgetter(*cls.fields), items))
+    if cls in (tuple, str):
+        return tuple(items)
+    return None
+
+
+class ChunkStore:
+    """Content-addressed, gzip-compressed CSV chunks."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + '.csv.gz')
+
+    def put(self, data):
+        """Store `data` unless present. Returns `(digest, bytes_written)`."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6))
+        os.replace(tmp, path)
+        return digest, os.path.getsize(path)
+
+    def open_text(self, digest):
+        return io.TextIOWrapper(gzip.open(self.path(digest), 'rb'), encoding='utf-8', newline='')
+
+    def digests(self):
+        found = set()
+        if not os.path.isdir(self.root):
+            return found
+        for sub in os.scandir(self.root):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith('.csv.gz'):
+                        found.add(entry.name[:-len('.csv.gz')])
+        return found
+
+    def remove(self, digest):
+        path = self.path(digest)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # directory still holds other chunks
+            pass
+
+
+def chunk_store(backup_dir):
+    return ChunkStore(os.path.join(backup_dir, 'chunks'))
+
+
+_dir_locks = {}
+# (backup directory, chunk_rows) -> {(member, partition index): (fingerprint, digest)} of its last backup
+_last_partitions = {}
+_dir_locks_guard = threading.Lock()
+
+
+def _dir_lock(backup_dir):
+    """Lock serialising backups and garbage collection in one directory."""
+    key = os.path.realpath(backup_dir)
+    with _dir_locks_guard:
+        return _dir_locks.setdefault(key, threading.Lock())
+
+
+def create_backup(state, backup_dir, chunk_rows=CHUNK_ROWS, now=None):
+    """Write an incremental backup of `state`. Returns `(manifest_path, stats)`.
+
+    `stats` has the number of referenced chunks, how many were new and the
+    compressed bytes written for them.
+    """
+    with _dir_lock(backup_dir):
+        return _create_backup(state, backup_dir, chunk_rows, now)
+
+
+def _create_backup(state, backup_dir, chunk_rows, now):
+    now = now or datetime.datetime.now()
+    chunks = chunk_store(backup_dir)
+    stats = {'chunks': 0, 'unchanged_chunks': 0, 'new_chunks': 0, 'bytes_written': 0}
+    cache_key = (os.path.realpath(backup_dir), chunk_rows)
+    last = _last_partitions.get(cache_key, {})
+    current = {}
+    tables = {}
+    for member in MEMBERS:
+        refs = []
+        items = _member_items(state, member)
+        for i, start in enumerate(range(0, len(items), chunk_rows)):
+            part = items[start:start + chunk_rows]
+            fingerprint = _fingerprint(part)
+            previous = last.get((member, i))
+            if (fingerprint is not None and previous is not None and previous[0] == fingerprint
+                    and os.path.exists(chunks.path(previous[1]))):
+                digest = previous[1]
+                stats['unchanged_chunks'] += 1
+            else:
+                buf = io.StringIO()
+                csv.writer(buf).writerows(_item_rows(member, part))
+                digest, written = chunks.put(buf.getvalue().encode('utf-8'))
+                if written:
+                    stats['new_chunks'] += 1
+                    stats['bytes_written'] += written
+            if fingerprint is not None:
+                current[(member, i)] = (fingerprint, digest)
+            refs.append({'hash': digest, 'rows': len(part)})
+            stats['chunks'] += 1
+        tables[member] = refs
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': now.isoformat(timespec='seconds'),
+        'meta': {
+            'chicks_inventory': state['chicks_inventory'],
+            'exported_at': str(now.date()),
+        },
+        'tables': tables,
+    }
+    os.makedirs(backup_dir, exist_ok=True)
+    data = json.dumps(manifest, separators=(',', ':')).encode('utf-8')
+    stamp = now.strftime('%Y%m%d_%H%M%S_%f')
+    for n in itertools.count():
+        suffix = f"_{n}" if n else ""
+        path = os.path.join(backup_dir, f"farm_backup_{stamp}{suffix}{MANIFEST_SUFFIX}")
+        try:
+            # never replace another backup's manifest, even one written in the same instant
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            continue
+        break
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        os.remove(path)
+        raise
+    _last_partitions[cache_key] = current
+    return path, stats
+
+
+def read_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_member_rows(manifest, chunks, member):
+    """Yield CSV rows of `member`, streaming one chunk at a time."""
+    for ref in manifest['tables'].get(member, []):
+        with chunks.open_text(ref['hash']) as text:
+            yield from csv.reader(text)
+
+
+def collect_garbage(backup_dir):
+    """Delete chunks not referenced by any manifest (including trashed ones).
+
+    Returns the number of chunks removed.
+    """
+    with _dir_lock(backup_dir):
+        return _collect_garbage(backup_dir)
+
+
+def _collect_garbage(backup_dir):
+    referenced = set()
+    for d in (backup_dir, os.path.join(backup_dir, 'trash')):
+        if not os.path.isdir(d):
+            continue
+        for entry in os.scandir(d):
+            if entry.name.endswith(MANIFEST_SUFFIX):
+                for refs in read_manifest(entry.path)['tables'].values():
+                    referenced.update(ref['hash'] for ref in refs)
+    chunks = chunk_store(backup_dir)
+    removed = 0
+    for digest in chunks.digests() - referenced:
+        chunks.remove(digest)
+        removed += 1
+    return removed
+
+
+class BackupCatalog:
+    """Index of the files in a backups directory and its `trash/`.
+
+    The index is saved as JSON beside the directory (not inside it, so
+    writing it does not touch the directory's mtime) together with the
+    directory mtimes it was built against. It is rebuilt with one
+    `os.scandir` per directory only when the file is missing or a recorded
+    mtime no longer matches, i.e. something changed the directory behind
+    the catalog's back. Changes made through the catalog's own methods
+    update the index in place.
+    """
+
+    SECTIONS = ('backups', 'trash')
+
+    def __init__(self, backup_dir, index_path=None):
+        self.backup_dir = backup_dir
+        self.index_path = index_path or backup_dir.rstrip(os.sep) + '.catalog.json'
+        self._lock = threading.RLock()
+        self._entries = None
+        self._mtimes = None
+
+    def section_dir(self, section):
+        if section == 'backups':
+            return self.backup_dir
+        if section == 'trash':
+            return os.path.join(self.backup_dir, 'trash')
+        raise KeyError(section)
+
+    def _dir_mtimes(self):
+        mtimes = {}
+        for section in self.SECTIONS:
+            try:
+                mtimes[section] = os.stat(self.section_dir(section)).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[section] = None
+        return mtimes
+
+    def _scan(self, section):
+        files = {}
+        d = self.section_dir(section)
+        if not os.path.isdir(d):
+            return files
+        for entry in os.scandir(d):
+            if entry.is_file() and is_backup_file(entry.name):
+                st = entry.stat()
+                files[entry.name] = [st.st_size, st.st_mtime]
+        return files
+
+    def rebuild(self):
+        with self._lock:
+            mtimes = self._dir_mtimes()
+            self._entries = {section: self._scan(section) for section in self.SECTIONS}
+            self._mtimes = mtimes
+            self._save()
+
+    def _save(self):
+        if not os.path.isdir(self.backup_dir):
+            # nothing to index yet; don't create files just by listing
+            return
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'mtimes': self._mtimes, 'entries': self._entries}, f, separators=(',', ':'))
+        os.replace(tmp, self.index_path)
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['entries'], data['mtimes']
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def refresh(self):
+        """Make sure the index matches the directories, rebuilding it if not."""
+        with self._lock:
+            current = self._dir_mtimes()
+            if self._entries is not None and self._mtimes == current:
+                return
+            entries, mtimes = self._load()
+            if entries is not None and mtimes == current and set(entries) == set(self.SECTIONS):
+                self._entries, self._mtimes = entries, mtimes
+            else:
+                self.rebuild()
+
+    def _changed(self):
+        # our own file operations moved the directory mtimes; re-record them
+        self._mtimes = self._dir_mtimes()
+        self._save()
+
+    def entries(self, section='backups'):
+        """Rows with name, path, size and mtime (a datetime), newest name first."""
+        with self._lock:
+            self.refresh()
+            d = self.section_dir(section)
+            return [
+                {'name': name, 'path': os.path.join(d, name), 'size': size,
+                 'mtime': datetime.datetime.fromtimestamp(mtime)}
+                for name, (size, mtime) in sorted(self._entries[section].items(), reverse=True)
+            ]
+
+    def latest_age_days(self, now=None):
+        """Age in days of the newest backup, or None when there are none."""
+        with self._lock:
+            self.refresh()
+            files = self._entries['backups']
+            if not files:
+                return None
+            latest = max(mtime for _size, mtime in files.values())
+        now = now or datetime.datetime.now()
+        return (now.timestamp() - latest) / 86400.0
+
+    def add(self, path):
+        """Record a backup file just written into the backups directory."""
+        with self._lock:
+            self.refresh()
+            st = os.stat(path)
+            self._entries['backups'][os.path.basename(path)] = [st.st_size, st.st_mtime]
+            self._changed()
+
+    def move(self, name, src, dst):
+        """Move `name` between sections ('backups' -> 'trash' or back)."""
+        with self._lock:
+            self.refresh()
+            src_path = os.path.join(self.section_dir(src), name)
+            dst_path = os.path.join(self.section_dir(dst), name)
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            try:
+                shutil.move(src_path, dst_path)
+            finally:
+                if not os.path.exists(src_path):
+                    self._entries[src].pop(name, None)
+                if os.path.exists(dst_path):
+                    st = os.stat(dst_path)
+                    self._entries[dst][name] = [st.st_size, st.st_mtime]
+                self._changed()
+
+    def remove(self, name, section='backups'):
+        with self._lock:
+            self.refresh()
+            path = os.path.join(self.section_dir(section), name)
+            try:
+                os.remove(path)
+            finally:
+                if not os.path.exists(path):
+                    self._entries[section].pop(name, None)
+                self._changed()
+
+    def rotate(self, max_keep):
+        """Delete all but the newest `max_keep` backups. Returns the names removed."""
+        with self._lock:
+            self.refresh()
+            files = self._entries['backups']
+            if len(files) <= max_keep:
+                return []
+            newest_first = sorted(files, key=lambda name: files[name][1], reverse=True)
+            removed = []
+            for name in newest_first[max_keep:]:
+                try:
+                    os.remove(os.path.join(self.backup_dir, name))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                del files[name]
+                removed.append(name)
+            self._changed()
+            return removed
@@ -0,0 +1,64 @@
+"""Time and peak memory of restoring large archives.
+
+    python benchmarks/bench_restore.py --orders 200000
+
+Builds a synthetic state, writes it both as an export ZIP and as an
+incremental backup manifest in a temporary directory, then restores each
+and reports wall time and the tracemalloc peak. The peak includes the
+restored records themselves; the figure to watch is how far above the
+"records only" baseline it sits.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import backups  # noqa: E402
+import exporter  # noqa: E402
+import restore  # noqa: E402
+from workload import generate  # noqa: E402
+
+
+def make_state(n_orders):
+    return generate(n_orders, seed=1)
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {elapsed:8.2f} s   peak {peak / 2**20:8.1f} MiB")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    state = make_state(args.orders)
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = os.path.join(tmp, 'export.zip')
+        with open(zip_path, 'wb') as f:
+            exporter.write_export_zip(state, f)
+        manifest_path, _ = backups.create_backup(state, os.path.join(tmp, 'backups'))
+        print(f"{args.orders} orders, export ZIP {os.path.getsize(zip_path) / 2**20:.1f} MiB")
+
+        measure('records only', lambda: make_state(args.orders))
+        restored = measure('restore ZIP', lambda: restore.restore_zip(zip_path))
+        assert len(restored['chicks_orders']) == args.orders
+        restored = measure('restore manifest', lambda: restore.restore_backup(manifest_path, os.path.join(tmp, 'backups')))
+        assert len(restored['chicks_orders']) == args.orders
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""End-to-end rerun latency of the app on large preloaded data.
+
+    python benchmarks/rerun_latency.py --orders 50000 --repeat 5
+    python benchmarks/rerun_latency.py --orders 50000 --profile
+
+Runs `streamlit_app.py` headlessly with Streamlit's AppTest from a
+temporary working directory whose journal snapshot holds a generated farm
+history (see workload.py). Each interaction (a plain rerun, the four
+forms, collecting an order, saving) is performed `--repeat` times and the
+full rerun it triggers is timed; the report gives median, p90 and max per
+interaction. `--profile` additionally profiles one plain rerun and lists
+where the time goes in the app's own code and in Streamlit's element
+builders, which shows the panel that dominates.
+"""
+import argparse
+import cProfile
+import datetime
+import logging
+import os
+import pstats
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import workload  # noqa: E402
+from farm_state import state_to_payload  # noqa: E402
+from instrumentation import percentile  # noqa: E402
+from journal import Journal  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, 'streamlit_app.py')
+
+
+def preload(n_orders, seed):
+    """Write a generated state as the journal snapshot in the current directory."""
+    journal = Journal(os.path.join('.streamlit', 'journal'))
+    journal.snapshot(state_to_payload(workload.generate(n_orders, seed=seed)))
+    journal.close()
+
+
+def widget(elements, label):
+    for w in elements:
+        if w.label == label:
+            return w
+    raise LookupError(label)
+
+
+def button(at, label):
+    return widget(at.button, label)
+
+
+# interaction name -> function preparing and clicking on a rendered AppTest
+def idle(at):
+    return at
+
+
+def place_order(at):
+    widget(at.text_input, "Customer Name").input("Latency Test")
+    widget(at.number_input, "No. of chicks").set_value(10)
+    return button(at, "Place Order").click()
+
+
+def log_eggs(at):
+    widget(at.number_input, "Number of Eggs").set_value(120)
+    return button(at, "Log Egg Arrival").click()
+
+
+def add_hatch(at):
+    widget(at.number_input, "No. of newly hatched chicks").set_value(50)
+    return button(at, "Add Hatch Data").click()
+
+
+def log_sale(at):
+    widget(at.text_input, "Customer Name (Sale)").input("Latency Test")
+    return button(at, "Log Sale").click()
+
+
+def collect_order(at):
+    return button(at, "Mark as Collected").click()
+
+
+def save(at):
+    return button(at, "Save to Streamlit storage").click()
+
+
+INTERACTIONS = {
+    'rerun': idle,
+    'place_order': place_order,
+    'log_eggs': log_eggs,
+    'add_hatch': add_hatch,
+    'log_sale': log_sale,
+    'collect_order': collect_order,
+    'save': save,
+}
+
+
+def measure(at, name, action, repeat):
+    times = []
+    for _ in range(repeat):
+        try:
+            pending = action(at)
+        except LookupError as e:
+            print(f"{name:<14} skipped: no {e.args[0]!r} on the page")
+            return None
+        t0 = time.perf_counter()
+        pending.run()
+        times.append(time.perf_counter() - t0)
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception}")
+    return times
+
+
+def profile_rerun(at, limit):
+    # AppTest runs the script on its own thread, so profile threads started during the rerun
+    profilers = []
+
+    def start_profiler(*_args):
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable()
+
+    threading.setprofile(start_profiler)
+    try:
+        at.run()
+    finally:
+        threading.setprofile(None)
+    if not profilers:
+        print("no script thread was profiled")
+        return
+    stats = pstats.Stats(*profilers).sort_stats('cumulative')
+    print("\nplain rerun, cumulative time by function (app code and Streamlit elements):")
+    stats.print_stats(f"{re.escape(ROOT)}|streamlit/elements", limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure full-rerun latency per interaction.")
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(INTERACTIONS), help="interactions to run")
+    parser.add_argument('--profile', action='store_true', help="profile one plain rerun")
+    parser.add_argument('--profile-limit', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    from streamlit.testing.v1 import AppTest
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            preload(args.orders, args.seed)
+            at = AppTest.from_file(APP_PATH, default_timeout=600)
+            t0 = time.perf_counter()
+            at.run()
+            print(f"{args.orders} orders, first run {time.perf_counter() - t0:.2f} s "
+                  f"({datetime.date.today()}, {args.repeat} runs each)")
+            print(f"{'interaction':<14} {'median':>9} {'p90':>9} {'max':>9}")
+            for name in args.only or INTERACTIONS:
+                times = measure(at, name, INTERACTIONS[name], args.repeat)
+                if times:
+                    print(f"{name:<14} {statistics.median(times) * 1000:7.0f}ms {percentile(sorted(times), 90) * 1000:7.0f}ms "
+                          f"{max(times) * 1000:7.0f}ms", flush=True)
+            if args.profile:
+                profile_rerun(at, args.profile_limit)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Time the app's hot paths on generated farm histories of several sizes.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 50000
+    python benchmarks/run_benchmarks.py --save-baseline        # record a baseline
+    python benchmarks/run_benchmarks.py --threshold 0.25       # fail if >25% slower
+
+The app module is imported in Streamlit's bare mode from a temporary
+working directory, so the real `forecast_pickup_dates()`,
+`process_hatches()`, `save_to_db()`/`load_from_db()` (the SQLite path behind
+the Save and Load buttons) and `export_data_zip()` run against throwaway
+`.streamlit/` files. Each save follows one new order, as in the app. Each
+case reports the median of `--repeat` runs. Results are written as JSON
+(by default to `benchmarks/results.json`, which git ignores); when a
+baseline file exists, any case slower than baseline by more than the
+threshold (and by at least `--min-delta` seconds, to ignore noise on tiny
+timings) makes the script exit with status 1.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import workload  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(HERE, 'results.json')
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+
+
+def load_app():
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    import farm_state
+    import streamlit_app
+    # the app starts its background threads on import; stop them so they don't
+    # commit hatches or back up into the store while cases are being timed
+    streamlit_app.get_hatch_job().stop(5)
+    streamlit_app.get_backup_scheduler().stop(5)
+    return streamlit_app, farm_state
+
+
+def timed(fn, setup=None, repeat=3):
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def bench_size(app, farm_state, size, seed, repeat):
+    state_for = lambda: workload.generate(size, seed=seed)  # noqa: E731
+
+    def fresh():
+        app.replace_state(state_for())
+
+    def new_order():
+        app.commit_event(farm_state.order_placed('Bench Customer', 10, datetime.date.today()))
+
+    results = {}
+    results['process_hatches'] = timed(app.process_hatches, fresh, repeat)
+    fresh()
+    results['forecast_cold'] = timed(app.forecast_pickup_dates, lambda: app.get_forecast_engine().invalidate(), repeat)
+    results['forecast_new_order'] = timed(app.forecast_pickup_dates, new_order, repeat)
+    results['save_to_db'] = timed(app.save_to_db, new_order, repeat)
+    results['load_from_db'] = timed(app.load_from_db, repeat=repeat)
+    results['export_data_zip'] = timed(app.export_data_zip, repeat=repeat)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Return `[(case, baseline, now)]` for every regression."""
+    regressions = []
+    for case, now in results.items():
+        before = baseline.get(case)
+        if before is not None and now > before * (1 + threshold) and now - before >= min_delta:
+            regressions.append((case, before, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the farm app's hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help="numbers of orders")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument('--min-delta', type=float, default=0.005, help="ignore slowdowns smaller than this (s)")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            app, farm_state = load_app()
+            for size in args.sizes:
+                for case, seconds in bench_size(app, farm_state, size, args.seed, args.repeat).items():
+                    results[f"{case}[{size}]"] = seconds
+                    print(f"{case:<20} {size:>8} orders  {seconds * 1000:10.1f} ms", flush=True)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    for case, before, now in regressions:
+        print(f"REGRESSION {case}: {before * 1000:.1f} ms -> {now * 1000:.1f} ms ({now / before - 1:+.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Seeded generator of realistic farm histories for benchmarks.
+
+    state = generate(n_orders=50000, years=3, seed=1)
+
+Egg batches arrive a few times a week over `years` years, with the chicks
+that hatched from them logged in the hatchery and their incubation dates
+marked processed (except the last few weeks, which are still incubating
+or waiting for `process_hatches()`). Orders follow the same timeline; old
+orders have been collected, recent ones are pending. The same seed always
+yields the same state.
+"""
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from allocation import HATCH_RATE, INCUBATION  # noqa: E402
+from farm_state import new_state  # noqa: E402
+from records import HatchRecord, Order, Sale  # noqa: E402
+
+FIRST_NAMES = ('Tendai', 'Rudo', 'Farai', 'Chipo', 'Tatenda', 'Nyasha', 'Kuda', 'Tsitsi', 'Tafadzwa', 'Shamiso')
+SURNAMES = ('Moyo', 'Ncube', 'Sibanda', 'Dube', 'Mpofu', 'Ndlovu', 'Shumba', 'Chikomo', 'Mutasa', 'Banda')
+LOCATIONS = ('Shed A', 'Shed B', 'Contract Farmer', 'Own Farm')
+SALE_TYPES = ('Chick', 'Cock', 'Point of Lay')
+# orders still waiting for collection
+PENDING_DAYS = 45
+
+
+def customers(rng, n):
+    names = set()
+    while len(names) < n:
+        names.add(f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {rng.randint(1, 999)}")
+    return sorted(names)
+
+
+def generate(n_orders, years=3, seed=0, today=None):
+    """A state with `n_orders` orders spread over `years` years ending at `today`."""
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    start = today - datetime.timedelta(days=int(365 * years))
+    days = (today - start).days
+    state = new_state()
+
+    # egg batches on ~3 days a week; hatches logged for all but the last six weeks
+    for offset in range(days + 1):
+        if rng.random() < 3 / 7:
+            d = start + datetime.timedelta(days=offset)
+            eggs = rng.randint(50, 400)
+            hatch_day = d + INCUBATION
+            if hatch_day <= today - datetime.timedelta(weeks=3):
+                chicks = int(eggs * HATCH_RATE)
+                state['hatchery'].append(HatchRecord(hatch_day, rng.choice(LOCATIONS), chicks))
+                state['processed_hatch_dates'].append(d.isoformat())
+            else:
+                state['egg_inventory'][d] += eggs
+
+    people = customers(rng, max(10, n_orders // 8))
+    order_days = sorted(rng.randrange(days + 1) for _ in range(n_orders))
+    pending_from = days - PENDING_DAYS
+    for offset in order_days:
+        d = start + datetime.timedelta(days=offset)
+        count = rng.choice((5, 10, 10, 20, 25, 50, 100))
+        if offset < pending_from:
+            pickup = d + datetime.timedelta(days=rng.randint(21, 42))
+            state['chicks_orders'].append(Order(rng.choice(people), count, d, min(pickup, today), True))
+        else:
+            state['chicks_orders'].append(Order(rng.choice(people), count, d))
+
+    for _ in range(n_orders // 5):
+        d = start + datetime.timedelta(days=rng.randrange(days + 1))
+        state['sales'].append(Sale(rng.choice(SALE_TYPES), rng.choice(people), rng.randint(1, 30), d))
+    state['sales'].sort(key=lambda s: s.date)
+    state['chicks_inventory'] = rng.randint(0, 500)
+    return state
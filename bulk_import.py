@@ -0,0 +1,197 @@
+"""Bulk import of orders, egg arrivals, hatches and sales from CSV files.
+
+Files are read as a stream and validated in batches of rows, so large
+migrations do not need to fit in memory as text. Each bad row is reported
+with its file and line number. Valid rows collect into a single `bulk`
+event (see `farm_state.bulk()`): the whole import is one journaled
+mutation, and the forecast runs once afterwards instead of once per record.
+
+Accepted layouts are the CSV files written by the ZIP export (the ZIP
+itself is accepted too) and the same columns in any order, with a
+header row. The kind of each file is detected from its header.
+"""
+import csv
+import io
+import itertools
+import zipfile
+
+from farm_state import bulk
+from records import parse_count, parse_date
+
+BATCH_ROWS = 500
+MAX_REPORTED_ERRORS = 200
+SALE_TYPES = ('Chick', 'Cock', 'Point of Lay')
+
+
+def _ord(d):
+    return d.toordinal() if d else None
+
+
+def _positive(value, field):
+    n = parse_count(value)
+    if n < 1:
+        raise ValueError(f"{field} must be at least 1")
+    return n
+
+
+def _required_date(value, field):
+    d = parse_date(value)
+    if d is None:
+        raise ValueError(f"{field} is required")
+    return d
+
+
+def _flag(value):
+    v = (value or '').strip().lower()
+    if v in ('true', 'yes', 'y', '1'):
+        return True
+    if v in ('false', 'no', 'n', '0', ''):
+        return False
+    raise ValueError(f"picked_up must be true or false, not {value!r}")
+
+
+def _egg_row(r):
+    return [_ord(_required_date(r['date'], 'date')), _positive(r['eggs'], 'eggs')]
+
+
+def _hatch_row(r):
+    return [_ord(_required_date(r['date'], 'date')), (r.get('location') or '').strip() or None, parse_count(r['chicks'])]
+
+
+def _order_row(r):
+    name = (r['name'] or '').strip()
+    if not name:
+        raise ValueError("name is required")
+    picked_up = _flag(r.get('picked_up'))
+    pickup_date = parse_date(r.get('pickup_date'))
+    if picked_up and pickup_date is None:
+        raise ValueError("picked-up orders need a pickup_date")
+    return [name, _positive(r['order_count'], 'order_count'), _ord(parse_date(r.get('order_date'))),
+            _ord(pickup_date), picked_up]
+
+
+def _sale_row(r):
+    kind = (r['type'] or '').strip()
+    if kind not in SALE_TYPES:
+        raise ValueError(f"type must be one of {', '.join(SALE_TYPES)}")
+    return [kind, (r['name'] or '').strip(), _positive(r['count'], 'count'), _ord(_required_date(r['date'], 'date'))]
+
+
+# kind -> (required columns, optional columns, row parser, event field)
+KINDS = {
+    'eggs': (('date', 'eggs'), (), _egg_row, 'eggs'),
+    'hatchery': (('date', 'chicks'), ('location',), _hatch_row, 'hatches'),
+    'orders': (('name', 'order_count'), ('order_date', 'pickup_date', 'picked_up'), _order_row, 'orders'),
+    'sales': (('type', 'name', 'count', 'date'), (), _sale_row, 'sales'),
+}
+
+# ZIP export member -> kind
+EXPORT_MEMBERS = {
+    'egg_inventory.csv': 'eggs',
+    'hatchery.csv': 'hatchery',
+    'chicks_orders.csv': 'orders',
+    'sales.csv': 'sales',
+}
+
+
+def detect_kind(header):
+    """The kind whose required columns all appear in `header`, or None."""
+    columns = set(header)
+    matches = [kind for kind, (required, _optional, _parse, _field) in KINDS.items() if columns.issuperset(required)]
+    if len(matches) == 1:
+        return matches[0]
+    # prefer the kind that explains every column
+    exact = [kind for kind in matches if columns <= set(KINDS[kind][0]) | set(KINDS[kind][1])]
+    return exact[0] if len(exact) == 1 else None
+
+
+class RowError:
+    __slots__ = ('source', 'line', 'message')
+
+    def __init__(self, source, line, message):
+        self.source = source
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"RowError({self.source!r}, {self.line}, {self.message!r})"
+
+
+class BulkImport:
+    """Validated rows from one or more files, ready to commit as one event."""
+
+    def __init__(self, batch_rows=BATCH_ROWS):
+        self.batch_rows = batch_rows
+        self.rows = {field: [] for _required, _optional, _parse, field in KINDS.values()}
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.errors = []
+        self.error_count = 0
+
+    @property
+    def accepted(self):
+        return sum(self.counts.values())
+
+    def _error(self, source, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(source, line, message))
+
+    def add_csv(self, text, source='', kind=None):
+        """Validate CSV rows from the text stream `text`. Returns the kind imported."""
+        reader = csv.reader(text)
+        header = [h.strip().lower() for h in next(reader, [])]
+        kind = kind or detect_kind(header)
+        if kind is None:
+            raise ValueError(f"{source or 'CSV'}: unrecognised header {', '.join(header) or '(empty)'}")
+        required, _optional, parse, field = KINDS[kind]
+        missing = [c for c in required if c not in header]
+        if missing:
+            raise ValueError(f"{source or 'CSV'}: missing column(s) {', '.join(missing)} for {kind}")
+        target = self.rows[field]
+        width = len(header)
+        line = 1
+        while True:
+            batch = list(itertools.islice(reader, self.batch_rows))
+            if not batch:
+                break
+            parsed = []
+            for row in batch:
+                line += 1
+                if not any(cell.strip() for cell in row):
+                    continue
+                if len(row) < width:
+                    row = row + [''] * (width - len(row))
+                try:
+                    parsed.append(parse(dict(zip(header, row))))
+                except (ValueError, TypeError) as e:
+                    self._error(source, line, str(e))
+            target.extend(parsed)
+            self.counts[kind] += len(parsed)
+        return kind
+
+    def add_zip(self, fileobj, source='archive'):
+        """Validate the CSV members of an export ZIP. Returns the kinds imported."""
+        kinds = []
+        with zipfile.ZipFile(fileobj) as z:
+            names = set(z.namelist())
+            for member, kind in EXPORT_MEMBERS.items():
+                if member in names:
+                    with z.open(member) as raw:
+                        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+                        kinds.append(self.add_csv(text, f"{source}/{member}", kind))
+        if not kinds:
+            raise ValueError(f"{source}: no export CSV files found")
+        return kinds
+
+    def add_file(self, fileobj, name, kind=None):
+        """Add an uploaded `.csv` or `.zip` (binary file object) by its file name."""
+        if name.lower().endswith('.zip'):
+            return self.add_zip(fileobj, name)
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        try:
+            return self.add_csv(text, name, kind)
+        finally:
+            text.detach()
+
+    def event(self):
+        return bulk(**self.rows)
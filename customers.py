@@ -0,0 +1,105 @@
+"""Customer index over the free-text names on orders and sales.
+
+Customers are not stored anywhere on their own: every order and sale just
+carries a `name`. `CustomerIndex` groups those records by normalised name
+(case and whitespace folded) and keeps a sorted list of search terms, the
+full name and each later word of it, so a prefix search is a bisect plus a
+short scan. Like the forecast engine, the index remembers which list it
+indexed and how many records it has seen, so `refresh()` only indexes
+newly appended records and rebuilds when the lists were replaced.
+"""
+import bisect
+import threading
+
+
+def normalise(name):
+    """Lookup key for a customer name: trimmed, single-spaced and case-folded."""
+    return ' '.join(str(name or '').split()).casefold()
+
+
+class Customer:
+    """Positions of one customer's orders and sales in the state lists."""
+    __slots__ = ('key', 'name', 'orders', 'sales')
+
+    def __init__(self, key, name):
+        self.key = key
+        # display name: as first entered
+        self.name = name
+        self.orders = []
+        self.sales = []
+
+
+class CustomerIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset(None, None)
+
+    def _reset(self, orders, sales):
+        self.customers = {}
+        # sorted (term, key) pairs; a term is the whole key or a suffix starting at a word
+        self._terms = []
+        self._orders = orders
+        self._sales = sales
+        self._orders_seen = 0
+        self._sales_seen = 0
+
+    def __len__(self):
+        return len(self.customers)
+
+    def _customer(self, name):
+        key = normalise(name)
+        customer = self.customers.get(key)
+        if customer is None:
+            customer = self.customers[key] = Customer(key, ' '.join(str(name or '').split()))
+            words = key.split(' ')
+            for i in range(len(words)):
+                bisect.insort(self._terms, (' '.join(words[i:]), key))
+        return customer
+
+    def refresh(self, orders, sales):
+        """Index records appended since the last call; rebuild if the lists were swapped."""
+        with self._lock:
+            if (orders is not self._orders or sales is not self._sales
+                    or len(orders) < self._orders_seen or len(sales) < self._sales_seen):
+                self._reset(orders, sales)
+            for i in range(self._orders_seen, len(orders)):
+                self._customer(orders[i]['name']).orders.append(i)
+            for i in range(self._sales_seen, len(sales)):
+                self._customer(sales[i]['name']).sales.append(i)
+            self._orders_seen = len(orders)
+            self._sales_seen = len(sales)
+            return self
+
+    def get(self, name):
+        """The `Customer` for `name` (any case or spacing), or None."""
+        return self.customers.get(normalise(name))
+
+    def search(self, prefix, limit=20):
+        """Customers whose name, or any word of it, starts with `prefix`, by name.
+
+        An empty prefix matches everyone; at most `limit` customers are returned.
+        """
+        prefix = normalise(prefix)
+        with self._lock:
+            keys = []
+            seen = set()
+            pos = bisect.bisect_left(self._terms, (prefix,))
+            while pos < len(self._terms) and len(keys) < limit:
+                term, key = self._terms[pos]
+                if not term.startswith(prefix):
+                    break
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+                pos += 1
+            return [self.customers[k] for k in sorted(keys)]
+
+    def history(self, name):
+        """`(pending orders, collected orders, sales)` records of one customer."""
+        customer = self.get(name)
+        if customer is None:
+            return [], [], []
+        orders = [self._orders[i] for i in customer.orders]
+        return ([o for o in orders if not o['picked_up']],
+                [o for o in orders if o['picked_up']],
+                [self._sales[i] for i in customer.sales])
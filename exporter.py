@@ -0,0 +1,138 @@
+"""Streaming CSV/ZIP export of farm data.
+
+Rows are written in chunks straight into each member's deflate stream, so
+the export never holds a whole CSV in memory. `ExportCache` keeps the most
+recent archive in a spooled temporary file (in memory up to a cap, on disk
+above it) and rebuilds it only when its key (the data version plus whatever
+else shaped the pickup dates) changes.
+"""
+import csv
+import datetime
+import io
+import json
+import tempfile
+import threading
+import zipfile
+
+CHUNK_ROWS = 1000
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+def _iso(d):
+    return str(d or '')
+
+
+# member name -> (header, state key)
+CSV_MEMBERS = {
+    'egg_inventory.csv': (['date', 'eggs'], 'egg_inventory'),
+    'hatchery.csv': (['date', 'location', 'chicks'], 'hatchery'),
+    'chicks_orders.csv': (['name', 'order_count', 'order_date', 'pickup_date', 'picked_up'], 'chicks_orders'),
+    'sales.csv': (['type', 'name', 'count', 'date'], 'sales'),
+}
+
+
+def iter_rows(state, member):
+    """CSV rows (without header) for one archive member."""
+    if member == 'egg_inventory.csv':
+        return ([str(k), v] for k, v in state['egg_inventory'].items())
+    if member == 'hatchery.csv':
+        return ([str(h.get('date')), h.get('location', '') or '', h.get('chicks', 0)] for h in state['hatchery'])
+    if member == 'chicks_orders.csv':
+        return ([o.get('name', ''), o.get('order_count', 0), _iso(o.get('order_date')), _iso(o.get('pickup_date')),
+                 bool(o.get('picked_up', False))] for o in state['chicks_orders'])
+    if member == 'sales.csv':
+        return ([s.get('type', ''), s.get('name', ''), s.get('count', 0), _iso(s.get('date'))] for s in state['sales'])
+    raise KeyError(member)
+
+
+def snapshot(state):
+    """Shallow, point-in-time copy of the state's collections."""
+    return {
+        'egg_inventory': dict(state['egg_inventory']),
+        'hatchery': list(state['hatchery']),
+        'chicks_orders': list(state['chicks_orders']),
+        'chicks_inventory': state['chicks_inventory'],
+        'sales': list(state['sales']),
+        'processed_hatch_dates': list(state['processed_hatch_dates']),
+    }
+
+
+def write_csv_member(z, member, rows, header, chunk_rows=CHUNK_ROWS):
+    """Stream `rows` into a new deflated member of the open ZipFile `z`.
+
+    Returns the number of data rows written.
+    """
+    count = 0
+    with z.open(member, 'w', force_zip64=True) as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(header)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                writer.writerows(batch)
+                count += len(batch)
+                batch.clear()
+        writer.writerows(batch)
+        count += len(batch)
+        text.flush()
+        text.detach()
+    return count
+
+
+def write_export_zip(state, fileobj, chunk_rows=CHUNK_ROWS):
+    """Write the export archive for `state` to the binary file object `fileobj`."""
+    with zipfile.ZipFile(fileobj, mode='w', compression=zipfile.ZIP_DEFLATED) as z:
+        counts = {}
+        for member, (header, _key) in CSV_MEMBERS.items():
+            counts[member] = write_csv_member(z, member, iter_rows(state, member), header, chunk_rows)
+        meta = {
+            'chicks_inventory': state['chicks_inventory'],
+            'processed_hatch_dates': list(state['processed_hatch_dates']),
+            'exported_at': str(datetime.date.today()),
+            # data rows per member, checked on restore
+            'counts': counts,
+        }
+        z.writestr('meta.json', json.dumps(meta))
+
+
+class ExportCache:
+    """The latest export archive, rebuilt only when the cache key changes."""
+
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        self.max_memory = max_memory
+        self.key = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def read(self, key, get_state):
+        """Return archive bytes for `key`; `get_state()` is called only on a miss.
+
+        The caller gets the bytes because Streamlit keeps a download's data
+        in memory anyway; the cached archive itself spills to disk above
+        `max_memory`.
+        """
+        with self._lock:
+            if self._file is None or self.key != key:
+                spooled = tempfile.SpooledTemporaryFile(max_size=self.max_memory)
+                try:
+                    write_export_zip(get_state(), spooled)
+                except BaseException:
+                    spooled.close()
+                    raise
+                self._close_file()
+                self._file = spooled
+                self.key = key
+            self._file.seek(0)
+            return self._file.read()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+            self.key = None
@@ -0,0 +1,172 @@
+"""Farm state serialisation and the mutations applied to it.
+
+Every change the app makes is expressed as a small event dict and applied
+with `apply_event()`, so the same event can be journaled and replayed on
+recovery. Events use short keys and store dates as ordinals to keep the
+journal compact.
+"""
+import datetime
+from collections import defaultdict
+
+from records import HatchRecord, Order, Sale
+
+STATE_KEYS = ('egg_inventory', 'hatchery', 'chicks_orders', 'chicks_inventory', 'sales', 'processed_hatch_dates')
+
+
+def new_state():
+    return {
+        'egg_inventory': defaultdict(int),
+        'hatchery': [],
+        'chicks_orders': [],
+        'chicks_inventory': 0,
+        'sales': [],
+        'processed_hatch_dates': [],
+    }
+
+
+def _iso(d):
+    return str(d) if d else None
+
+
+def state_to_payload(state):
+    """JSON-safe dict of the state (the `.streamlit/data.json` layout)."""
+    return {
+        'egg_inventory': {str(k): v for k, v in state['egg_inventory'].items()},
+        'hatchery': [
+            {'date': _iso(h.get('date')), 'location': h.get('location'), 'chicks': h.get('chicks')}
+            for h in state['hatchery']
+        ],
+        'chicks_orders': [
+            {
+                'name': o.get('name'),
+                'order_count': o.get('order_count'),
+                'order_date': _iso(o.get('order_date')),
+                'pickup_date': _iso(o.get('pickup_date')),
+                'picked_up': bool(o.get('picked_up'))
+            } for o in state['chicks_orders']
+        ],
+        'chicks_inventory': state['chicks_inventory'],
+        'sales': [
+            {'type': s.get('type'), 'name': s.get('name'), 'count': s.get('count'), 'date': _iso(s.get('date'))}
+            for s in state['sales']
+        ],
+        'processed_hatch_dates': list(state['processed_hatch_dates']),
+    }
+
+
+def payload_to_state(payload):
+    """Inverse of `state_to_payload()`; this is where JSON data is validated."""
+    state = new_state()
+    for k, v in payload.get('egg_inventory', {}).items():
+        try:
+            state['egg_inventory'][datetime.date.fromisoformat(k)] = int(v)
+        except Exception:
+            pass
+    state['hatchery'] = [HatchRecord.from_mapping(h) for h in payload.get('hatchery', [])]
+    state['chicks_orders'] = [Order.from_mapping(o) for o in payload.get('chicks_orders', [])]
+    state['chicks_inventory'] = int(payload.get('chicks_inventory', 0))
+    state['sales'] = [Sale.from_mapping(s) for s in payload.get('sales', [])]
+    state['processed_hatch_dates'] = list(payload.get('processed_hatch_dates', []))
+    return state
+
+
+# --- Events ---
+
+def _ord(d):
+    return d.toordinal() if d else None
+
+
+def _date(n):
+    return datetime.date.fromordinal(n) if n is not None else None
+
+
+def egg_arrival(arrival_date, eggs):
+    return {'t': 'egg', 'd': _ord(arrival_date), 'n': int(eggs)}
+
+
+def hatch_recorded(hatch_date, location, chicks):
+    return {'t': 'hatch', 'd': _ord(hatch_date), 'l': location, 'n': int(chicks)}
+
+
+def order_placed(name, count, order_date):
+    return {'t': 'order', 'c': name, 'n': int(count), 'd': _ord(order_date)}
+
+
+def order_collected(index, pickup_date):
+    """`index` is the order's position in `chicks_orders`."""
+    return {'t': 'pickup', 'i': index, 'd': _ord(pickup_date)}
+
+
+def sale_logged(kind, name, count, sale_date):
+    return {'t': 'sale', 'k': kind, 'c': name, 'n': int(count), 'd': _ord(sale_date)}
+
+
+def auto_hatch(incubation_date, hatch_day, chicks):
+    return {'t': 'auto_hatch', 'i': _ord(incubation_date), 'd': _ord(hatch_day), 'n': int(chicks)}
+
+
+def bulk(eggs=(), hatches=(), orders=(), sales=()):
+    """Many records as one event; see `bulk_import.py` for building the rows.
+
+    Rows use ordinal dates: eggs `[d, n]`, hatches `[d, location, n]`,
+    orders `[name, n, order_d, pickup_d, picked_up]`, sales `[kind, name, n, d]`.
+    Applying it is equivalent to committing the matching single events in
+    that order.
+    """
+    return {'t': 'bulk', 'e': list(eggs), 'h': list(hatches), 'o': list(orders), 's': list(sales)}
+
+
+def _apply_bulk(state, event):
+    eggs = state['egg_inventory']
+    for d, n in event['e']:
+        d = _date(d)
+        eggs[d] = eggs.get(d, 0) + n
+    hatchery = state['hatchery']
+    for d, location, n in event['h']:
+        hatchery.append(HatchRecord(_date(d), location, n))
+        state['chicks_inventory'] += n
+    orders = state['chicks_orders']
+    for name, n, d, pickup, picked_up in event['o']:
+        orders.append(Order(name, n, _date(d), _date(pickup), picked_up))
+        if picked_up:
+            state['chicks_inventory'] = max(0, state['chicks_inventory'] - n)
+    sales = state['sales']
+    for kind, name, n, d in event['s']:
+        sales.append(Sale(kind, name, n, _date(d)))
+        if kind == "Chick":
+            state['chicks_inventory'] = max(0, state['chicks_inventory'] - n)
+
+
+def apply_event(state, event):
+    """Apply one event to `state` in place."""
+    kind = event['t']
+    if kind == 'egg':
+        d = _date(event['d'])
+        eggs = state['egg_inventory']
+        eggs[d] = eggs.get(d, 0) + event['n']
+    elif kind == 'hatch':
+        state['hatchery'].append(HatchRecord(_date(event['d']), event['l'], event['n']))
+        state['chicks_inventory'] += event['n']
+    elif kind == 'order':
+        state['chicks_orders'].append(Order(event['c'], event['n'], _date(event['d'])))
+    elif kind == 'pickup':
+        order = state['chicks_orders'][event['i']]
+        order.picked_up = True
+        order.pickup_date = _date(event['d'])
+        state['chicks_inventory'] = max(0, state['chicks_inventory'] - order.order_count)
+    elif kind == 'sale':
+        state['sales'].append(Sale(event['k'], event['c'], event['n'], _date(event['d'])))
+        # Subtract from inventory if chicks are sold
+        if event['k'] == "Chick":
+            state['chicks_inventory'] = max(0, state['chicks_inventory'] - event['n'])
+    elif kind == 'auto_hatch':
+        incubation_date = _date(event['i'])
+        # Remove eggs that hatched
+        state['egg_inventory'].pop(incubation_date, None)
+        state['chicks_inventory'] += event['n']
+        state['hatchery'].append(HatchRecord(_date(event['d']), "Auto Hatch", event['n']))
+        state['processed_hatch_dates'].append(incubation_date.isoformat())
+    elif kind == 'bulk':
+        _apply_bulk(state, event)
+    else:
+        raise ValueError(f"Unknown event type: {kind}")
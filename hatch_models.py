@@ -0,0 +1,224 @@
+"""Configurable hatch models and a Monte Carlo pickup forecast.
+
+A `HatchModel` gives the expected hatch rate and incubation time of a batch
+together with their spread. `HatchModels` holds one model per egg source
+("Contract Farmer", "Own Farm"), remembers which source each incubation
+date came from, and allows per-batch overrides; every deterministic path
+(availability, hatch processing, the availability table) asks it for a
+batch's model instead of using the fixed 85% / 3 weeks.
+
+`simulate_pickups()` runs many hatch-outcome scenarios at once as NumPy
+arrays (one row per scenario) and replays the FIFO, no-split allocation of
+the open orders on each, giving P50/P90 pickup dates per order.
+"""
+import datetime
+import json
+import os
+
+import numpy as np
+
+from allocation import HATCH_RATE, INCUBATION, fifo_key
+from records import Order
+
+SOURCES = ('Contract Farmer', 'Own Farm')
+DEFAULT_SOURCE = 'Own Farm'
+RUNS = 1000
+# days simulated past the latest expected hatch, for late batches
+HORIZON_SLACK = 14
+
+
+class HatchModel:
+    """Hatch rate and incubation days of a batch, with standard deviations."""
+    __slots__ = fields = ('rate', 'incubation_days', 'rate_sd', 'incubation_sd')
+
+    def __init__(self, rate=HATCH_RATE, incubation_days=INCUBATION.days, rate_sd=0.05, incubation_sd=0.5):
+        if not 0 <= rate <= 1 or rate_sd < 0:
+            raise ValueError(f"Invalid hatch rate {rate} ± {rate_sd}")
+        if incubation_days < 1 or incubation_sd < 0:
+            raise ValueError(f"Invalid incubation time {incubation_days} ± {incubation_sd} days")
+        self.rate = float(rate)
+        self.incubation_days = int(incubation_days)
+        self.rate_sd = float(rate_sd)
+        self.incubation_sd = float(incubation_sd)
+
+    def __eq__(self, other):
+        return isinstance(other, HatchModel) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"HatchModel({self.rate}, {self.incubation_days}, {self.rate_sd}, {self.incubation_sd})"
+
+    def hatch_day(self, incubation_date):
+        return incubation_date + datetime.timedelta(days=self.incubation_days)
+
+    def chicks(self, eggs):
+        """Expected chicks from `eggs` (rounded down, as before)."""
+        return int(eggs * self.rate)
+
+    def as_dict(self):
+        return {f: getattr(self, f) for f in self.fields}
+
+    @classmethod
+    def from_mapping(cls, m):
+        return cls(**{f: m[f] for f in cls.fields if f in m})
+
+
+class HatchModels:
+    """Hatch model per egg source plus per-batch sources and overrides.
+
+    `version` is bumped on every change so callers can key caches on it.
+    """
+
+    def __init__(self, sources=None, batch_sources=None, overrides=None):
+        self.sources = {name: HatchModel() for name in SOURCES}
+        self.sources.update(sources or {})
+        # incubation date -> source name / HatchModel
+        self.batch_sources = dict(batch_sources or {})
+        self.overrides = dict(overrides or {})
+        self.version = 0
+
+    def model_for(self, incubation_date):
+        model = self.overrides.get(incubation_date)
+        if model is not None:
+            return model
+        return self.sources.get(self.batch_sources.get(incubation_date, DEFAULT_SOURCE)) or HatchModel()
+
+    def set_source_model(self, source, model):
+        self.sources[source] = model
+        self.version += 1
+
+    def assign(self, incubation_date, source):
+        """Record the egg source of a batch (the latest arrival on a date wins)."""
+        if self.batch_sources.get(incubation_date) != source:
+            self.batch_sources[incubation_date] = source
+            self.version += 1
+
+    def set_override(self, incubation_date, model):
+        """Use `model` for one batch; None reverts it to its source's model."""
+        if model is None:
+            self.overrides.pop(incubation_date, None)
+        else:
+            self.overrides[incubation_date] = model
+        self.version += 1
+
+    def arrays(self, incubation_dates):
+        """`(incubation_days, rate, rate_sd, incubation_sd)` arrays for the given batches."""
+        models = [self.model_for(d) for d in incubation_dates]
+        return (
+            np.fromiter((m.incubation_days for m in models), dtype=np.int64, count=len(models)),
+            np.fromiter((m.rate for m in models), dtype=np.float64, count=len(models)),
+            np.fromiter((m.rate_sd for m in models), dtype=np.float64, count=len(models)),
+            np.fromiter((m.incubation_sd for m in models), dtype=np.float64, count=len(models)),
+        )
+
+    def to_dict(self):
+        return {
+            'sources': {name: m.as_dict() for name, m in self.sources.items()},
+            'batch_sources': {d.isoformat(): s for d, s in self.batch_sources.items()},
+            'overrides': {d.isoformat(): m.as_dict() for d, m in self.overrides.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            {name: HatchModel.from_mapping(m) for name, m in data.get('sources', {}).items()},
+            {datetime.date.fromisoformat(d): s for d, s in data.get('batch_sources', {}).items()},
+            {datetime.date.fromisoformat(d): HatchModel.from_mapping(m) for d, m in data.get('overrides', {}).items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Models saved at `path`, or the defaults when there is no file yet."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+
+def _quantile_dates(offsets, q, today_ord, unfilled):
+    """Per-column `q` quantile of sorted scenario offsets as dates (None past the horizon)."""
+    runs = offsets.shape[0]
+    row = offsets[min(runs - 1, max(0, int(np.ceil(q * runs)) - 1))]
+    return [None if v >= unfilled else datetime.date.fromordinal(today_ord + int(v)) for v in row]
+
+
+def simulate_pickups(orders, chicks_inventory, hatchery, egg_inventory, models, today, runs=RUNS, seed=None):
+    """Monte Carlo pickup dates for the open orders.
+
+    Each scenario draws every incubating batch's hatch rate and incubation
+    time from its model and its chicks from a binomial, then allocates the
+    open orders FIFO from a single date each, exactly like the point
+    forecast. Returns `[(order, p50, p90, filled)]` in FIFO order, where the
+    dates are None when the order is not filled by then in that share of
+    scenarios and `filled` is the share of scenarios that fill it at all.
+    """
+    rng = np.random.default_rng(seed)
+    today_ord = today.toordinal()
+    # read-only: dict entries are coerced to copies rather than replaced in `orders`
+    pending = sorted((o if o.__class__ is Order else Order.coerce(o) for o in orders), key=fifo_key)
+    pending = [o for o in pending if not o.picked_up and o.order_count > 0]
+    if not pending:
+        return []
+
+    batches = list(egg_inventory)
+    if batches:
+        inc = np.fromiter((d.toordinal() for d in batches), dtype=np.int64, count=len(batches)) - today_ord
+        eggs = np.fromiter((egg_inventory[d] for d in batches), dtype=np.int64, count=len(batches))
+        days, rate, rate_sd, inc_sd = models.arrays(batches)
+        p = np.clip(rng.normal(rate, rate_sd, size=(runs, len(batches))), 0.0, 1.0)
+        chicks = rng.binomial(eggs, p)
+        # matured but unprocessed batches hatch today at the earliest
+        hatch = np.maximum(0, inc + np.rint(rng.normal(days, inc_sd, size=(runs, len(batches)))).astype(np.int64))
+        horizon = int(hatch.max()) + 1
+    else:
+        chicks = hatch = None
+        horizon = 1
+
+    fixed = {0: int(chicks_inventory or 0)}
+    for h in hatchery:
+        if h['date'] is not None and h['date'] >= today:
+            offset = h['date'].toordinal() - today_ord
+            fixed[offset] = fixed.get(offset, 0) + int(h['chicks'])
+    starts = np.fromiter((max(0, (o.order_date or today).toordinal() - today_ord) for o in pending),
+                         dtype=np.int64, count=len(pending))
+    horizon = max(horizon, max(fixed) + 1, int(starts.max()) + 1) + HORIZON_SLACK
+
+    stock = np.zeros((runs, horizon), dtype=np.int32)
+    for offset, n in fixed.items():
+        stock[:, offset] += n
+    if chicks is not None:
+        rows = np.repeat(np.arange(runs), chicks.shape[1])
+        np.add.at(stock, (rows, hatch.ravel()), chicks.ravel())
+
+    unfilled = horizon
+    picks = np.full((runs, len(pending)), unfilled, dtype=np.int32)
+    scenario = np.arange(runs)
+    # stock only goes down, so once no day in any scenario can fill an order
+    # its largest value bounds what later orders can get
+    bound = int(stock.max())
+    for j, order in enumerate(pending):
+        qty = order.order_count
+        if qty > bound:
+            continue
+        lo = starts[j]
+        enough = stock[:, lo:] >= qty
+        found = enough.any(axis=1)
+        if not found.any():
+            bound = int(stock.max())
+            continue
+        first = lo + enough.argmax(axis=1)
+        hit = scenario[found]
+        stock[hit, first[found]] -= qty
+        picks[hit, j] = first[found]
+
+    filled = (picks < unfilled).mean(axis=0)
+    picks.sort(axis=0)
+    p50 = _quantile_dates(picks, 0.5, today_ord, unfilled)
+    p90 = _quantile_dates(picks, 0.9, today_ord, unfilled)
+    return [(o, p50[j], p90[j], float(filled[j])) for j, o in enumerate(pending)]
@@ -0,0 +1,190 @@
+"""Hatch maturation: turning incubating eggs into chicks on their hatch day.
+
+`HatchQueue` keeps the incubating batches in a min-heap keyed by hatch day
+and the processed incubation dates in a set, so finding what matured is a
+peek at the heap instead of a scan of `egg_inventory` with a membership
+test against the ever-growing `processed_hatch_dates` list. Like the other
+derived structures it catches up incrementally: the processed list is only
+appended to, and the egg inventory is re-scanned for new batches only when
+a commit replaced the dict.
+
+`HatchJob` runs the same bookkeeping on a daemon thread, waking at the next
+hatch day (or every `check_interval` seconds), so page loads normally find
+nothing left to do.
+"""
+import datetime
+import heapq
+import threading
+
+from allocation import HATCH_RATE, INCUBATION
+from farm_state import auto_hatch
+
+CHECK_INTERVAL = 300.0
+
+
+def hatch_key(incubation_date):
+    """How an incubation date is recorded in `processed_hatch_dates`."""
+    return incubation_date.isoformat() if hasattr(incubation_date, 'isoformat') else str(incubation_date)
+
+
+class HatchQueue:
+    """Incubating batches by hatch day; `models` (see hatch_models.py) sets each batch's
+    incubation time and hatch rate, otherwise 3 weeks and 85%."""
+
+    def __init__(self, models=None):
+        self.models = models
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def invalidate(self):
+        """Re-queue everything on the next refresh, e.g. after the hatch models changed."""
+        with self._lock:
+            self._reset(None)
+
+    def _hatch_day(self, incubation_date):
+        if self.models is not None:
+            return self.models.model_for(incubation_date).hatch_day(incubation_date)
+        return incubation_date + INCUBATION
+
+    def _chicks(self, incubation_date, eggs):
+        if self.models is not None:
+            return self.models.model_for(incubation_date).chicks(eggs)
+        return int(eggs * HATCH_RATE)
+
+    def _reset(self, processed_dates):
+        self._heap = []
+        self._queued = set()
+        self._eggs = None
+        self._processed_source = processed_dates
+        self._processed_seen = 0
+        self.processed = set()
+
+    def refresh(self, egg_inventory, processed_dates):
+        """Queue batches added since the last call; rebuild if the processed list was swapped."""
+        with self._lock:
+            if processed_dates is not self._processed_source or len(processed_dates) < self._processed_seen:
+                self._reset(processed_dates)
+            for i in range(self._processed_seen, len(processed_dates)):
+                self.processed.add(processed_dates[i])
+            self._processed_seen = len(processed_dates)
+            # commits replace the egg dict (copy-on-write), so an unchanged dict has no new batches
+            if egg_inventory is not self._eggs:
+                for incubation_date in egg_inventory:
+                    if incubation_date not in self._queued:
+                        try:
+                            hatch_day = self._hatch_day(incubation_date)
+                        except Exception:
+                            continue
+                        self._queued.add(incubation_date)
+                        heapq.heappush(self._heap, (hatch_day, incubation_date))
+                self._eggs = egg_inventory
+            return self
+
+    def next_hatch_day(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def due(self, today):
+        """Pop the batches that have matured by `today`: `[(incubation_date, hatch_day, chicks)]`.
+
+        Batches already processed, or no longer in the inventory, are dropped.
+        """
+        with self._lock:
+            ready = []
+            while self._heap and self._heap[0][0] <= today:
+                hatch_day, incubation_date = heapq.heappop(self._heap)
+                self._queued.discard(incubation_date)
+                eggs = self._eggs.get(incubation_date) if self._eggs is not None else None
+                if eggs is None or hatch_key(incubation_date) in self.processed:
+                    continue
+                ready.append((incubation_date, hatch_day, self._chicks(incubation_date, eggs)))
+            return ready
+
+
+def process_due(store, hatch_queue, commit, today=None):
+    """Commit an `auto_hatch` event for every matured batch; returns how many.
+
+    Holds the store's write lock so two callers cannot process the same batch.
+    """
+    today = today or datetime.date.today()
+    with store.lock.write():
+        hatch_queue.refresh(store.state['egg_inventory'], store.state['processed_hatch_dates'])
+        ready = hatch_queue.due(today)
+        for incubation_date, hatch_day, chicks in ready:
+            commit(auto_hatch(incubation_date, hatch_day, chicks))
+        return len(ready)
+
+
+class HatchJob:
+    """Processes matured batches of `store` on a daemon thread."""
+
+    def __init__(self, store, hatch_queue, check_interval=CHECK_INTERVAL):
+        self.store = store
+        self.hatch_queue = hatch_queue
+        self.check_interval = check_interval
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.hatched = 0
+        self.last_run = None
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='hatch-job', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Check again now, e.g. after eggs were logged with a past date."""
+        self._wake.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'hatched': self.hatched,
+                'last_run': self.last_run,
+                'last_error': self.last_error,
+                'next_hatch_day': self.hatch_queue.next_hatch_day(),
+            }
+
+    def run_once(self, today=None):
+        try:
+            n = process_due(self.store, self.hatch_queue, self.store.commit, today)
+            if n and self.store.journal is not None:
+                # no script run follows to sync the batch, so make the events durable now
+                self.store.journal.sync()
+            error = None
+        except Exception as e:
+            n, error = 0, f"{type(e).__name__}: {e}"
+        with self._lock:
+            self.runs += 1
+            self.hatched += n
+            self.last_run = datetime.datetime.now()
+            self.last_error = error
+        return n
+
+    def _seconds_to_next(self):
+        next_day = self.hatch_queue.next_hatch_day()
+        if next_day is None:
+            return self.check_interval
+        now = datetime.datetime.now()
+        due_at = datetime.datetime.combine(next_day, datetime.time())
+        return max(0.0, min(self.check_interval, (due_at - now).total_seconds()))
+
+    def _loop(self):
+        while not self._stopped:
+            self.run_once()
+            # after a failure, retry on the regular interval rather than straight away
+            self._wake.wait(self.check_interval if self.last_error else self._seconds_to_next())
+            self._wake.clear()
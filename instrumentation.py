@@ -0,0 +1,109 @@
+"""Lightweight, switchable timing of app sections and helpers.
+
+`timings` is one process-wide registry (module state survives reruns).
+Wrap code in `with timings.section('name'):` or decorate a function with
+`@timings.timed()`; the most recent durations per name are kept in a ring
+buffer, so percentiles reflect current behaviour and memory stays bounded.
+When disabled, sections cost a single attribute check.
+"""
+import datetime
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CAPACITY = 500
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted, non-empty sequence."""
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+class Instrumentation:
+    def __init__(self, capacity=CAPACITY, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self._samples = {}
+        self._calls = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.capacity)
+            samples.append(seconds)
+            self._calls[name] = self._calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name=None):
+        """Decorator timing every call of the function (under its name by default)."""
+        def decorate(fn):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.section(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def stats(self):
+        """{name: calls, samples, p50, p95, max and last (seconds)} per section."""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            calls = dict(self._calls)
+        result = {}
+        for name, samples in snapshot.items():
+            ordered = sorted(samples)
+            result[name] = {
+                'calls': calls[name],
+                'samples': len(samples),
+                'p50': percentile(ordered, 50),
+                'p95': percentile(ordered, 95),
+                'max': ordered[-1],
+                'last': samples[-1],
+            }
+        return result
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def dump(self):
+        """JSON-ready copy of the current numbers, for saving and diffing runs."""
+        return {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'capacity': self.capacity,
+            'sections': self.stats(),
+            'counters': self.counters(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._calls.clear()
+            self._counters.clear()
+
+
+timings = Instrumentation()
@@ -0,0 +1,136 @@
+"""Append-only mutation journal with snapshot compaction.
+
+Each event is written as one compact JSON line tagged with a sequence number
+and fsynced in batches (every `batch_size` events or `max_delay` seconds,
+whichever comes first). `snapshot()` atomically writes the full state with
+the sequence number it covers and then truncates the journal; `recover()`
+returns the latest snapshot plus the journal tail written after it.
+"""
+import json
+import os
+import threading
+import time
+
+LOG_NAME = 'journal.log'
+SNAPSHOT_NAME = 'snapshot.json'
+
+
+class Journal:
+    def __init__(self, directory, batch_size=32, max_delay=1.0, snapshot_every=1000):
+        self.directory = directory
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.since_snapshot = 0
+        self._lock = threading.Lock()
+        self._fh = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def exists(self):
+        return os.path.exists(self.log_path) or os.path.exists(self.snapshot_path)
+
+    def recover(self):
+        """Return `(snapshot_payload or None, events after the snapshot)`.
+
+        A torn final line (crash mid-write) is ignored and cut from the log,
+        so later appends start on a fresh line.
+        """
+        with self._lock:
+            payload = None
+            base = 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snap = json.load(f)
+                payload = snap.get('state')
+                base = int(snap.get('seq', 0))
+            events = []
+            seq = base
+            if os.path.exists(self.log_path):
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                good = 0
+                with open(self.log_path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        try:
+                            event = json.loads(line)
+                        except ValueError:
+                            break
+                        good += len(line)
+                        s = event.pop('s', 0)
+                        if s <= base:
+                            continue
+                        events.append(event)
+                        seq = s
+                if good < os.path.getsize(self.log_path):
+                    with open(self.log_path, 'r+b') as f:
+                        f.truncate(good)
+                        os.fsync(f.fileno())
+            self.seq = seq
+            self.since_snapshot = len(events)
+            return payload, events
+
+    def _open(self):
+        if self._fh is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._fh = open(self.log_path, 'a', encoding='utf-8')
+        return self._fh
+
+    def append(self, event):
+        """Record one event; durable after the next batch sync."""
+        with self._lock:
+            self.seq += 1
+            record = {'s': self.seq}
+            record.update(event)
+            self._open().write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._pending += 1
+            self.since_snapshot += 1
+            if self._pending >= self.batch_size or time.monotonic() - self._last_sync >= self.max_delay:
+                self._sync()
+            return self.seq
+
+    def _sync(self):
+        if self._fh is not None and self._pending:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force any buffered events to disk."""
+        with self._lock:
+            self._sync()
+
+    def snapshot_due(self):
+        return self.since_snapshot >= self.snapshot_every
+
+    def snapshot(self, payload):
+        """Persist `payload` as the new base state and compact the journal."""
+        with self._lock:
+            self._sync()
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self.snapshot_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'seq': self.seq, 'state': payload}, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            # events up to self.seq are now in the snapshot; start a fresh log
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.log_path, 'w', encoding='utf-8')
+            os.fsync(self._fh.fileno())
+            self.since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,146 @@
+"""Typed, slotted records for farm data.
+
+Records are validated and have their dates converted exactly once, when
+they enter the app (form submission, journal replay, JSON/SQLite load).
+Hot paths can then read attributes directly without defensive parsing.
+
+For compatibility with code written against the original dicts, records
+also support `record['field']`, `record.get('field')` and item assignment,
+and compare equal to a dict holding the same fields.
+"""
+import datetime
+
+
+def parse_date(value):
+    """Coerce a date, datetime or ISO string to a `datetime.date` (None stays None)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip())
+
+
+def parse_count(value):
+    """Coerce a count to a non-negative int (missing values count as 0)."""
+    n = int(value or 0)
+    if n < 0:
+        raise ValueError(f"Count must not be negative: {value!r}")
+    return n
+
+
+class Record:
+    __slots__ = ()
+    fields = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.fields else default
+
+    def keys(self):
+        return self.fields
+
+    def as_dict(self):
+        return {f: getattr(self, f) for f in self.fields}
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.as_dict() == other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.fields)})"
+
+    @classmethod
+    def coerce(cls, value):
+        """Return `value` as a record of this class, validating dict input."""
+        if isinstance(value, cls):
+            return value
+        return cls.from_mapping(value)
+
+
+class EggBatch(Record):
+    """Eggs set in the incubator on one date."""
+    __slots__ = fields = ('incubation_date', 'eggs')
+
+    def __init__(self, incubation_date, eggs):
+        self.incubation_date = incubation_date
+        self.eggs = eggs
+
+    @classmethod
+    def from_mapping(cls, m):
+        return cls(parse_date(m.get('incubation_date', m.get('date'))), parse_count(m.get('eggs')))
+
+
+class HatchRecord(Record):
+    __slots__ = fields = ('date', 'location', 'chicks')
+
+    def __init__(self, date, location, chicks):
+        self.date = date
+        self.location = location
+        self.chicks = chicks
+
+    @classmethod
+    def from_mapping(cls, m):
+        return cls(parse_date(m.get('date')), m.get('location'), parse_count(m.get('chicks')))
+
+
+class Order(Record):
+    __slots__ = fields = ('name', 'order_count', 'order_date', 'pickup_date', 'picked_up')
+
+    def __init__(self, name, order_count, order_date, pickup_date=None, picked_up=False):
+        self.name = name
+        self.order_count = order_count
+        self.order_date = order_date
+        self.pickup_date = pickup_date
+        self.picked_up = picked_up
+
+    @classmethod
+    def from_mapping(cls, m):
+        return cls(m.get('name'), parse_count(m.get('order_count')), parse_date(m.get('order_date')),
+                   parse_date(m.get('pickup_date')), bool(m.get('picked_up', False)))
+
+
+class Sale(Record):
+    __slots__ = fields = ('type', 'name', 'count', 'date')
+
+    def __init__(self, type, name, count, date):
+        self.type = type
+        self.name = name
+        self.count = count
+        self.date = date
+
+    @classmethod
+    def from_mapping(cls, m):
+        return cls(m.get('type'), m.get('name'), parse_count(m.get('count')), parse_date(m.get('date')))
+
+
+def normalise_list(items, cls):
+    """Replace any non-record entries of `items` in place with `cls` records."""
+    for i, item in enumerate(items):
+        if item.__class__ is not cls:
+            items[i] = cls.coerce(item)
+    return items
+
+
+def egg_batches(egg_inventory):
+    """EggBatch records for an {incubation_date: eggs} inventory, by date."""
+    return [EggBatch(d, n) for d, n in sorted(egg_inventory.items())]
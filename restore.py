@@ -0,0 +1,126 @@
+"""Restore farm data from export archives and incremental backups.
+
+CSV members are read row by row (out of the ZIP's deflate stream, or one
+chunk at a time for backup manifests) and parsed straight into records, so
+a restore never holds a whole CSV file in memory. Row counts are checked
+against the archive's metadata before anything is returned; the caller
+then swaps the finished state in as one step, so a bad archive leaves the
+current data untouched.
+"""
+import csv
+import io
+import json
+import zipfile
+
+import backups
+import exporter
+from farm_state import new_state
+from records import HatchRecord, Order, Sale, parse_count, parse_date
+
+
+class RestoreError(ValueError):
+    """The archive is incomplete or does not match its metadata."""
+
+
+def _egg_row(row):
+    return parse_date(row[0]), parse_count(row[1])
+
+
+def _hatch_row(row):
+    return HatchRecord(parse_date(row[0]), row[1] or None, parse_count(row[2]))
+
+
+def _order_row(row):
+    return Order(row[0], parse_count(row[1]), parse_date(row[2]), parse_date(row[3]), row[4] == 'True')
+
+
+def _sale_row(row):
+    return Sale(row[0], row[1], parse_count(row[2]), parse_date(row[3]))
+
+
+# member -> (row parser, state key)
+ROW_PARSERS = {
+    'egg_inventory.csv': (_egg_row, 'egg_inventory'),
+    'hatchery.csv': (_hatch_row, 'hatchery'),
+    'chicks_orders.csv': (_order_row, 'chicks_orders'),
+    'sales.csv': (_sale_row, 'sales'),
+}
+
+
+def _load_member(state, member, rows):
+    """Parse `rows` of one member into `state`. Returns the number of rows."""
+    parse, key = ROW_PARSERS[member]
+    target = state[key]
+    count = 0
+    try:
+        if key == 'egg_inventory':
+            for count, row in enumerate(rows, 1):
+                d, eggs = parse(row)
+                target[d] += eggs
+        else:
+            append = target.append
+            for count, row in enumerate(rows, 1):
+                append(parse(row))
+    except (ValueError, IndexError) as e:
+        raise RestoreError(f"{member}, row {count + 1}: {e}") from None
+    return count
+
+
+def _check_count(member, expected, actual):
+    if expected is not None and expected != actual:
+        raise RestoreError(f"{member}: expected {expected} rows, found {actual}")
+
+
+def restore_zip(fileobj):
+    """Read an export archive (file path or binary file object) into a new state."""
+    state = new_state()
+    try:
+        z = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise RestoreError(f"Not a ZIP archive: {e}") from None
+    with z:
+        names = set(z.namelist())
+        missing = [m for m in list(exporter.CSV_MEMBERS) + ['meta.json'] if m not in names]
+        if missing:
+            raise RestoreError(f"Archive is missing {', '.join(missing)}")
+        meta = json.loads(z.read('meta.json'))
+        # archives written before row counts were recorded are restored unchecked
+        counts = meta.get('counts', {})
+        for member, (header, _key) in exporter.CSV_MEMBERS.items():
+            with z.open(member) as raw:
+                reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+                if next(reader, None) != header:
+                    raise RestoreError(f"{member}: unexpected header")
+                _check_count(member, counts.get(member), _load_member(state, member, reader))
+    state['chicks_inventory'] = parse_count(meta.get('chicks_inventory'))
+    state['processed_hatch_dates'] = list(meta.get('processed_hatch_dates', []))
+    return state
+
+
+def restore_manifest(path, backup_dir):
+    """Read an incremental backup manifest (see backups.py) into a new state."""
+    manifest = backups.read_manifest(path)
+    chunks = backups.chunk_store(backup_dir)
+    state = new_state()
+    for member in ROW_PARSERS:
+        expected = sum(ref['rows'] for ref in manifest['tables'].get(member, []))
+        try:
+            actual = _load_member(state, member, backups.iter_member_rows(manifest, chunks, member))
+        except FileNotFoundError as e:
+            raise RestoreError(f"{member}: missing chunk {e.filename}") from None
+        _check_count(member, expected, actual)
+    try:
+        state['processed_hatch_dates'] = [
+            row[0] for row in backups.iter_member_rows(manifest, chunks, 'processed_hatch_dates.csv')
+        ]
+    except FileNotFoundError as e:
+        raise RestoreError(f"processed_hatch_dates.csv: missing chunk {e.filename}") from None
+    state['chicks_inventory'] = parse_count(manifest['meta'].get('chicks_inventory'))
+    return state
+
+
+def restore_backup(path, backup_dir):
+    """Restore either kind of file found in the backups directory."""
+    if path.endswith(backups.MANIFEST_SUFFIX):
+        return restore_manifest(path, backup_dir)
+    return restore_zip(path)
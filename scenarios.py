@@ -0,0 +1,160 @@
+"""What-if scenarios forked copy-on-write from the live farm data.
+
+A `Scenario` keeps references to the shared state instead of copies: the
+hatchery and order lists are only ever appended to, so remembering their
+lengths at fork time pins the scenario's view of them, and the egg
+inventory dict is replaced rather than mutated by commits. Hypothetical
+egg arrivals, hatches and orders live in small overlay containers on top,
+and `fork()` copies just those. Forecasts run the same allocation as the
+app without writing pickup dates into any order, so scenarios can be
+compared side by side while the real data stays untouched.
+
+Collecting an order updates the shared record in place, so the scenario
+also remembers which orders were collected at fork time; orders collected
+since then are planned as still open, matching the pinned chick inventory.
+"""
+import itertools
+
+from allocation import allocate_split, build_availability, plan_fifo
+from records import HatchRecord, Order
+
+WHAT_IF_LOCATION = 'What-if'
+
+
+class _ScenarioModels:
+    """Hatch models with the egg sources of a scenario's hypothetical batches."""
+
+    def __init__(self, models, egg_sources):
+        self.models = models
+        self.egg_sources = egg_sources
+
+    def model_for(self, incubation_date):
+        source = self.egg_sources.get(incubation_date)
+        if source is not None and incubation_date not in self.models.overrides and source in self.models.sources:
+            return self.models.sources[source]
+        return self.models.model_for(incubation_date)
+
+
+class Forecast:
+    """Pickup dates of one scenario, by `id()` of the order record."""
+    __slots__ = ('dates', 'open_orders', 'filled', 'last_pickup')
+
+    def __init__(self, plan, originals=None):
+        self.dates = {}
+        self.open_orders = self.filled = 0
+        self.last_pickup = None
+        originals = originals or {}
+        for order, pickup_date in plan:
+            self.dates[id(originals.get(id(order), order))] = pickup_date
+            if order.picked_up:
+                continue
+            self.open_orders += 1
+            if pickup_date is not None:
+                self.filled += 1
+                if self.last_pickup is None or pickup_date > self.last_pickup:
+                    self.last_pickup = pickup_date
+
+
+class Scenario:
+    def __init__(self, name, state, version=None):
+        self.name = name
+        # data version the scenario was forked from, for display
+        self.version = version
+        self._eggs = state['egg_inventory']
+        self._hatchery = state['hatchery']
+        self._hatchery_len = len(state['hatchery'])
+        self._orders = state['chicks_orders']
+        self._orders_len = len(state['chicks_orders'])
+        # positions of the orders already collected, pinned like the inventory
+        self._collected = frozenset(i for i, o in enumerate(self._orders) if o.picked_up)
+        self.chicks_inventory = state['chicks_inventory']
+        # the overlay: hypothetical additions only
+        self.eggs = {}
+        self.egg_sources = {}
+        self.hatches = []
+        self.orders = []
+        self.changes = []
+        self.revision = 0
+        self._cached = None
+
+    def fork(self, name):
+        """A new scenario sharing this one's base data and copying its additions."""
+        other = Scenario.__new__(Scenario)
+        other.__dict__.update(self.__dict__)
+        other.name = name
+        other.eggs = dict(self.eggs)
+        other.egg_sources = dict(self.egg_sources)
+        other.hatches = list(self.hatches)
+        other.orders = list(self.orders)
+        other.changes = list(self.changes)
+        other._cached = None
+        return other
+
+    def _changed(self, description):
+        self.changes.append(description)
+        self.revision += 1
+
+    def add_eggs(self, incubation_date, eggs, source=None):
+        self.eggs[incubation_date] = self.eggs.get(incubation_date, 0) + int(eggs)
+        if source is not None:
+            self.egg_sources[incubation_date] = source
+        self._changed(f"+{int(eggs)} eggs set on {incubation_date}" + (f" ({source})" if source else ""))
+
+    def add_hatch(self, hatch_date, chicks):
+        self.hatches.append(HatchRecord(hatch_date, WHAT_IF_LOCATION, int(chicks)))
+        self._changed(f"+{int(chicks)} chicks hatched on {hatch_date}")
+
+    def add_order(self, name, count, order_date):
+        order = Order(name, int(count), order_date)
+        self.orders.append(order)
+        self._changed(f"Order of {int(count)} chicks for {name} on {order_date}")
+        return order
+
+    def egg_inventory(self):
+        if not self.eggs:
+            return self._eggs
+        merged = dict(self._eggs)
+        for d, n in self.eggs.items():
+            merged[d] = merged.get(d, 0) + n
+        return merged
+
+    def hatchery(self):
+        return itertools.chain(itertools.islice(self._hatchery, self._hatchery_len), self.hatches)
+
+    def all_orders(self):
+        """The base orders as of the fork, followed by the hypothetical ones."""
+        return (order for order, _original in self._planned_orders())
+
+    def _planned_orders(self):
+        """`(order, original)` pairs; orders collected since the fork are open stand-ins."""
+        for i, order in enumerate(itertools.islice(self._orders, self._orders_len)):
+            if order.picked_up and i not in self._collected:
+                yield Order(order.name, order.order_count, order.order_date), order
+            else:
+                yield order, order
+        for order in self.orders:
+            yield order, order
+
+    def forecast(self, today, models=None, split=False, window_days=None):
+        """`Forecast` of pickup dates under this scenario, cached until it or the inputs change."""
+        key = (today, models.version if models is not None else None, split, window_days, self.revision)
+        if self._cached is not None and self._cached[0] == key:
+            return self._cached[1]
+        if models is not None and self.egg_sources:
+            models = _ScenarioModels(models, self.egg_sources)
+        availability = build_availability(self.chicks_inventory, self.hatchery(), self.egg_inventory(), today, models)
+        orders = []
+        originals = {}
+        for order, original in self._planned_orders():
+            orders.append(order)
+            if order is not original:
+                originals[id(order)] = original
+        if split:
+            fifo, parts = allocate_split(orders, availability, today, window_days or None, assign=False)
+            plan = [(o, parts[id(o)][-1][0] if parts.get(id(o)) else (o.pickup_date if o.picked_up else None))
+                    for o in fifo]
+        else:
+            plan = plan_fifo(orders, availability, today)
+        forecast = Forecast(plan, originals)
+        self._cached = (key, forecast)
+        return forecast
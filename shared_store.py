@@ -0,0 +1,128 @@
+"""Process-wide farm data store shared by every Streamlit session.
+
+One `SharedStore` holds the single in-memory copy of the farm state. Reads
+and writes are coordinated by a readers-writer lock, and every committed
+mutation bumps a monotonically increasing `version` so sessions can tell
+when the view they rendered last is stale.
+
+Sessions hold references to the store's collections rather than copies.
+Lists are only appended to, which is safe to iterate concurrently; the egg
+inventory dict is replaced copy-on-write because a dict resized during
+another thread's iteration raises.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from farm_state import apply_event, state_to_payload
+
+# events that add or remove egg_inventory keys
+_EGG_EVENTS = ('egg', 'auto_hatch', 'bulk')
+
+
+class RWLock:
+    """Readers-writer lock with writer preference; writes are re-entrant."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                # a writer may read its own data
+                self._depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class SharedStore:
+    """The single in-process copy of the farm state.
+
+    `derived` holds structures computed from the state (e.g. the forecast
+    engine) so that all sessions reuse one instance.
+    """
+
+    def __init__(self, state, journal=None):
+        self.state = state
+        self.journal = journal
+        self.version = 0
+        self.lock = RWLock()
+        self.derived = {}
+
+    def commit(self, event):
+        """Apply and journal one mutation atomically. Returns the new version."""
+        with self.lock.write():
+            if event['t'] in _EGG_EVENTS:
+                self.state['egg_inventory'] = defaultdict(int, self.state['egg_inventory'])
+            apply_event(self.state, event)
+            self.version += 1
+            if self.journal is not None:
+                self.journal.append(event)
+                if self.journal.snapshot_due():
+                    self.journal.snapshot(state_to_payload(self.state))
+            return self.version
+
+    def replace(self, state):
+        """Swap in a whole new state (e.g. after a load) and checkpoint it."""
+        with self.lock.write():
+            self.state = state
+            self.version += 1
+            if self.journal is not None:
+                self.journal.snapshot(state_to_payload(state))
+            return self.version
+
+    def view(self):
+        """Return `(version, shallow copy of the state mapping)` under a read lock."""
+        with self.lock.read():
+            return self.version, dict(self.state)
@@ -0,0 +1,260 @@
+"""Diff-based sync of the farm data to a spreadsheet.
+
+Each table is one worksheet laid out like the CSV export (header row, then
+one row per record). `SheetsSync` remembers the values it last wrote and on
+every sync sends only the rows that changed, grouped into contiguous ranges
+and packed into a few batched write calls. Rate-limit errors are retried
+with exponential backoff.
+
+The spreadsheet itself sits behind a transport with two methods:
+
+- `get_values(sheet)` -> list of rows (lists of strings), [] if missing
+- `batch_update(updates)` with `updates` a list of `(sheet, first_row, rows)`,
+  rows 1-based, written in one request
+
+`GspreadTransport` talks to Google Sheets through one authorised gspread
+client; `FakeSheetTransport` keeps the sheets in memory for tests.
+"""
+import json
+import random
+import threading
+import time
+
+import exporter
+import restore
+from farm_state import new_state
+from records import parse_count
+
+# worksheet -> export member
+SHEETS = {member[:-len('.csv')]: member for member in exporter.CSV_MEMBERS}
+META_SHEET = 'meta'
+MAX_RANGES_PER_BATCH = 100
+MAX_CELLS_PER_BATCH = 40000
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+
+
+class RateLimitError(Exception):
+    """The transport was throttled; the request may be retried later."""
+
+
+def _cell(value):
+    return '' if value is None else str(value)
+
+
+def sheet_rows(state):
+    """{worksheet: rows including the header} for `state`, all values as strings."""
+    sheets = {}
+    for sheet, member in SHEETS.items():
+        header = exporter.CSV_MEMBERS[member][0]
+        sheets[sheet] = [list(header)] + [[_cell(v) for v in row] for row in exporter.iter_rows(state, member)]
+    sheets[META_SHEET] = [
+        ['key', 'value'],
+        ['chicks_inventory', str(state['chicks_inventory'])],
+        ['processed_hatch_dates', json.dumps(list(state['processed_hatch_dates']))],
+    ]
+    return sheets
+
+
+def changed_ranges(old, new):
+    """`(first_row, rows)` runs (1-based) that turn sheet `old` into `new`.
+
+    Rows past the end of `new` that `old` still has are blanked out.
+    """
+    width = max([len(r) for r in old[len(new):]] + [0])
+    ranges = []
+    start = None
+    run = []
+    for i in range(max(len(old), len(new))):
+        if i < len(new):
+            row = new[i]
+            same = i < len(old) and old[i] == row
+        else:
+            row = [''] * width
+            same = False
+        if same:
+            if run:
+                ranges.append((start + 1, run))
+                run = []
+            continue
+        if not run:
+            start = i
+        run.append(row)
+    if run:
+        ranges.append((start + 1, run))
+    return ranges
+
+
+def _batches(updates):
+    batch = []
+    cells = 0
+    for update in updates:
+        size = sum(len(r) for r in update[2])
+        if batch and (len(batch) >= MAX_RANGES_PER_BATCH or cells + size > MAX_CELLS_PER_BATCH):
+            yield batch
+            batch, cells = [], 0
+        batch.append(update)
+        cells += size
+    if batch:
+        yield batch
+
+
+class SheetsSync:
+    """Pushes the state to a transport, sending only what changed since the last sync."""
+
+    def __init__(self, transport, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, sleep=time.sleep):
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._sleep = sleep
+        self._synced = None
+        self._lock = threading.Lock()
+        self.last_stats = None
+
+    def _call(self, fn, *args):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args)
+            except RateLimitError:
+                if attempt == self.max_retries:
+                    raise
+                self._sleep(self.backoff_base * 2 ** attempt * (1 + random.random() / 2))
+
+    def _remote(self):
+        return {sheet: self._call(self.transport.get_values, sheet) for sheet in list(SHEETS) + [META_SHEET]}
+
+    def sync(self, state):
+        """Write changed rows of `state`. Returns stats: rows, ranges and write calls."""
+        with self._lock:
+            if self._synced is None:
+                # first sync: diff against what the spreadsheet holds now
+                self._synced = self._remote()
+            target = sheet_rows(state)
+            updates = []
+            for sheet, rows in target.items():
+                for first_row, run in changed_ranges(self._synced.get(sheet, []), rows):
+                    updates.append((sheet, first_row, run))
+            calls = 0
+            for batch in _batches(updates):
+                self._call(self.transport.batch_update, batch)
+                calls += 1
+                for sheet, first_row, run in batch:
+                    synced = self._synced.setdefault(sheet, [])
+                    end = first_row - 1 + len(run)
+                    if len(synced) < end:
+                        synced.extend([[]] * (end - len(synced)))
+                    synced[first_row - 1:end] = run
+            for sheet, rows in target.items():
+                # blanked tail rows are gone as far as the next diff is concerned
+                del self._synced[sheet][len(rows):]
+            self.last_stats = {
+                'rows': sum(len(run) for _sheet, _first, run in updates),
+                'ranges': len(updates),
+                'calls': calls,
+            }
+            return self.last_stats
+
+    def load(self):
+        """Read the spreadsheet into a new state; it becomes the sync baseline."""
+        with self._lock:
+            remote = self._remote()
+            state = new_state()
+            for sheet, member in SHEETS.items():
+                rows = [r for r in remote.get(sheet, [])[1:] if any(r)]
+                width = len(exporter.CSV_MEMBERS[member][0])
+                restore._load_member(state, member, (r + [''] * (width - len(r)) for r in rows))
+            meta = {r[0]: r[1] for r in remote.get(META_SHEET, [])[1:] if len(r) >= 2}
+            state['chicks_inventory'] = parse_count(meta.get('chicks_inventory'))
+            state['processed_hatch_dates'] = json.loads(meta.get('processed_hatch_dates') or '[]')
+            self._synced = remote
+            return state
+
+
+class FakeSheetTransport:
+    """In-memory spreadsheet recording every call, for tests and offline use.
+
+    `throttle` makes that many upcoming calls raise RateLimitError.
+    """
+
+    def __init__(self, sheets=None, throttle=0):
+        self.sheets = {name: [list(r) for r in rows] for name, rows in (sheets or {}).items()}
+        self.throttle = throttle
+        self.calls = []
+
+    def _maybe_throttle(self):
+        if self.throttle:
+            self.throttle -= 1
+            raise RateLimitError("429: quota exceeded")
+
+    def get_values(self, sheet):
+        self.calls.append(('get_values', sheet))
+        self._maybe_throttle()
+        return [list(r) for r in self.sheets.get(sheet, [])]
+
+    def batch_update(self, updates):
+        self.calls.append(('batch_update', len(updates)))
+        self._maybe_throttle()
+        for sheet, first_row, rows in updates:
+            target = self.sheets.setdefault(sheet, [])
+            end = first_row - 1 + len(rows)
+            if len(target) < end:
+                target.extend([[] for _ in range(end - len(target))])
+            target[first_row - 1:end] = [list(r) for r in rows]
+        for target in self.sheets.values():
+            # like the Sheets API, blank trailing rows read back as nothing
+            while target and not any(target[-1]):
+                target.pop()
+
+
+class GspreadTransport:
+    """Google Sheets via gspread; one authorised client and spreadsheet handle are reused."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self._worksheets = {}
+
+    @classmethod
+    def from_service_account(cls, info, spreadsheet_name):
+        import gspread
+
+        client = gspread.service_account_from_dict(dict(info))
+        try:
+            spreadsheet = client.open(spreadsheet_name)
+        except gspread.SpreadsheetNotFound:
+            spreadsheet = client.create(spreadsheet_name)
+        return cls(spreadsheet)
+
+    def _translate(self, fn, *args, **kwargs):
+        import gspread
+
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if getattr(e.response, 'status_code', None) == 429:
+                raise RateLimitError(str(e)) from e
+            raise
+
+    def _worksheet(self, sheet):
+        ws = self._worksheets.get(sheet)
+        if ws is None:
+            import gspread
+
+            try:
+                ws = self._translate(self.spreadsheet.worksheet, sheet)
+            except gspread.WorksheetNotFound:
+                ws = self._translate(self.spreadsheet.add_worksheet, sheet, rows=1000, cols=10)
+            self._worksheets[sheet] = ws
+        return ws
+
+    def get_values(self, sheet):
+        return self._translate(self._worksheet(sheet).get_all_values)
+
+    def batch_update(self, updates):
+        for sheet, first_row, rows in updates:
+            ws = self._worksheet(sheet)
+            end = first_row - 1 + len(rows)
+            if ws.row_count < end:
+                # the grid must be large enough before values can be written
+                self._translate(ws.add_rows, max(end - ws.row_count, 1000))
+        data = [{'range': f"'{sheet}'!A{first_row}", 'values': rows} for sheet, first_row, rows in updates]
+        self._translate(self.spreadsheet.values_batch_update, {'valueInputOption': 'RAW', 'data': data})
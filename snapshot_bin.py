@@ -0,0 +1,231 @@
+"""Compact binary snapshot of the farm state.
+
+An alternative to the `.streamlit/data.json` layout that is cheap to load:
+dates are int32 ordinals (0 for "no date"), counts fixed-width integers and
+every name, location and sale type an index into one interned string
+table. Loading memory-maps the file, reads each table as a NumPy
+structured array without parsing, and `to_state()` builds the app's
+records column by column, decoding each distinct string and date once.
+The app keeps the whole state in memory, so every record is built on load.
+
+Layout (little-endian): header, string offsets (uint32, n + 1), UTF-8
+string data padded to 4 bytes, then the egg, hatchery, order, sale and
+processed-date tables back to back.
+"""
+import datetime
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from farm_state import new_state, payload_to_state, state_to_payload
+from records import HatchRecord, Order, Sale
+
+MAGIC = b'FARMSNP\0'
+FORMAT_VERSION = 1
+SUFFIX = '.farmsnap'
+
+# magic, version, reserved, strings, string bytes, eggs, hatches, orders, sales, processed, chicks_inventory
+HEADER = struct.Struct('<8sHHIIIIIIIq')
+
+EGG_DTYPE = np.dtype([('date', '<i4'), ('eggs', '<i4')])
+HATCH_DTYPE = np.dtype([('date', '<i4'), ('location', '<i4'), ('chicks', '<i4')])
+ORDER_DTYPE = np.dtype([('name', '<i4'), ('order_count', '<i4'), ('order_date', '<i4'),
+                        ('pickup_date', '<i4'), ('picked_up', 'u1'), ('_pad', 'V3')])
+SALE_DTYPE = np.dtype([('type', '<i4'), ('name', '<i4'), ('count', '<i4'), ('date', '<i4')])
+PROCESSED_DTYPE = np.dtype('<i4')
+
+# state key -> dtype, in file order
+TABLES = (
+    ('egg_inventory', EGG_DTYPE),
+    ('hatchery', HATCH_DTYPE),
+    ('chicks_orders', ORDER_DTYPE),
+    ('sales', SALE_DTYPE),
+    ('processed_hatch_dates', PROCESSED_DTYPE),
+)
+
+
+def _ord(d):
+    return d.toordinal() if d else 0
+
+
+class _Strings:
+    """Interning table: each distinct string is stored once; None is -1."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def __call__(self, s):
+        if s is None:
+            return -1
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+
+def write_snapshot(state, path):
+    """Write `state` to `path` in the binary format."""
+    intern = _Strings()
+    tables = {
+        'egg_inventory': np.array([(_ord(d), n) for d, n in state['egg_inventory'].items()], dtype=EGG_DTYPE),
+        'hatchery': np.array([(_ord(h.get('date')), intern(h.get('location')), h.get('chicks') or 0)
+                              for h in state['hatchery']], dtype=HATCH_DTYPE),
+        'chicks_orders': np.array([(intern(o.get('name')), o.get('order_count') or 0, _ord(o.get('order_date')),
+                                    _ord(o.get('pickup_date')), bool(o.get('picked_up')), b'')
+                                   for o in state['chicks_orders']], dtype=ORDER_DTYPE),
+        'sales': np.array([(intern(s.get('type')), intern(s.get('name')), s.get('count') or 0, _ord(s.get('date')))
+                           for s in state['sales']], dtype=SALE_DTYPE),
+        'processed_hatch_dates': np.array([datetime.date.fromisoformat(d).toordinal()
+                                           for d in state['processed_hatch_dates']], dtype=PROCESSED_DTYPE),
+    }
+    encoded = [s.encode('utf-8') for s in intern.values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = b''.join(encoded)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(encoded), len(blob),
+                         *(len(tables[key]) for key, _dtype in TABLES), int(state['chicks_inventory']))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(offsets.tobytes())
+        f.write(blob + b'\0' * (-len(blob) % 4))
+        for key, _dtype in TABLES:
+            f.write(tables[key].tobytes())
+    os.replace(tmp, path)
+
+
+class SnapshotFile:
+    """A memory-mapped binary snapshot. Use as a context manager or call `close()`."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.tables = {}
+        self._offsets = None
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        mm = self._mm
+        if len(mm) < HEADER.size:
+            raise ValueError("File is too short to be a farm snapshot")
+        (magic, version, _reserved, n_strings, blob_len, *counts, inventory) = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a farm snapshot file")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Snapshot format {version} is newer than supported ({FORMAT_VERSION})")
+        pos = HEADER.size
+        self._offsets = np.frombuffer(mm, dtype='<u4', count=n_strings + 1, offset=pos)
+        pos += self._offsets.nbytes
+        self._blob_start = pos
+        pos += blob_len + (-blob_len % 4)
+        expected = pos + sum(n * dtype.itemsize for n, (_key, dtype) in zip(counts, TABLES))
+        if len(mm) != expected:
+            raise ValueError(f"Snapshot is {len(mm)} bytes, expected {expected}")
+        self.tables = {}
+        for n, (key, dtype) in zip(counts, TABLES):
+            self.tables[key] = np.frombuffer(mm, dtype=dtype, count=n, offset=pos)
+            pos += n * dtype.itemsize
+        self.chicks_inventory = inventory
+        self._strings = [None] * n_strings
+        self._dates = {}
+
+    def string(self, i):
+        if i < 0:
+            return None
+        s = self._strings[i]
+        if s is None:
+            start = self._blob_start + int(self._offsets[i])
+            end = self._blob_start + int(self._offsets[i + 1])
+            s = self._strings[i] = self._mm[start:end].decode('utf-8')
+        return s
+
+    def date(self, n):
+        if not n:
+            return None
+        d = self._dates.get(n)
+        if d is None:
+            d = self._dates[n] = datetime.date.fromordinal(n)
+        return d
+
+    def to_state(self):
+        """A regular (mutable) state with every record built, column by column."""
+        state = new_state()
+        t = self.tables
+        date, string = self.date, self.string
+        eggs = state['egg_inventory']
+        for d, n in zip(t['egg_inventory']['date'].tolist(), t['egg_inventory']['eggs'].tolist()):
+            eggs[date(d)] += n
+        h = t['hatchery']
+        state['hatchery'] = [
+            HatchRecord(date(d), string(loc), n)
+            for d, loc, n in zip(h['date'].tolist(), h['location'].tolist(), h['chicks'].tolist())
+        ]
+        o = t['chicks_orders']
+        state['chicks_orders'] = [
+            Order(string(name), n, date(od), date(pd), bool(p))
+            for name, n, od, pd, p in zip(o['name'].tolist(), o['order_count'].tolist(), o['order_date'].tolist(),
+                                          o['pickup_date'].tolist(), o['picked_up'].tolist())
+        ]
+        s = t['sales']
+        state['sales'] = [
+            Sale(string(kind), string(name), n, date(d))
+            for kind, name, n, d in zip(s['type'].tolist(), s['name'].tolist(), s['count'].tolist(),
+                                        s['date'].tolist())
+        ]
+        state['processed_hatch_dates'] = [date(d).isoformat() for d in t['processed_hatch_dates'].tolist()]
+        state['chicks_inventory'] = self.chicks_inventory
+        return state
+
+    def close(self):
+        # views into the map must go before it can be closed
+        self.tables = {}
+        self._offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # a caller still holds a view; the map is released with it
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_snapshot(path):
+    """Read a binary snapshot into a new state."""
+    with SnapshotFile(path) as snap:
+        return snap.to_state()
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        write_snapshot(payload_to_state(json.load(f)), snapshot_path)
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(state_to_payload(load_snapshot(snapshot_path)), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert between data.json and the binary snapshot format.")
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+    if args.source.endswith(SUFFIX):
+        snapshot_to_json(args.source, args.target)
+    else:
+        json_to_snapshot(args.source, args.target)
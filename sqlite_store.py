@@ -0,0 +1,218 @@
+"""Embedded SQLite storage backend for farm data.
+
+Replaces the whole-file JSON rewrite with one table per dataset. Dates are
+stored as integer ordinals (indexed), so loading needs no string parsing.
+`save()` diffs the state against what was last written or read and only
+touches changed rows, so the database writes stay small even though the
+rows are rebuilt from the in-memory state on every save. `load()` can be
+limited to the datasets a caller needs.
+
+List datasets (hatchery, chicks_orders, sales) are keyed by their position
+in the in-memory list, which the app only ever appends to.
+"""
+import datetime
+import sqlite3
+import threading
+from collections import defaultdict
+
+from records import HatchRecord, Order, Sale
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS egg_inventory (
+    incubation_date INTEGER PRIMARY KEY,
+    eggs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hatchery (
+    seq INTEGER PRIMARY KEY,
+    date INTEGER,
+    location TEXT,
+    chicks INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hatchery_date ON hatchery(date);
+CREATE TABLE IF NOT EXISTS chicks_orders (
+    seq INTEGER PRIMARY KEY,
+    name TEXT,
+    order_count INTEGER NOT NULL,
+    order_date INTEGER,
+    pickup_date INTEGER,
+    picked_up INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_order_date ON chicks_orders(order_date);
+CREATE INDEX IF NOT EXISTS idx_orders_pickup_date ON chicks_orders(pickup_date);
+CREATE TABLE IF NOT EXISTS sales (
+    seq INTEGER PRIMARY KEY,
+    type TEXT,
+    name TEXT,
+    count INTEGER NOT NULL,
+    date INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date);
+CREATE TABLE IF NOT EXISTS processed_hatch_dates (
+    incubation_date INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# table -> (key column, value columns)
+TABLES = {
+    'egg_inventory': ('incubation_date', ('eggs',)),
+    'hatchery': ('seq', ('date', 'location', 'chicks')),
+    'chicks_orders': ('seq', ('name', 'order_count', 'order_date', 'pickup_date', 'picked_up')),
+    'sales': ('seq', ('type', 'name', 'count', 'date')),
+    'processed_hatch_dates': ('incubation_date', ()),
+    'meta': ('key', ('value',)),
+}
+
+# state key -> table holding it
+STATE_TABLES = {
+    'egg_inventory': 'egg_inventory',
+    'hatchery': 'hatchery',
+    'chicks_orders': 'chicks_orders',
+    'chicks_inventory': 'meta',
+    'sales': 'sales',
+    'processed_hatch_dates': 'processed_hatch_dates',
+}
+
+
+def to_ordinal(d):
+    """Date (or ISO date string) to an ordinal; None for missing values."""
+    if d is None or d == '':
+        return None
+    if isinstance(d, str):
+        d = datetime.date.fromisoformat(d)
+    return d.toordinal()
+
+
+def from_ordinal(n):
+    return datetime.date.fromordinal(n) if n is not None else None
+
+
+def state_rows(state, table):
+    """Return {key: row tuple} for one table from an in-memory state mapping."""
+    if table == 'egg_inventory':
+        return {to_ordinal(k): (int(v),) for k, v in state['egg_inventory'].items()}
+    if table == 'hatchery':
+        return {
+            i: (to_ordinal(h.get('date')), h.get('location'), int(h.get('chicks', 0) or 0))
+            for i, h in enumerate(state['hatchery'])
+        }
+    if table == 'chicks_orders':
+        return {
+            i: (o.get('name'), int(o.get('order_count', 0) or 0), to_ordinal(o.get('order_date')),
+                to_ordinal(o.get('pickup_date')), int(bool(o.get('picked_up'))))
+            for i, o in enumerate(state['chicks_orders'])
+        }
+    if table == 'sales':
+        return {
+            i: (s.get('type'), s.get('name'), int(s.get('count', 0) or 0), to_ordinal(s.get('date')))
+            for i, s in enumerate(state['sales'])
+        }
+    if table == 'processed_hatch_dates':
+        return {to_ordinal(k): () for k in state['processed_hatch_dates']}
+    if table == 'meta':
+        return {'chicks_inventory': (str(int(state['chicks_inventory'] or 0)),)}
+    raise KeyError(table)
+
+
+class SQLiteStore:
+    """Farm data persisted in a single SQLite file (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        # table -> {key: row} as last written to / read from the database
+        self._synced = {}
+        # sessions share the connection; one save or load at a time
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        with self._lock:
+            cur = self.conn.execute("SELECT COUNT(*) FROM meta WHERE key = 'chicks_inventory'")
+            return cur.fetchone()[0] == 0
+
+    def _read_rows(self, table):
+        key, cols = TABLES[table]
+        rows = {}
+        for rec in self.conn.execute(f'SELECT {", ".join((key,) + cols)} FROM {table}'):
+            rows[rec[0]] = tuple(rec[1:])
+        return rows
+
+    def save(self, state):
+        """Write only rows that differ from the database. Returns rows written.
+
+        The whole save is one transaction; the rows it wrote are remembered
+        only once it has committed.
+        """
+        with self._lock:
+            written = 0
+            synced = {}
+            try:
+                with self.conn:
+                    for table, (key, cols) in TABLES.items():
+                        new = state_rows(state, table)
+                        old = self._synced.get(table)
+                        if old is None:
+                            old = self._read_rows(table)
+                        changed = [(k,) + row for k, row in new.items() if old.get(k) != row]
+                        removed = [(k,) for k in old.keys() - new.keys()]
+                        if changed:
+                            placeholders = ', '.join('?' * (len(cols) + 1))
+                            self.conn.executemany(
+                                f'INSERT OR REPLACE INTO {table} ({", ".join((key,) + cols)}) VALUES ({placeholders})',
+                                changed,
+                            )
+                        if removed:
+                            self.conn.executemany(f'DELETE FROM {table} WHERE {key} = ?', removed)
+                        written += len(changed) + len(removed)
+                        synced[table] = new
+            except BaseException:
+                # the transaction rolled back; diff against the database next time
+                self._synced.clear()
+                raise
+            self._synced.update(synced)
+            return written
+
+    def load(self, keys=None):
+        """Return the stored state, or only the state `keys` a caller needs (default: all)."""
+        keys = list(STATE_TABLES) if keys is None else list(keys)
+        with self._lock:
+            rows = {}
+            for state_key in keys:
+                table = STATE_TABLES[state_key]
+                rows[state_key] = self._synced[table] = self._read_rows(table)
+        state = {}
+        for state_key, table_rows in rows.items():
+            state[state_key] = _LOADERS[state_key](table_rows)
+        return state
+
+
+def _load_eggs(rows):
+    eggs = defaultdict(int)
+    for k, (v,) in rows.items():
+        eggs[from_ordinal(k)] = v
+    return eggs
+
+
+# state key -> function building it from its table's {key: row}
+_LOADERS = {
+    'egg_inventory': _load_eggs,
+    'hatchery': lambda rows: [
+        HatchRecord(from_ordinal(d), loc, chicks) for _, (d, loc, chicks) in sorted(rows.items())
+    ],
+    'chicks_orders': lambda rows: [
+        Order(name, count, from_ordinal(od), from_ordinal(pd), bool(picked))
+        for _, (name, count, od, pd, picked) in sorted(rows.items())
+    ],
+    'chicks_inventory': lambda rows: int(rows.get('chicks_inventory', ('0',))[0]),
+    'sales': lambda rows: [Sale(t, name, count, from_ordinal(d)) for _, (t, name, count, d) in sorted(rows.items())],
+    'processed_hatch_dates': lambda rows: [from_ordinal(k).isoformat() for k in sorted(rows)],
+}
@@ -1,31 +1,160 @@
 import streamlit as st
 import datetime
-from collections import defaultdict
 import json
 import io
-import csv
-import zipfile
 import os
-import shutil
-
-# Initialize session state
-if 'egg_inventory' not in st.session_state:
-    # Format: {incubation_date: number_of_eggs}
-    st.session_state.egg_inventory = defaultdict(int)
-if 'hatchery' not in st.session_state:
-    # Format: {date: {"location": ..., "chicks": ...}}
-    st.session_state.hatchery = []
-if 'chicks_orders' not in st.session_state:
-    # List of dicts: {name, order_count, order_date, pickup_date, picked_up}
-    st.session_state.chicks_orders = []
-if 'chicks_inventory' not in st.session_state:
-    st.session_state.chicks_inventory = 0
-if 'sales' not in st.session_state:
-    # Each sale: {type: "chick/cock/pol", name, count, date}
-    st.session_state.sales = []
-if 'processed_hatch_dates' not in st.session_state:
-    # Track incubation dates that have already been processed into chicks
-    st.session_state.processed_hatch_dates = []
+import time
+
+from allocation import IncrementalAllocator, allocate_split, build_availability
+from sqlite_store import SQLiteStore
+import farm_state
+from farm_state import STATE_KEYS, apply_event, payload_to_state, state_to_payload
+from journal import Journal
+from shared_store import SharedStore
+from records import egg_batches
+from aggregates import availability_table, cached_summary
+import exporter
+import backups
+import restore
+import snapshot_bin
+import sheets_sync
+import tables
+from bulk_import import BulkImport
+from instrumentation import timings
+from backup_scheduler import BackupScheduler
+from customers import CustomerIndex
+import hatching
+import hatch_models
+from scenarios import Scenario
+
+_rerun_started = time.perf_counter()
+
+JOURNAL_DIR = os.path.join('.streamlit', 'journal')
+HATCH_MODELS_PATH = os.path.join('.streamlit', 'hatch_models.json')
+
+
+@st.cache_resource
+def get_journal():
+    """Process-wide mutation journal (one log file shared by all sessions)."""
+    return Journal(JOURNAL_DIR)
+
+
+def recover_state():
+    """Latest journal snapshot plus replayed journal tail, or an empty state for a new farm.
+
+    When an existing journal can't be read the script stops rather than
+    starting from an empty state, which the next snapshot would write over
+    the data recovery failed to read.
+    """
+    journal = get_journal()
+    if not journal.exists():
+        return farm_state.new_state()
+    try:
+        payload, events = journal.recover()
+        state = payload_to_state(payload) if payload else farm_state.new_state()
+        for event in events:
+            apply_event(state, event)
+        return state
+    except Exception as e:
+        st.error(f"Error recovering journal: {e}. The files in {JOURNAL_DIR} were left untouched; "
+                 "repair or move them aside and reload the page.")
+        st.stop()
+
+
+@st.cache_resource
+def get_shared_store():
+    """One copy of the farm data per server process, shared by every session."""
+    store = SharedStore(recover_state(), journal=get_journal())
+    # Allocation state kept between reruns so only affected orders are re-forecast
+    store.derived['forecast_engine'] = IncrementalAllocator()
+    # process-wide, since pickup dates are written into the shared orders
+    store.derived['allocation_policy'] = {'split': False, 'window_days': 7}
+    store.derived['customer_index'] = CustomerIndex()
+    try:
+        models = hatch_models.HatchModels.load(HATCH_MODELS_PATH)
+    except Exception:
+        # an unreadable file falls back to the defaults until the models are saved again
+        models = hatch_models.HatchModels()
+    store.derived['hatch_models'] = models
+    store.derived['hatch_queue'] = hatching.HatchQueue(models)
+    return store
+
+
+def get_hatch_models():
+    return get_shared_store().derived['hatch_models']
+
+
+def save_hatch_models():
+    """Persist the hatch models after a change and re-schedule incubating batches."""
+    store = get_shared_store()
+    try:
+        store.derived['hatch_models'].save(HATCH_MODELS_PATH)
+    except Exception as e:
+        st.error(f"Error saving hatch models: {e}")
+    store.derived['hatch_queue'].invalidate()
+
+
+def bind_session_state():
+    """Point this session at the shared data (references, not copies).
+
+    Returns True when another session changed the data since this session
+    last rendered it.
+    """
+    store = get_shared_store()
+    with store.lock.read():
+        for k in STATE_KEYS:
+            st.session_state[k] = store.state[k]
+        st.session_state.forecast_engine = store.derived['forecast_engine']
+        version = store.version
+    stale = st.session_state.get('data_version', version) != version
+    st.session_state.data_version = version
+    return stale
+
+
+def commit_event(event):
+    """Apply a mutation to the shared data and record it in the journal."""
+    try:
+        get_shared_store().commit(event)
+        timings.count(f"event: {event['t']}")
+    except Exception as e:
+        st.error(f"Error saving change: {e}")
+    bind_session_state()
+    if event['t'] in CUSTOMER_EVENTS:
+        get_customer_index()
+
+
+def replace_state(state):
+    """Swap the shared data for a freshly loaded state and checkpoint the journal."""
+    get_shared_store().replace(state)
+    bind_session_state()
+
+
+# events that add orders or sales, and so customers
+CUSTOMER_EVENTS = ('order', 'sale', 'bulk')
+
+
+def get_customer_index():
+    """The shared customer index, caught up with orders and sales added since its last use."""
+    store = get_shared_store()
+    with store.lock.read():
+        return store.derived['customer_index'].refresh(store.state['chicks_orders'], store.state['sales'])
+
+
+def order_position(order):
+    """Index of `order` in the shared chicks_orders, found through its customer's orders.
+
+    None when the record is no longer there (e.g. the data was reloaded by
+    another session since this page was rendered).
+    """
+    customer = get_customer_index().get(order['name'])
+    if customer is None:
+        return None
+    orders = get_shared_store().state['chicks_orders']
+    return next((i for i in customer.orders if i < len(orders) and orders[i] is order), None)
+
+
+# Initialize session state from the shared store (recovered from the journal on first use)
+_data_changed_elsewhere = bind_session_state()
 
 # Utility: Calculate available chicks and forecast pickup dates
 def get_total_eggs(current_date=None):
@@ -34,128 +163,137 @@ def get_total_eggs(current_date=None):
     eggs = sum(val for incubation_date, val in st.session_state.egg_inventory.items() if incubation_date <= current_date)
     return eggs
 
-def forecast_pickup_dates():
-    # Orders sorted by order date (FIFO)
-    all_orders = sorted(st.session_state.chicks_orders, key=lambda x: x.get('order_date') or datetime.date.min)
-    today = datetime.date.today()
-
-    # Build availability by date combining:
-    # - current chicks inventory (available today)
-    # - scheduled hatchery entries (future hatch dates)
-    # - incubating eggs forecast (incubation_date + 3 weeks, 85% hatch rate)
-    from collections import defaultdict
-    availability = defaultdict(int)
-    # current immediate inventory
-    try:
-        availability[today] += int(st.session_state.get('chicks_inventory', 0) or 0)
-    except Exception:
-        availability[today] += 0
+def get_forecast_engine():
+    engine = st.session_state.get('forecast_engine')
+    if engine is None:
+        engine = st.session_state.forecast_engine = IncrementalAllocator()
+    return engine
 
-    # hatchery scheduled hatches
-    for h in st.session_state.get('hatchery', []):
-        d = h.get('date')
-        try:
-            if isinstance(d, str):
-                d = datetime.datetime.strptime(d, "%Y-%m-%d").date()
-        except Exception:
-            continue
-        if not isinstance(d, datetime.date):
-            continue
-        if d >= today:
-            availability[d] += int(h.get('chicks', 0) or 0)
-
-    # eggs in incubator forecast
-    for incubation_date, egg_count in st.session_state.egg_inventory.items():
-        try:
-            hatch_day = incubation_date + datetime.timedelta(weeks=3)
-        except Exception:
-            # skip invalid keys
-            continue
-        if hatch_day >= today:
-            hatched_chicks = int(egg_count * 0.85)
-            availability[hatch_day] += hatched_chicks
-
-    # Copy availability to a mutable stock map
-    stock = {d: availability[d] for d in sorted(availability.keys())}
-
-    # Allocate orders in FIFO order. Each order must be fully satisfied from a single date (no split).
-    for order in all_orders:
-        # do not change pickup info for already collected orders
-        if order.get('picked_up'):
-            continue
-        order_qty = int(order.get('order_count', 0) or 0)
-        order['pickup_date'] = None
-        if order_qty <= 0:
-            continue
-        # earliest allowable pickup is max(order_date, today)
-        od = order.get('order_date')
-        if not isinstance(od, datetime.date):
-            od = today
-        earliest_allowed = max(today, od)
-        # find earliest date in stock where we can fully satisfy the order
-        for d in sorted(stock.keys()):
-            if d < earliest_allowed:
-                continue
-            if stock.get(d, 0) >= order_qty:
-                stock[d] -= order_qty
-                order['pickup_date'] = d
-                break
-
-    return all_orders
 
+@timings.timed()
+def forecast_pickup_dates():
+    """Assign pickup dates to open orders (FIFO) and return them sorted.
 
+    Without split pickups the engine keeps its allocation between reruns and
+    only re-allocates the suffix of orders affected by new orders, stock
+    changes or pickups. With split pickups the allocation is recomputed
+    whenever the data, the hatch models or the policy change.
+    """
+    today = datetime.date.today()
+    store = get_shared_store()
+    policy = store.derived['allocation_policy']
+    # the allocators write pickup dates into the shared orders
+    with store.lock.write():
+        models = get_hatch_models()
+        availability = build_availability(
+            st.session_state.get('chicks_inventory', 0),
+            st.session_state.get('hatchery', []),
+            st.session_state.egg_inventory,
+            today,
+            models,
+        )
+        engine = get_forecast_engine()
+        if not policy['split']:
+            store.derived.pop('split_allocation', None)
+            return engine.refresh(st.session_state.chicks_orders, availability, today)
+        orders = st.session_state.chicks_orders
+        key = (store.version, models.version, today, policy['window_days'], id(orders), len(orders))
+        cached = store.derived.get('split_allocation')
+        if cached is None or cached[0] != key:
+            fifo, parts = allocate_split(orders, availability, today, policy['window_days'] or None)
+            cached = store.derived['split_allocation'] = (key, fifo, parts)
+            # the split pass overwrote the engine's pickup dates
+            engine.invalidate()
+        return list(cached[1])
+
+
+def split_parts():
+    """`{id(order): [(date, qty), ...]}` of the open orders when pickups are split, else None."""
+    cached = get_shared_store().derived.get('split_allocation')
+    return cached[2] if cached is not None else None
+
+
+def allocated_pairs(orders):
+    """`(date, qty)` allocations for the availability table when pickups are split, else None."""
+    parts = split_parts()
+    if parts is None:
+        return None
+    pairs = []
+    for order in orders:
+        order_parts = parts.get(id(order))
+        if order_parts is not None:
+            pairs.extend(order_parts)
+        elif order['pickup_date'] is not None:
+            pairs.append((order['pickup_date'], order['order_count']))
+    return pairs
+
+
+@timings.timed()
+def get_summary():
+    """Panel totals and series, rebuilt only when the data or the forecast changed."""
+    store = get_shared_store()
+    models = get_hatch_models()
+    policy = store.derived['allocation_policy']
+    key = (store.version, get_forecast_engine().generation, models.version, policy['split'], policy['window_days'])
+    with store.lock.read():
+        return cached_summary(store.derived, st.session_state, key, models)
+
+
+@timings.timed()
+def forecast_pickup_ranges(runs):
+    """P50/P90 pickup dates of the open orders over `runs` hatch scenarios.
+
+    Cached until the data, the hatch models or the day change; the seed is
+    the data version so the same data always gives the same dates.
+    """
+    store = get_shared_store()
+    models = get_hatch_models()
+    today = datetime.date.today()
+    key = (store.version, models.version, runs, today)
+    cached = store.derived.get('pickup_ranges')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with store.lock.read():
+        state = store.state
+        ranges = hatch_models.simulate_pickups(state['chicks_orders'], state['chicks_inventory'], state['hatchery'],
+                                               state['egg_inventory'], models, today, runs, seed=store.version)
+    store.derived['pickup_ranges'] = (key, ranges)
+    return ranges
+
+
+@timings.timed()
 def process_hatches():
     """Convert incubating eggs to chicks once their hatch day has arrived.
     This moves hatched eggs out of `egg_inventory`, increases `chicks_inventory`,
     and logs an entry in `hatchery`. Processed incubation dates are tracked
     in `processed_hatch_dates` to avoid double counting across reruns.
     """
-    today = datetime.date.today()
-    # Collect incubation dates that need processing to avoid modifying dict while iterating
-    to_process = []
-    for incubation_date, egg_count in list(st.session_state.egg_inventory.items()):
-        hatch_day = incubation_date + datetime.timedelta(weeks=3)
-        key = incubation_date.isoformat() if hasattr(incubation_date, 'isoformat') else str(incubation_date)
-        if hatch_day <= today and key not in st.session_state.processed_hatch_dates:
-            hatched_chicks = int(egg_count * 0.85)
-            to_process.append((incubation_date, hatch_day, hatched_chicks))
-
-    for incubation_date, hatch_day, hatched_chicks in to_process:
-        # Remove eggs that hatched
-        if incubation_date in st.session_state.egg_inventory:
-            del st.session_state.egg_inventory[incubation_date]
-        # Add to chicks inventory and hatchery record
-        st.session_state.chicks_inventory += hatched_chicks
-        st.session_state.hatchery.append({"date": hatch_day, "location": "Auto Hatch", "chicks": hatched_chicks})
-        st.session_state.processed_hatch_dates.append(incubation_date.isoformat())
+    # Only batches whose hatch day has passed are popped from the queue; the
+    # background job usually got there first and this finds nothing to do
+    store = get_shared_store()
+    return hatching.process_due(store, store.derived['hatch_queue'], commit_event)
+
+
+@st.cache_resource
+def get_hatch_job():
+    """Process-wide thread that processes hatches as batches mature."""
+    store = get_shared_store()
+    return hatching.HatchJob(store, store.derived['hatch_queue']).start()
 
 
 # --- Persistence helpers: Streamlit Cloud/local file ---
 DATA_PATH = ".streamlit/data.json"
+# binary alternative to data.json (see snapshot_bin.py); the file suffix picks the format
+SNAPSHOT_PATH = ".streamlit/data" + snapshot_bin.SUFFIX
 
+@timings.timed()
 def save_to_local(path=DATA_PATH):
-    payload = {
-        'egg_inventory': {str(k): v for k, v in st.session_state.egg_inventory.items()},
-        'hatchery': st.session_state.hatchery,
-        'chicks_orders': [
-            {
-                'name': o.get('name'),
-                'order_count': o.get('order_count'),
-                'order_date': str(o.get('order_date')) if o.get('order_date') else None,
-                'pickup_date': str(o.get('pickup_date')) if o.get('pickup_date') else None,
-                'picked_up': bool(o.get('picked_up'))
-            } for o in st.session_state.chicks_orders
-        ],
-        'chicks_inventory': st.session_state.chicks_inventory,
-        'sales': [
-            {'type': s.get('type'), 'name': s.get('name'), 'count': s.get('count'), 'date': str(s.get('date')) if s.get('date') else None}
-            for s in st.session_state.sales
-        ],
-        'processed_hatch_dates': st.session_state.processed_hatch_dates,
-    }
     try:
-        import os
         os.makedirs('.streamlit', exist_ok=True)
+        if path.endswith(snapshot_bin.SUFFIX):
+            snapshot_bin.write_snapshot(shared_snapshot(), path)
+            return True
+        payload = state_to_payload(st.session_state)
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(payload, f, ensure_ascii=False, indent=2)
         return True
@@ -164,271 +302,439 @@ def save_to_local(path=DATA_PATH):
         return False
 
 
+@timings.timed()
 def load_from_local(path=DATA_PATH):
     try:
-        import os
         if not os.path.exists(path):
             return False
+        if path.endswith(snapshot_bin.SUFFIX):
+            replace_state(snapshot_bin.load_snapshot(path))
+            return True
         with open(path, 'r', encoding='utf-8') as f:
             payload = json.load(f)
-        # egg_inventory
-        st.session_state.egg_inventory = defaultdict(int)
-        for k, v in payload.get('egg_inventory', {}).items():
-            try:
-                st.session_state.egg_inventory[datetime.datetime.strptime(k, "%Y-%m-%d").date()] = int(v)
-            except Exception:
-                pass
-        # hatchery
-        st.session_state.hatchery = payload.get('hatchery', [])
-        # chicks_orders
-        st.session_state.chicks_orders = []
-        for o in payload.get('chicks_orders', []):
-            order_date = datetime.datetime.strptime(o.get('order_date'), "%Y-%m-%d").date() if o.get('order_date') else None
-            pickup_date = datetime.datetime.strptime(o.get('pickup_date'), "%Y-%m-%d").date() if o.get('pickup_date') else None
-            st.session_state.chicks_orders.append({
-                'name': o.get('name'), 'order_count': int(o.get('order_count', 0)), 'order_date': order_date, 'pickup_date': pickup_date, 'picked_up': bool(o.get('picked_up', False))
-            })
-        # chicks_inventory
-        st.session_state.chicks_inventory = int(payload.get('chicks_inventory', 0))
-        # sales
-        st.session_state.sales = []
-        for s in payload.get('sales', []):
-            date = datetime.datetime.strptime(s.get('date'), "%Y-%m-%d").date() if s.get('date') else None
-            st.session_state.sales.append({'type': s.get('type'), 'name': s.get('name'), 'count': int(s.get('count', 0)), 'date': date})
-        st.session_state.processed_hatch_dates = payload.get('processed_hatch_dates', [])
+        replace_state(payload_to_state(payload))
         return True
     except Exception as e:
         st.error(f"Error loading local data: {e}")
         return False
 
 
+# --- Persistence helpers: embedded SQLite database ---
+DB_PATH = ".streamlit/farm.db"
+
+
+# datasets that can be loaded from the database on their own
+DATASET_LABELS = {
+    'chicks_orders': "Orders",
+    'egg_inventory': "Egg batches",
+    'hatchery': "Hatchery records",
+    'sales': "Sales",
+    'chicks_inventory': "Chick inventory",
+    'processed_hatch_dates': "Processed hatch dates",
+}
+
+
+@st.cache_resource
+def get_sqlite_store(path=DB_PATH):
+    """Process-wide SQLite store (kept open so saves can diff against it)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return SQLiteStore(path)
+
+
+@timings.timed()
+def save_to_db(path=DB_PATH):
+    """Persist the shared data to SQLite, writing only changed rows."""
+    try:
+        shared = get_shared_store()
+        with shared.lock.read():
+            get_sqlite_store(path).save(shared.state)
+        return True
+    except Exception as e:
+        st.error(f"Error saving database: {e}")
+        return False
+
+
+@timings.timed()
+def load_from_db(path=DB_PATH, keys=None):
+    """Load `keys` (default: all data) from SQLite into the session.
+
+    Datasets not in `keys` keep their current in-memory values.
+
+    A database that has never been written is seeded from the binary
+    snapshot or the legacy JSON file when one exists.
+    """
+    try:
+        store = get_sqlite_store(path)
+        if store.is_empty():
+            if not (load_from_local(SNAPSHOT_PATH) or load_from_local()):
+                return False
+            return save_to_db(path)
+        state = dict(get_shared_store().state)
+        state.update(store.load(keys))
+        replace_state(state)
+        return True
+    except Exception as e:
+        st.error(f"Error loading database: {e}")
+        return False
+
+
+def shared_snapshot():
+    """Point-in-time copy of the shared data's collections (taken under the read lock)."""
+    store = get_shared_store()
+    with store.lock.read():
+        return exporter.snapshot(store.state)
+
+
+@timings.timed()
 def export_data_zip():
-    """Export current session data as a ZIP archive containing CSVs.
+    """Export current data as a ZIP archive containing CSVs.
     Returns bytes of the ZIP file.
     """
-    mem = io.BytesIO()
     try:
-        with zipfile.ZipFile(mem, mode='w', compression=zipfile.ZIP_DEFLATED) as z:
-            # egg_inventory.csv
-            si = io.StringIO()
-            writer = csv.writer(si)
-            writer.writerow(['date', 'eggs'])
-            for k, v in st.session_state.egg_inventory.items():
-                writer.writerow([str(k), v])
-            z.writestr('egg_inventory.csv', si.getvalue())
-
-            # hatchery.csv
-            si = io.StringIO()
-            writer = csv.writer(si)
-            writer.writerow(['date', 'location', 'chicks'])
-            for h in st.session_state.hatchery:
-                writer.writerow([str(h.get('date')), h.get('location', ''), h.get('chicks', 0)])
-            z.writestr('hatchery.csv', si.getvalue())
-
-            # chicks_orders.csv
-            si = io.StringIO()
-            writer = csv.writer(si)
-            writer.writerow(['name', 'order_count', 'order_date', 'pickup_date', 'picked_up'])
-            for o in st.session_state.chicks_orders:
-                writer.writerow([o.get('name',''), o.get('order_count',0), str(o.get('order_date') or ''), str(o.get('pickup_date') or ''), bool(o.get('picked_up', False))])
-            z.writestr('chicks_orders.csv', si.getvalue())
-
-            # sales.csv
-            si = io.StringIO()
-            writer = csv.writer(si)
-            writer.writerow(['type', 'name', 'count', 'date'])
-            for s in st.session_state.sales:
-                writer.writerow([s.get('type',''), s.get('name',''), s.get('count',0), str(s.get('date') or '')])
-            z.writestr('sales.csv', si.getvalue())
-
-            # meta.json
-            meta = {
-                'chicks_inventory': st.session_state.chicks_inventory,
-                'processed_hatch_dates': st.session_state.processed_hatch_dates,
-                'exported_at': str(datetime.date.today())
-            }
-            z.writestr('meta.json', json.dumps(meta))
-
-        mem.seek(0)
-        return mem.read()
+        mem = io.BytesIO()
+        exporter.write_export_zip(shared_snapshot(), mem)
+        return mem.getvalue()
     except Exception as e:
         st.error(f"Error exporting data: {e}")
         return None
 
 
+@st.cache_resource
+def get_export_cache():
+    return exporter.ExportCache()
+
+
+def export_download_data():
+    """Deferred download callback: builds (or reuses) the archive for the current data.
+
+    Runs outside the script thread when the button is clicked, so it only
+    touches process-wide resources. Pickup dates are written by the forecast
+    without a new data version, so the day, the hatch models and the split
+    policy are part of the cache key too.
+    """
+    store = get_shared_store()
+    cache = get_export_cache()
+
+    def take_snapshot():
+        with store.lock.read():
+            return exporter.snapshot(store.state)
+
+    def read_archive():
+        policy = store.derived['allocation_policy']
+        key = (store.version, store.derived['hatch_models'].version, datetime.date.today(),
+               policy['split'], policy['window_days'])
+        return cache.read(key, take_snapshot)
+
+    return read_archive
+
+
+BACKUP_DIR = os.path.join('.streamlit', 'backups')
+
+
 def _ensure_backups_dir():
-    d = os.path.join('.streamlit', 'backups')
-    os.makedirs(d, exist_ok=True)
-    return d
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    return BACKUP_DIR
+
+
+@st.cache_resource
+def get_backup_catalog():
+    """Process-wide index of backup and trash files (see backups.BackupCatalog)."""
+    return backups.BackupCatalog(BACKUP_DIR)
+
+
+BACKUPS_TO_KEEP = 100
+
 
+@timings.timed()
+def write_backup(store, catalog):
+    """Create an incremental backup of `store` and rotate old ones; returns the manifest path.
 
-def save_backup_zip():
-    """Create a timestamped ZIP backup file under .streamlit/backups/ and return the path."""
+    Only chunks that no earlier backup stored are compressed and written.
+    Raises on failure, and touches no Streamlit APIs, so the backup
+    scheduler thread can run it.
+    """
+    with store.lock.read():
+        snap = exporter.snapshot(store.state)
+    path, _stats = backups.create_backup(snap, _ensure_backups_dir())
+    catalog.add(path)
+    # Rotate old backups; dedup makes each one cheap, so keep many more
+    try:
+        if catalog.rotate(BACKUPS_TO_KEEP):
+            backups.collect_garbage(BACKUP_DIR)
+    except Exception:
+        pass
+    return path
+
+
+@st.cache_resource
+def get_backup_scheduler():
+    """Process-wide background backup thread (see backup_scheduler.BackupScheduler)."""
+    store = get_shared_store()
+    catalog = get_backup_catalog()
+    return BackupScheduler(lambda: write_backup(store, catalog), catalog.latest_age_days).start()
+
+
+def configure_auto_backup():
+    """Widget callback: push this session's auto-backup settings to the shared scheduler."""
+    scheduler = get_backup_scheduler()
+    scheduler.configure(st.session_state.auto_backup_enabled, st.session_state.auto_backup_days)
+    st.session_state.auto_backup_seen = (scheduler.enabled, int(scheduler.interval_days))
+
+
+# --- Persistence helpers: Google Sheets ---
+def sheets_settings():
+    """`(service account info, spreadsheet name)` from secrets, or None when not configured."""
     try:
-        data = export_data_zip()
-        if not data:
+        if 'gcp_service_account' not in st.secrets:
             return None
-        d = _ensure_backups_dir()
-        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'farm_backup_{ts}.zip'
-        path = os.path.join(d, filename)
-        with open(path, 'wb') as f:
-            f.write(data)
-        # Rotate old backups, keep latest 10
-        try:
-            _rotate_backups(10)
-        except Exception:
-            pass
-        return path
-    except Exception as e:
-        st.error(f"Error saving backup file: {e}")
+        return st.secrets['gcp_service_account'], st.secrets.get('gs_spreadsheet_name', 'FarmTrackerData')
+    except Exception:
         return None
 
 
-def latest_backup_age_days():
-    d = os.path.join('.streamlit', 'backups')
-    if not os.path.exists(d):
-        return None
-    files = [f for f in os.listdir(d) if f.endswith('.zip')]
-    if not files:
+@st.cache_resource
+def get_sheets_sync(spreadsheet_name):
+    """One authorised client and sync baseline per process and spreadsheet."""
+    info, _name = sheets_settings()
+    return sheets_sync.SheetsSync(sheets_sync.GspreadTransport.from_service_account(info, spreadsheet_name))
+
+
+@timings.timed()
+def sync_to_sheets():
+    """Write changed rows to the spreadsheet. Returns the sync stats or None."""
+    try:
+        _info, name = sheets_settings()
+        return get_sheets_sync(name).sync(shared_snapshot())
+    except Exception as e:
+        st.error(f"Error syncing to Google Sheets: {e}")
         return None
-    paths = [os.path.join(d, f) for f in files]
-    latest = max(paths, key=os.path.getmtime)
-    mtime = datetime.datetime.fromtimestamp(os.path.getmtime(latest))
-    return (datetime.datetime.now() - mtime).total_seconds() / 86400.0
-
-
-def _rotate_backups(max_keep=10):
-    """Keep only the newest `max_keep` backup files in the backups directory."""
-    d = os.path.join('.streamlit', 'backups')
-    if not os.path.exists(d):
-        return
-    files = [f for f in os.listdir(d) if f.endswith('.zip')]
-    if len(files) <= max_keep:
-        return
-    paths = [os.path.join(d, f) for f in files]
-    paths_sorted = sorted(paths, key=os.path.getmtime, reverse=True)
-    # Remove older ones beyond max_keep
-    for old in paths_sorted[max_keep:]:
-        try:
-            os.remove(old)
-        except Exception:
-            pass
 
 
+@timings.timed()
+def load_from_sheets():
+    try:
+        _info, name = sheets_settings()
+        replace_state(get_sheets_sync(name).load())
+        return True
+    except Exception as e:
+        st.error(f"Error loading from Google Sheets: {e}")
+        return False
+
+
+@timings.timed()
+def restore_from_backup(source):
+    """Replace the data with a backup file path or an uploaded export ZIP.
+
+    The archive is parsed and checked in full before the state is swapped,
+    so a bad file leaves the current data untouched.
+    """
+    try:
+        if isinstance(source, str):
+            state = restore.restore_backup(source, BACKUP_DIR)
+        else:
+            state = restore.restore_zip(source)
+        replace_state(state)
+        return True
+    except Exception as e:
+        st.error(f"Error restoring backup: {e}")
+        return False
+
+
+@timings.timed()
+def import_files(files, kind=None, skip_invalid=False):
+    """Validate uploaded CSV/ZIP files and commit their rows as one mutation.
+
+    Returns `(importer, committed)`. Nothing is committed when any row is
+    invalid unless `skip_invalid` is set.
+    """
+    importer = BulkImport()
+    try:
+        for f in files:
+            importer.add_file(f, f.name, kind)
+    except Exception as e:
+        st.error(f"Error reading import file: {e}")
+        return importer, False
+    if not importer.accepted or (importer.error_count and not skip_invalid):
+        return importer, False
+    commit_event(importer.event())
+    # re-forecast once from scratch rather than inserting orders one by one
+    get_forecast_engine().invalidate()
+    return importer, True
+
+
+@timings.timed()
 def list_backups():
     """Return a list of backups with metadata (name, path, size, mtime)."""
-    d = os.path.join('.streamlit', 'backups')
-    if not os.path.exists(d):
-        return []
-    files = [f for f in os.listdir(d) if f.endswith('.zip')]
-    rows = []
-    for f in sorted(files, reverse=True):
-        p = os.path.join(d, f)
-        try:
-            size = os.path.getsize(p)
-            mtime = datetime.datetime.fromtimestamp(os.path.getmtime(p))
-            rows.append({
-                'name': f,
-                'path': p,
-                'size': size,
-                'mtime': mtime,
-            })
-        except Exception:
-            continue
-    return rows
+    return get_backup_catalog().entries('backups')
 
 
+@timings.timed()
 def list_trash():
-    d = os.path.join('.streamlit', 'backups', 'trash')
-    if not os.path.exists(d):
-        return []
-    files = [f for f in os.listdir(d) if f.endswith('.zip')]
-    rows = []
-    for f in sorted(files, reverse=True):
-        p = os.path.join(d, f)
-        try:
-            size = os.path.getsize(p)
-            mtime = datetime.datetime.fromtimestamp(os.path.getmtime(p))
-            rows.append({
-                'name': f,
-                'path': p,
-                'size': size,
-                'mtime': mtime,
-            })
-        except Exception:
-            continue
-    return rows
+    return get_backup_catalog().entries('trash')
+
+
+def _page_controls(key, dates=True, sort_fields=None):
+    """Filter, sort and paging widgets for one table; returns their current values."""
+    col_dates, col_sort, col_size, col_page = st.columns(4)
+    start = end = None
+    if dates:
+        # an empty range means no filter; while picking, only the start is set
+        date_range = col_dates.date_input("Date range", value=(), key=f'{key}_dates')
+        if len(date_range) > 0:
+            start = date_range[0]
+        if len(date_range) > 1:
+            end = date_range[1]
+    sort_field, descending = None, False
+    if sort_fields:
+        sort_label = col_sort.selectbox("Sort by", ["(as entered)"] + list(sort_fields), key=f'{key}_sort')
+        sort_field = sort_fields.get(sort_label)
+        descending = col_sort.checkbox("Descending", key=f'{key}_desc')
+    size = col_size.selectbox("Rows per page", tables.PAGE_SIZES, key=f'{key}_size')
+    # out-of-range pages are clamped by tables.page()
+    number = col_page.number_input("Page", min_value=1, step=1, key=f'{key}_page')
+    return start, end, sort_field, descending, size, number
+
+
+def _page_caption(rows, number, size, pages, total):
+    first = (number - 1) * size + 1 if rows else 0
+    st.caption(f"Rows {first}–{first + len(rows) - 1 if rows else 0} of {total} (page {number} of {pages})")
+
+
+ORDER_SORT_FIELDS = {
+    "Order Date": 'order_date',
+    "Pickup Date": 'pickup_date',
+    "Customer": 'name',
+    "Order Qty": 'order_count',
+}
+
+
+def paged_table(key, items, to_row, date_field=None, sort_fields=None):
+    """Render one page of the records in `items` as a dataframe.
+
+    Filtering and sorting work on the records themselves; `to_row` builds a
+    display row only for the records on the visible page. `sort_fields`
+    maps the labels offered in "Sort by" to record fields.
+    """
+    start, end, sort_field, descending, size, number = _page_controls(key, date_field is not None, sort_fields)
+    selected = tables.select(items, date_field, start, end, sort_field, descending)
+    rows, number, pages = tables.page(selected, number, size)
+    st.dataframe([to_row(item) for item in rows])
+    _page_caption(rows, number, size, pages, len(selected))
+
+
+def paged_columns(key, columns, date_column="Date"):
+    """Render one page of a column-oriented table such as a per-date summary."""
+    start, end, _, _, size, number = _page_controls(key)
+    page_data, number, pages, total = tables.page_columns(columns, number, size, date_column, start, end)
+    st.dataframe(page_data)
+    _page_caption(page_data[date_column], number, size, pages, total)
 
 # Ensure we process any hatches that have matured since last run
+get_hatch_job()
 process_hatches()
 
-# Auto-backup session defaults
-if 'auto_backup_enabled' not in st.session_state:
-    st.session_state.auto_backup_enabled = False
-if 'auto_backup_days' not in st.session_state:
-    st.session_state.auto_backup_days = 1
-
-# Perform startup backup if enabled and due
-try:
-    if st.session_state.get('auto_backup_enabled'):
-        age = latest_backup_age_days()
-        if age is None or age >= float(st.session_state.get('auto_backup_days', 1)):
-            p = save_backup_zip()
-            if p:
-                st.info(f"Startup backup created: {p}")
-except Exception:
-    pass
+# Auto-backup settings are process-wide: the scheduler thread holds them.
+# A session only pushes its widgets to the scheduler when the user changes
+# them, and picks up changes made by other sessions otherwise.
+backup_scheduler = get_backup_scheduler()
+_backup_policy = (backup_scheduler.enabled, int(backup_scheduler.interval_days))
+if st.session_state.get('auto_backup_seen') != _backup_policy:
+    st.session_state.auto_backup_enabled, st.session_state.auto_backup_days = _backup_policy
+    st.session_state.auto_backup_seen = _backup_policy
 
 st.title('🐥 Chicken Farm Dashboard')
+if _data_changed_elsewhere:
+    st.info(f"Data was updated by another user; now showing version {st.session_state.data_version}.")
 
 # Persistence UI (Streamlit Cloud / local file)
-with st.expander("🔁 Persistence"):
-    st.markdown("Persist app data to Streamlit Cloud's writable filesystem (local file). This keeps data between runs on the deployed app instance.")
+with st.expander("🔁 Persistence"), timings.section('panel: persistence'):
+    st.markdown("Persist app data to Streamlit Cloud's writable filesystem (SQLite database file). This keeps data between runs on the deployed app instance.")
     # Automatic backup controls
-    if 'auto_backup_enabled' not in st.session_state:
-        st.session_state.auto_backup_enabled = False
-    if 'auto_backup_days' not in st.session_state:
-        st.session_state.auto_backup_days = 1
-    col0, _ = st.columns([2, 3])
+    col0, col_status = st.columns([2, 3])
     with col0:
-        st.session_state.auto_backup_enabled = st.checkbox("Enable automatic backups", value=st.session_state.auto_backup_enabled)
-        st.session_state.auto_backup_days = st.number_input("Backup interval (days)", min_value=1, step=1, value=st.session_state.auto_backup_days)
+        st.checkbox("Enable automatic backups", key='auto_backup_enabled', on_change=configure_auto_backup)
+        st.number_input("Backup interval (days)", min_value=1, step=1, key='auto_backup_days',
+                        on_change=configure_auto_backup)
+    with col_status:
+        status = backup_scheduler.status()
+        if status['running']:
+            st.caption("Backup running in the background…")
+        elif status['pending']:
+            st.caption("Backup queued")
+        if status['last_run']:
+            st.caption(f"Last backup: {status['last_run'].strftime('%Y-%m-%d %H:%M:%S')} "
+                       f"({status['last_duration']:.1f}s, {status['last_reason']})")
+        else:
+            st.caption("No backup has run since the app started")
+        if status['failures']:
+            st.caption(f"Failed backups: {status['failures']}")
+        if status['last_error']:
+            st.error(f"Last backup failed: {status['last_error']}")
+    load_keys = st.multiselect("Datasets to load", list(DATASET_LABELS), default=list(DATASET_LABELS),
+                               format_func=DATASET_LABELS.get, key='db_load_keys')
     col1, col2 = st.columns(2)
     if col1.button("Save to Streamlit storage"):
-        ok = save_to_local()
+        ok = save_to_db()
         if ok:
-            st.success("Saved data to .streamlit/data.json")
+            st.success(f"Saved data to {DB_PATH}")
             if st.session_state.auto_backup_enabled:
-                p = save_backup_zip()
-                if p:
-                    st.info(f"Backup saved to {p}")
-    if col2.button("Load from Streamlit storage"):
-        ok = load_from_local()
+                backup_scheduler.request('save')
+                st.info("Backup queued; it runs in the background")
+    if col2.button("Load from Streamlit storage", disabled=not load_keys):
+        ok = load_from_db(keys=load_keys)
         if ok:
-            st.success("Loaded data from .streamlit/data.json")
+            st.success(f"Loaded data from {DB_PATH}")
             # Optionally create backup after load if enabled
             if st.session_state.auto_backup_enabled:
-                p = save_backup_zip()
-                if p:
-                    st.info(f"Backup saved to {p}")
+                backup_scheduler.request('load')
             # ensure UI and forecasts refresh after loading data
             st.rerun()
+    # JSON stays available as an import/export format
+    col3, col4 = st.columns(2)
+    if col3.button("Export JSON"):
+        if save_to_local():
+            st.success(f"Exported data to {DATA_PATH}")
+    if col4.button("Import JSON"):
+        if load_from_local():
+            st.success(f"Imported data from {DATA_PATH}")
+            st.rerun()
+    col5, col6 = st.columns(2)
+    if col5.button("Export binary snapshot"):
+        if save_to_local(SNAPSHOT_PATH):
+            st.success(f"Exported data to {SNAPSHOT_PATH}")
+    if col6.button("Import binary snapshot"):
+        if load_from_local(SNAPSHOT_PATH):
+            st.success(f"Imported data from {SNAPSHOT_PATH}")
+            st.rerun()
+    if sheets_settings() is not None:
+        col7, col8 = st.columns(2)
+        if col7.button("Sync to Google Sheets"):
+            stats = sync_to_sheets()
+            if stats is not None:
+                st.success(f"Synced {stats['rows']} changed row(s) in {stats['calls']} batched write(s)")
+        if col8.button("Load from Google Sheets"):
+            if load_from_sheets():
+                st.success("Loaded data from Google Sheets")
+                st.rerun()
     # Export backup as zip of CSVs
-    zip_bytes = export_data_zip()
-    if zip_bytes:
-        st.download_button("Export backup (ZIP)", data=zip_bytes, file_name="farm_backup.zip", mime="application/zip")
+    # Built only when clicked, and reused until the data version changes
+    st.download_button("Export backup (ZIP)", data=export_download_data(), file_name="farm_backup.zip", mime="application/zip")
+    uploaded_zip = st.file_uploader("Restore from exported ZIP", type=['zip'])
+    if uploaded_zip is not None and st.button("Restore uploaded ZIP"):
+        if restore_from_backup(uploaded_zip):
+            st.success(f"Restored data from {uploaded_zip.name}")
+            st.rerun()
 
     # List existing backups and allow deletion
     st.markdown("---")
     st.markdown("**Existing Backups**")
-    backups = list_backups()
-    if not backups:
+    existing_backups = list_backups()
+    if not existing_backups:
         st.info("No backups found in .streamlit/backups/")
     else:
         # Display table
         table = []
-        for b in backups:
+        for b in existing_backups:
             table.append({
                 'File': b['name'],
                 'Size (KB)': round(b['size'] / 1024, 1),
@@ -436,7 +742,13 @@ with st.expander("🔁 Persistence"):
             })
         st.table(table)
 
-        names = [b['name'] for b in backups]
+        names = [b['name'] for b in existing_backups]
+        to_restore = st.selectbox("Backup to restore", options=names, key='backup_restore_select')
+        if st.button("Restore selected backup"):
+            if restore_from_backup(os.path.join(BACKUP_DIR, to_restore)):
+                st.success(f"Restored data from {to_restore}")
+                st.rerun()
+
         to_delete = st.multiselect("Select backups to delete", options=names)
         if st.button("Delete selected backups"):
             if not to_delete:
@@ -451,15 +763,13 @@ with st.expander("🔁 Persistence"):
             st.warning(f"You are about to delete {len(pending)} backup(s): {', '.join(pending)}")
             c1, c2 = st.columns(2)
             if c1.button("Confirm delete (move to trash)"):
-                trash_dir = os.path.join('.streamlit', 'backups', 'trash')
-                os.makedirs(trash_dir, exist_ok=True)
+                catalog = get_backup_catalog()
                 moved = []
                 failed = []
-                for b in backups:
+                for b in existing_backups:
                     if b['name'] in pending:
                         try:
-                            dst = os.path.join(trash_dir, b['name'])
-                            shutil.move(b['path'], dst)
+                            catalog.move(b['name'], 'backups', 'trash')
                             moved.append(b['name'])
                         except Exception as e:
                             failed.append((b['name'], str(e)))
@@ -494,11 +804,8 @@ with st.expander("🔁 Persistence"):
             if st.button("Restore Selected"):
                 restored = []
                 for name in to_restore:
-                    src = os.path.join('.streamlit', 'backups', 'trash', name)
-                    dst = os.path.join('.streamlit', 'backups', name)
                     try:
-                        os.makedirs(os.path.dirname(dst), exist_ok=True)
-                        shutil.move(src, dst)
+                        get_backup_catalog().move(name, 'trash', 'backups')
                         restored.append(name)
                     except Exception as e:
                         st.error(f"Failed to restore {name}: {e}")
@@ -510,13 +817,13 @@ with st.expander("🔁 Persistence"):
             if st.button("Permanently Delete Selected"):
                 purged = []
                 for name in to_purge:
-                    p = os.path.join('.streamlit', 'backups', 'trash', name)
                     try:
-                        os.remove(p)
+                        get_backup_catalog().remove(name, 'trash')
                         purged.append(name)
                     except Exception as e:
                         st.error(f"Failed to delete {name}: {e}")
                 if purged:
+                    backups.collect_garbage(BACKUP_DIR)
                     st.success(f"Permanently deleted: {', '.join(purged)}")
                     st.rerun()
         with col_c:
@@ -525,16 +832,40 @@ with st.expander("🔁 Persistence"):
                 if confirm:
                     for t in trash:
                         try:
-                            os.remove(t['path'])
+                            get_backup_catalog().remove(t['name'], 'trash')
                         except Exception:
                             pass
+                    backups.collect_garbage(BACKUP_DIR)
                     st.success("Trash emptied")
                     st.rerun()
     else:
         st.info("Trash is empty")
 
+# --- Bulk import ---
+with st.expander("📥 Bulk Import"), timings.section('panel: bulk import'):
+    st.markdown("Import many orders, egg arrivals, hatches or sales at once from CSV files with a header row "
+                "(the layout of the exported CSVs), or from an exported ZIP.")
+    import_files_selected = st.file_uploader("CSV or ZIP files", type=['csv', 'zip'], accept_multiple_files=True)
+    import_kind = st.selectbox("File contents", ["Detect from header", "orders", "eggs", "hatchery", "sales"])
+    skip_invalid = st.checkbox("Import valid rows and skip rows with errors")
+    if import_files_selected and st.button("Import"):
+        importer, committed = import_files(import_files_selected,
+                                           None if import_kind == "Detect from header" else import_kind,
+                                           skip_invalid)
+        imported = ', '.join(f"{n} {k}" for k, n in importer.counts.items() if n)
+        if committed:
+            st.success(f"Imported {imported}")
+        elif importer.error_count:
+            st.error(f"Nothing imported: {importer.error_count} row(s) have errors")
+        elif not importer.accepted:
+            st.warning("No rows to import")
+        if importer.error_count:
+            st.dataframe([{'File': e.source, 'Line': e.line, 'Error': e.message} for e in importer.errors])
+            if importer.error_count > len(importer.errors):
+                st.caption(f"Showing the first {len(importer.errors)} of {importer.error_count} errors")
+
 # --- PANEL 1: Chicks Orders ---
-with st.expander("1️⃣ Chicks Orders Module"):
+with st.expander("1️⃣ Chicks Orders Module"), timings.section('panel: orders'):
     st.subheader("Order Chicks")
     with st.form("Order chicks"):
         customer = st.text_input("Customer Name")
@@ -542,27 +873,42 @@ with st.expander("1️⃣ Chicks Orders Module"):
         order_date = st.date_input("Order date", value=datetime.date.today())
         submit = st.form_submit_button("Place Order")
     if submit and customer:
-        st.session_state.chicks_orders.append(
-            {"name": customer, "order_count": int(num_chicks), "order_date": order_date, "pickup_date": None, "picked_up": False}
-        )
+        commit_event(farm_state.order_placed(customer, num_chicks, order_date))
         st.success("Order placed!")
 
+    allocation_policy = get_shared_store().derived['allocation_policy']
+    col_split, col_window = st.columns(2)
+    split_pickups = col_split.checkbox("Allow split pickups", value=allocation_policy['split'],
+                                       help="Fill an order from several hatch dates; applies to all users of the app.")
+    split_window = col_window.number_input("Pickup window (days, 0 = any)", min_value=0, step=1,
+                                           value=allocation_policy['window_days'], disabled=not split_pickups,
+                                           help="All parts of a split order are ready within this many days.")
+    if split_pickups != allocation_policy['split'] or split_window != allocation_policy['window_days']:
+        allocation_policy.update(split=split_pickups, window_days=int(split_window))
+
     # Ensure each order has an assigned pickup_date where possible
     forecasted_orders = forecast_pickup_dates()
+    summary = get_summary()
+    pickup_parts = split_parts()
     st.markdown("#### Order List & Pickup Forecast")
     st.info("Pickup dates are estimates and may change when new hatch or egg data is added; mark orders as collected to lock the pickup.")
-    st.dataframe([{
-        "Customer": order['name'],
-        "Order Qty": order['order_count'],
-        "Order Date": order['order_date'],
-        "Pickup Date": order['pickup_date'],
-        "Picked Up": "Yes" if order['picked_up'] else "No"
-    } for order in forecasted_orders])
+
+    def order_row(order):
+        row = {
+            "Customer": order['name'],
+            "Order Qty": order['order_count'],
+            "Order Date": order['order_date'],
+            "Pickup Date": order['pickup_date'],
+            "Picked Up": "Yes" if order['picked_up'] else "No"
+        }
+        if pickup_parts is not None:
+            row["Pickup Parts"] = "; ".join(f"{d}: {n}" for d, n in pickup_parts.get(id(order), ()))
+        return row
+
+    paged_table('orders', forecasted_orders, order_row, date_field='order_date', sort_fields=ORDER_SORT_FIELDS)
 
     # Inventory/forecast summary
-    total_eggs = sum(st.session_state.egg_inventory.values())
-    eggs_by_hatch = sum(egg_count * 0.85 for incubation_date, egg_count in st.session_state.egg_inventory.items())
-    st.info(f"Total eggs in inventory: {total_eggs}, Forecasted chicks available (85% rate): {int(eggs_by_hatch)}")
+    st.info(f"Total eggs in inventory: {summary.total_eggs}, Forecasted chicks available (per hatch model): {summary.forecast_chicks}")
 
     # --- New: Forecast availability by date ---
     st.markdown("#### Forecasted Chicks Availability by Date")
@@ -573,77 +919,37 @@ with st.expander("1️⃣ Chicks Orders Module"):
     if start_date > end_date:
         st.error("Start date must be on or before end date")
     else:
-        # Build hatched chicks by hatch date (incubation_date + 3 weeks)
-        eggs_by_hatch_day = {}
-        for incubation_date, egg_count in st.session_state.egg_inventory.items():
-            hatch_day = incubation_date + datetime.timedelta(weeks=3)
-            hatched_chicks = int(egg_count * 0.85)
-            eggs_by_hatch_day[hatch_day] = eggs_by_hatch_day.get(hatch_day, 0) + hatched_chicks
-
-        # Build allocated chicks per date from forecasted orders
-        allocated_by_date = {}
-        for ord in forecasted_orders:
-            pd = ord.get('pickup_date')
-            if pd is not None:
-                allocated_by_date[pd] = allocated_by_date.get(pd, 0) + ord.get('order_count', 0)
-
-        # Compose rows for each date in the requested range and compute cumulative/rolling availability
-        rows = []
-        cur = start_date
-        cum_hatched = 0
-        cum_alloc = 0
-        while cur <= end_date:
-            hatched = eggs_by_hatch_day.get(cur, 0)
-            allocated = allocated_by_date.get(cur, 0)
-            cum_hatched += hatched
-            cum_alloc += allocated
-            daily_available = max(0, hatched - allocated)
-            rolling_available = max(0, cum_hatched - cum_alloc)
-            rows.append({
-                "Date": cur,
-                "Hatched (est)": hatched,
-                "Allocated to Orders": allocated,
-                "Daily Available": daily_available,
-                "Cumulative Hatched": cum_hatched,
-                "Cumulative Allocated": cum_alloc,
-                "Rolling Available": rolling_available,
-            })
-            cur += datetime.timedelta(days=1)
-
-        st.dataframe(rows)
+        # Hatched, allocated, cumulative and rolling columns for the whole window at once
+        st.dataframe(availability_table(st.session_state.egg_inventory, forecasted_orders, start_date, end_date,
+                                        get_hatch_models(), allocated_pairs(forecasted_orders)))
 
     # Summary totals and charts for Orders module
     st.markdown("##### Orders Summary & Chart")
-    total_orders = len(st.session_state.chicks_orders)
-    total_ordered_chicks = sum(o['order_count'] for o in st.session_state.chicks_orders)
-    pending = sum(1 for o in st.session_state.chicks_orders if not o.get('picked_up'))
-    st.write(f"Total orders: {total_orders} — Total chicks ordered: {total_ordered_chicks} — Pending orders: {pending}")
+    st.write(f"Total orders: {summary.total_orders} — Total chicks ordered: {summary.total_ordered_chicks} — Pending orders: {summary.pending_orders}")
 
     # Orders per order_date chart (simple list + table for labels)
-    orders_by_date = {}
-    for o in st.session_state.chicks_orders:
-        d = o.get('order_date')
-        if d is None:
-            continue
-        orders_by_date[d] = orders_by_date.get(d, 0) + o.get('order_count', 0)
-    if orders_by_date:
-        dates = sorted(orders_by_date.keys())
-        counts = [orders_by_date[d] for d in dates]
+    dates, counts = summary.orders_by_date
+    if dates:
         st.bar_chart({"Ordered chicks": counts})
-        st.table([{"Date": d, "Ordered": orders_by_date[d]} for d in dates])
+        paged_columns('orders_by_date', {"Date": dates, "Ordered": counts})
 
 
 # --- PANEL 2: Incoming Eggs ---
-with st.expander("2️⃣ Egg Arrivals Module"):
+with st.expander("2️⃣ Egg Arrivals Module"), timings.section('panel: eggs'):
     st.subheader("Record New Egg Arrivals")
     with st.form("log_egg_arrival"):
         arrival_date = st.date_input("Arrival Date", key='egg')
-        source = st.selectbox("Egg Source", ["Contract Farmer", "Own Farm"])
+        source = st.selectbox("Egg Source", hatch_models.SOURCES)
         loc_or_customer = st.text_input("Farmer Name" if source=="Contract Farmer" else "Farm Location")
         num_eggs = st.number_input("Number of Eggs", min_value=1, step=1, value=10)
         submit_eggs = st.form_submit_button("Log Egg Arrival")
     if submit_eggs:
-        st.session_state.egg_inventory[arrival_date] += int(num_eggs)
+        # record the source first so the batch is scheduled with its source's hatch model
+        models = get_hatch_models()
+        if models.batch_sources.get(arrival_date) != source:
+            models.assign(arrival_date, source)
+            save_hatch_models()
+        commit_event(farm_state.egg_arrival(arrival_date, num_eggs))
         st.success(f"Added {num_eggs} eggs from {loc_or_customer} on {arrival_date}")
         # Process any hatches that may now be ready (and refresh the app
         # so dependent modules recalculate with the new state)
@@ -651,70 +957,78 @@ with st.expander("2️⃣ Egg Arrivals Module"):
         st.rerun()
 
     st.markdown("#### Egg Inventory (by Incubation Date)")
-    eggs_df = [{"Date": str(date), "Eggs": count} for date, count in st.session_state.egg_inventory.items()]
-    st.dataframe(eggs_df)
-    st.info(f"Total eggs in incubators: {sum(st.session_state.egg_inventory.values())}")
+    batches = egg_batches(st.session_state.egg_inventory)
+    paged_table('egg_batches', batches, lambda b: {"Date": str(b.incubation_date), "Eggs": b.eggs},
+                date_field='incubation_date', sort_fields={"Date": 'incubation_date', "Eggs": 'eggs'})
+    st.info(f"Total eggs in incubators: {summary.total_eggs}")
 
     # Summary totals and chart for Egg Arrivals
     st.markdown("##### Eggs Summary & Chart")
-    total_incubating = sum(st.session_state.egg_inventory.values())
-    st.write(f"Total eggs incubating: {total_incubating}")
-    if eggs_df:
-        # show eggs by incubation date
-        eggs_by_date = {datetime.datetime.strptime(r["Date"], "%Y-%m-%d").date(): r["Eggs"] for r in eggs_df}
-        dates = sorted(eggs_by_date.keys())
-        counts = [eggs_by_date[d] for d in dates]
-        st.bar_chart({"Eggs (by incubation date)": counts})
-        st.table([{"Date": d, "Eggs": eggs_by_date[d]} for d in dates])
+    st.write(f"Total eggs incubating: {summary.total_eggs}")
+    if batches:
+        # show eggs by incubation date (batches are already sorted by date)
+        st.bar_chart({"Eggs (by incubation date)": [b.eggs for b in batches]})
+        paged_columns('eggs_by_date', {"Date": [b.incubation_date for b in batches], "Eggs": [b.eggs for b in batches]})
 
 # --- PANEL 3: Chicks Collection ---
-with st.expander("3️⃣ Chicks Collection Module"):
+with st.expander("3️⃣ Chicks Collection Module"), timings.section('panel: collection'):
     st.subheader("Customer Pickup")
+    pickup_search = st.text_input("Find customer", key='pickup_search',
+                                  help="Start of the customer's name or of any word in it")
+    if pickup_search:
+        orders = st.session_state.chicks_orders
+        positions = {i for c in get_customer_index().search(pickup_search, limit=50) for i in c.orders}
+        pickup_candidates = [orders[i] for i in sorted(positions)]
+    else:
+        pickup_candidates = forecasted_orders
     eligible_pickups = [
-        order for order in forecasted_orders
+        order for order in pickup_candidates
         if order['pickup_date'] is not None and not order['picked_up'] and order['pickup_date'] <= datetime.date.today()
     ]
     pickup_options = [f"{order['name']} ({order['order_count']} chicks, {order['pickup_date']})"
                       for order in eligible_pickups]
+    if pickup_search and not pickup_options:
+        st.info("No orders ready for pickup for that customer")
     if pickup_options:
         pickup_idx = st.selectbox("Select customer for pickup", list(range(len(pickup_options))),
                                   format_func=lambda i: pickup_options[i])
         if st.button("Mark as Collected"):
             order = eligible_pickups[pickup_idx]
-            order['picked_up'] = True
-            st.session_state.chicks_inventory = max(0, st.session_state.chicks_inventory - order['order_count'])
-            st.success(f"{order['name']} picked up {order['order_count']} chicks")
-            # refresh forecasts/UI so pickup dates and availability update
-            st.rerun()
+            store = get_shared_store()
+            # look up, commit and flag the order as one step, so no other session
+            # can replace the data or run the forecast engine in between
+            with store.lock.write():
+                position = None if order['picked_up'] else order_position(order)
+                if position is not None:
+                    commit_event(farm_state.order_collected(position, order['pickup_date']))
+                    get_forecast_engine().mark_order_changed(order)
+            if position is None:
+                st.warning("That order changed since the page was loaded; please refresh and try again")
+            else:
+                st.success(f"{order['name']} picked up {order['order_count']} chicks")
+                # refresh forecasts/UI so pickup dates and availability update
+                st.rerun()
 
     # Chicks inventory is maintained by hatch processing and hatchery records
     st.markdown(f"**Chicks Inventory (as of today): {st.session_state.chicks_inventory}**")
-    st.dataframe([{
+    paged_table('collection', st.session_state.chicks_orders, lambda order: {
         "Customer": order['name'],
         "Order Qty": order['order_count'],
         "Pickup Date": order['pickup_date'],
         "Picked Up": "Yes" if order['picked_up'] else "No"
-    } for order in st.session_state.chicks_orders])
+    }, date_field='pickup_date', sort_fields=ORDER_SORT_FIELDS)
 
     # Summary totals and charts for Collection module
     st.markdown("##### Collection Summary & Chart")
-    total_picked = sum(o['order_count'] for o in st.session_state.chicks_orders if o.get('picked_up'))
-    total_pending_chicks = sum(o['order_count'] for o in st.session_state.chicks_orders if not o.get('picked_up') and o.get('pickup_date') is not None)
-    st.write(f"Chicks inventory: {st.session_state.chicks_inventory} — Picked up total: {total_picked} — Pending chicks with pickup date: {total_pending_chicks}")
+    st.write(f"Chicks inventory: {st.session_state.chicks_inventory} — Picked up total: {summary.total_picked} — Pending chicks with pickup date: {summary.pending_chicks_with_date}")
     # Pickups per pickup_date
-    pickups_by_date = {}
-    for o in st.session_state.chicks_orders:
-        if o.get('picked_up') and o.get('pickup_date') is not None:
-            d = o['pickup_date']
-            pickups_by_date[d] = pickups_by_date.get(d, 0) + o.get('order_count', 0)
-    if pickups_by_date:
-        dates = sorted(pickups_by_date.keys())
-        counts = [pickups_by_date[d] for d in dates]
+    dates, counts = summary.pickups_by_date
+    if dates:
         st.line_chart({"Picked up chicks": counts})
-        st.table([{"Date": d, "Picked Up": pickups_by_date[d]} for d in dates])
+        paged_columns('pickups_by_date', {"Date": dates, "Picked Up": counts})
 
 # --- PANEL 4: Hatchery ---
-with st.expander("4️⃣ Hatchery Module"):
+with st.expander("4️⃣ Hatchery Module"), timings.section('panel: hatchery'):
     st.subheader("Hatchery Operations")
     with st.form("record_hatching"):
         hatch_date = st.date_input("Hatch Date", key='hatch')
@@ -722,31 +1036,31 @@ with st.expander("4️⃣ Hatchery Module"):
         new_chicks = st.number_input("No. of newly hatched chicks", min_value=0, step=1, value=0)
         save_hatch = st.form_submit_button("Add Hatch Data")
     if save_hatch and new_chicks > 0:
-        st.session_state.hatchery.append({"date": hatch_date, "location": location, "chicks": int(new_chicks)})
-        st.session_state.chicks_inventory += int(new_chicks)
+        commit_event(farm_state.hatch_recorded(hatch_date, location, new_chicks))
         st.success(f"Added {new_chicks} chicks from {location} on {hatch_date}")
         # refresh app so pickup forecasts update with the new hatch data
         st.rerun()
 
+    hatch_status = get_hatch_job().status()
+    if hatch_status['next_hatch_day']:
+        st.caption(f"Next batch hatches automatically on {hatch_status['next_hatch_day']}")
+    if hatch_status['last_error']:
+        st.error(f"Automatic hatch processing failed: {hatch_status['last_error']}")
+
     st.markdown("#### Hatchery Record")
-    st.dataframe(st.session_state.hatchery)
+    paged_table('hatchery', st.session_state.hatchery, lambda h: h.as_dict(), date_field='date',
+                sort_fields={"Date": 'date', "Location": 'location', "Chicks": 'chicks'})
 
     # Summary totals and chart for Hatchery
     st.markdown("##### Hatchery Summary & Chart")
-    total_hatched = sum(h.get('chicks', 0) for h in st.session_state.hatchery)
-    st.write(f"Total hatched (recorded): {total_hatched}")
-    if st.session_state.hatchery:
-        hatch_by_date = {}
-        for h in st.session_state.hatchery:
-            d = h.get('date')
-            hatch_by_date[d] = hatch_by_date.get(d, 0) + h.get('chicks', 0)
-        dates = sorted(hatch_by_date.keys())
-        counts = [hatch_by_date[d] for d in dates]
+    st.write(f"Total hatched (recorded): {summary.total_hatched}")
+    dates, counts = summary.hatch_by_date
+    if dates:
         st.bar_chart({"Hatched chicks": counts})
-        st.table([{"Date": d, "Hatched": hatch_by_date[d]} for d in dates])
+        paged_columns('hatch_by_date', {"Date": dates, "Hatched": counts})
 
 # --- PANEL 5: Sales ---
-with st.expander("5️⃣ Sales Module"):
+with st.expander("5️⃣ Sales Module"), timings.section('panel: sales'):
     st.subheader("Sales Entry")
     with st.form("record_sale"):
         sale_type = st.selectbox("Sale Type", ["Chick", "Cock", "Point of Lay"])
@@ -755,29 +1069,21 @@ with st.expander("5️⃣ Sales Module"):
         sale_dt = st.date_input("Sale Date", key='sale')
         submit_sale = st.form_submit_button("Log Sale")
     if submit_sale and sale_customer:
-        st.session_state.sales.append({
-            "type": sale_type, "name": sale_customer,
-            "count": int(sale_qty), 
-            "date": sale_dt
-        })
-        # Subtract from inventory if chicks are sold
-        if sale_type == "Chick":
-            st.session_state.chicks_inventory = max(0, st.session_state.chicks_inventory - int(sale_qty))
+        # Subtracts from inventory if chicks are sold
+        commit_event(farm_state.sale_logged(sale_type, sale_customer, sale_qty, sale_dt))
         st.success(f"{sale_qty} {sale_type}s sold to {sale_customer} on {sale_dt}")
 
     st.markdown("#### Sales Record")
-    st.dataframe([
-        {
-            "Date": sale["date"],
-            "Customer": sale["name"],
-            "Type": sale["type"],
-            "Quantity": sale["count"],
-        } for sale in st.session_state.sales
-    ])
-
-    total_sales = sum(sale["count"] for sale in st.session_state.sales if sale["type"] == "Chick")
-    total_cocks = sum(sale["count"] for sale in st.session_state.sales if sale["type"] == "Cock")
-    total_pol = sum(sale["count"] for sale in st.session_state.sales if sale["type"] == "Point of Lay")
+    paged_table('sales', st.session_state.sales, lambda sale: {
+        "Date": sale["date"],
+        "Customer": sale["name"],
+        "Type": sale["type"],
+        "Quantity": sale["count"],
+    }, date_field='date', sort_fields={"Date": 'date', "Customer": 'name', "Type": 'type', "Quantity": 'count'})
+
+    total_sales = summary.sales_totals.get("Chick", 0)
+    total_cocks = summary.sales_totals.get("Cock", 0)
+    total_pol = summary.sales_totals.get("Point of Lay", 0)
 
     st.info(
         f"Total chicks sold: {total_sales}\n"
@@ -789,19 +1095,269 @@ with st.expander("5️⃣ Sales Module"):
     st.markdown("##### Sales Summary & Chart")
     st.write(f"Chicks sold: {total_sales} — Cocks sold: {total_cocks} — POL sold: {total_pol}")
     # Sales by date for chicks
-    sales_by_date = {}
-    for s in st.session_state.sales:
-        if s.get('type') == 'Chick':
-            d = s.get('date')
-            sales_by_date[d] = sales_by_date.get(d, 0) + s.get('count', 0)
-    if sales_by_date:
-        dates = sorted(sales_by_date.keys())
-        counts = [sales_by_date[d] for d in dates]
+    dates, counts = summary.chick_sales_by_date
+    if dates:
         st.line_chart({"Chicks sold": counts})
-        st.table([{"Date": d, "Sold": sales_by_date[d]} for d in dates])
+        paged_columns('chick_sales_by_date', {"Date": dates, "Sold": counts})
+
+# --- PANEL 6: Customers ---
+with st.expander("6️⃣ Customer Lookup"), timings.section('panel: customers'):
+    customer_index = get_customer_index()
+    st.caption(f"{len(customer_index)} customers")
+    customer_query = st.text_input("Customer name starts with", key='customer_search')
+    matches = customer_index.search(customer_query, limit=50) if customer_query else []
+    if customer_query and not matches:
+        st.info("No matching customers")
+    if matches:
+        chosen = st.selectbox("Customer", list(range(len(matches))), key='customer_pick',
+                              format_func=lambda i: f"{matches[i].name} ({len(matches[i].orders)} orders, {len(matches[i].sales)} sales)")
+        pending, collected, bought = customer_index.history(matches[chosen].key)
+        st.write(f"Pending: {len(pending)} orders, {sum(o['order_count'] for o in pending)} chicks — "
+                 f"Collected: {len(collected)} orders, {sum(o['order_count'] for o in collected)} chicks — "
+                 f"Bought: {sum(s['count'] for s in bought)} birds in {len(bought)} sales")
+        if pending:
+            st.markdown("##### Pending orders")
+            st.dataframe([{
+                "Order Qty": order['order_count'],
+                "Order Date": order['order_date'],
+                "Pickup Date": order['pickup_date'],
+            } for order in pending])
+        if collected:
+            st.markdown("##### Collected orders")
+            paged_table('customer_collected', collected, lambda order: {
+                "Order Qty": order['order_count'],
+                "Order Date": order['order_date'],
+                "Pickup Date": order['pickup_date'],
+            }, date_field='pickup_date')
+        if bought:
+            st.markdown("##### Purchases")
+            paged_table('customer_sales', bought, lambda sale: {
+                "Date": sale['date'],
+                "Type": sale['type'],
+                "Quantity": sale['count'],
+            }, date_field='date')
+
+# --- PANEL 7: Hatch models ---
+with st.expander("7️⃣ Hatch Models & Probabilistic Forecast"), timings.section('panel: hatch models'):
+    models = get_hatch_models()
+    st.markdown("#### Hatch model per egg source")
+    with st.form("source_hatch_models"):
+        edited = {}
+        for name in hatch_models.SOURCES:
+            model = models.sources[name]
+            st.markdown(f"**{name}**")
+            c1, c2, c3, c4 = st.columns(4)
+            edited[name] = (
+                c1.number_input("Hatch rate (%)", 0.0, 100.0, model.rate * 100, step=1.0, key=f'model_rate_{name}'),
+                c2.number_input("Incubation (days)", 1, 60, model.incubation_days, key=f'model_days_{name}'),
+                c3.number_input("Rate spread (± %)", 0.0, 50.0, model.rate_sd * 100, step=1.0, key=f'model_rate_sd_{name}'),
+                c4.number_input("Incubation spread (± days)", 0.0, 14.0, model.incubation_sd, step=0.5, key=f'model_days_sd_{name}'),
+            )
+        save_source_models = st.form_submit_button("Save hatch models")
+    if save_source_models:
+        try:
+            for name, (rate, days, rate_sd, days_sd) in edited.items():
+                model = hatch_models.HatchModel(rate / 100, days, rate_sd / 100, days_sd)
+                if model != models.sources.get(name):
+                    models.set_source_model(name, model)
+            save_hatch_models()
+            st.success("Hatch models saved")
+        except ValueError as e:
+            st.error(str(e))
+
+    st.markdown("#### Per-batch settings")
+    model_batches = egg_batches(st.session_state.egg_inventory)
+    if model_batches:
+        def batch_label(i):
+            d = model_batches[i].incubation_date
+            custom = ", custom model" if d in models.overrides else ""
+            return f"{d} ({model_batches[i].eggs} eggs, {models.batch_sources.get(d, hatch_models.DEFAULT_SOURCE)}{custom})"
+
+        batch_idx = st.selectbox("Batch", list(range(len(model_batches))), format_func=batch_label, key='model_batch')
+        batch_date = model_batches[batch_idx].incubation_date
+        batch_model = models.model_for(batch_date)
+        batch_source = models.batch_sources.get(batch_date, hatch_models.DEFAULT_SOURCE)
+        with st.form("batch_hatch_model"):
+            new_source = st.selectbox("Egg source", hatch_models.SOURCES,
+                                      index=hatch_models.SOURCES.index(batch_source) if batch_source in hatch_models.SOURCES else 0)
+            custom = st.checkbox("Use a custom model for this batch", value=batch_date in models.overrides)
+            c1, c2, c3, c4 = st.columns(4)
+            b_rate = c1.number_input("Hatch rate (%)", 0.0, 100.0, batch_model.rate * 100, step=1.0)
+            b_days = c2.number_input("Incubation (days)", 1, 60, batch_model.incubation_days)
+            b_rate_sd = c3.number_input("Rate spread (± %)", 0.0, 50.0, batch_model.rate_sd * 100, step=1.0)
+            b_days_sd = c4.number_input("Incubation spread (± days)", 0.0, 14.0, batch_model.incubation_sd, step=0.5)
+            save_batch_model = st.form_submit_button("Save batch settings")
+        if save_batch_model:
+            try:
+                override = hatch_models.HatchModel(b_rate / 100, b_days, b_rate_sd / 100, b_days_sd) if custom else None
+                models.assign(batch_date, new_source)
+                models.set_override(batch_date, override)
+                save_hatch_models()
+                st.success(f"Saved settings for the batch of {batch_date}")
+            except ValueError as e:
+                st.error(str(e))
+    else:
+        st.info("No batches incubating")
+
+    st.markdown("#### Probabilistic pickup forecast")
+    c1, c2 = st.columns(2)
+    mc_runs = c1.selectbox("Scenarios", (500, 1000, 2000, 5000), index=1, key='mc_runs')
+    if c2.checkbox("Show P50/P90 pickup dates", key='mc_enabled'):
+        mc_started = time.perf_counter()
+        try:
+            ranges = forecast_pickup_ranges(mc_runs)
+        except Exception as e:
+            st.error(f"Error running the forecast: {e}")
+            ranges = []
+        st.caption(f"{len(ranges)} open orders over {mc_runs} scenarios "
+                   f"({(time.perf_counter() - mc_started) * 1000:.0f} ms). P50/P90: the date by which the order "
+                   "can be picked up in half / nine in ten of the scenarios.")
+        if ranges:
+            paged_table('pickup_ranges', ranges, lambda r: {
+                "Customer": r[0]['name'],
+                "Order Qty": r[0]['order_count'],
+                "Order Date": r[0]['order_date'],
+                "Forecast": r[0]['pickup_date'],
+                "P50": r[1],
+                "P90": r[2],
+                "Filled (%)": round(r[3] * 100),
+            })
+
+# --- PANEL 8: What-if scenarios ---
+with st.expander("8️⃣ What-if Scenarios"), timings.section('panel: scenarios'):
+    st.caption("Try hypothetical egg arrivals, hatches and orders on a copy of the current data; "
+               "the real data is never changed. Scenarios belong to this browser session.")
+    scenarios = st.session_state.setdefault('scenarios', {})
+    col_name, col_from = st.columns(2)
+    new_scenario = col_name.text_input("New scenario name", key='scenario_name')
+    fork_from = col_from.selectbox("Start from", ["Current data"] + list(scenarios))
+    if st.button("Create scenario"):
+        scenario_name = new_scenario.strip() or f"Scenario {len(scenarios) + 1}"
+        if scenario_name in scenarios:
+            st.error(f"A scenario called {scenario_name} already exists")
+        elif fork_from == "Current data":
+            version, state = get_shared_store().view()
+            scenarios[scenario_name] = Scenario(scenario_name, state, version)
+        else:
+            scenarios[scenario_name] = scenarios[fork_from].fork(scenario_name)
+
+    if scenarios:
+        st.markdown("#### Edit scenario")
+        scenario = scenarios[st.selectbox("Scenario", list(scenarios))]
+        c1, c2, c3 = st.columns(3)
+        with c1.form("scenario_eggs"):
+            what_if_egg_date = st.date_input("Eggs set on", key='scenario_egg_date')
+            what_if_eggs = st.number_input("Eggs", min_value=1, step=1, value=1000)
+            what_if_source = st.selectbox("Egg source", hatch_models.SOURCES, key='scenario_egg_source')
+            add_what_if_eggs = st.form_submit_button("Add eggs")
+        with c2.form("scenario_hatch"):
+            what_if_hatch_date = st.date_input("Hatch date", key='scenario_hatch_date')
+            what_if_chicks = st.number_input("Chicks", min_value=1, step=1, value=100)
+            add_what_if_hatch = st.form_submit_button("Add hatch")
+        with c3.form("scenario_order"):
+            what_if_customer = st.text_input("Customer", key='scenario_customer_name')
+            what_if_count = st.number_input("Chicks ordered", min_value=1, step=1, value=10)
+            what_if_order_date = st.date_input("Order date", key='scenario_order_date')
+            add_what_if_order = st.form_submit_button("Add order")
+        if add_what_if_eggs:
+            scenario.add_eggs(what_if_egg_date, what_if_eggs, what_if_source)
+        if add_what_if_hatch:
+            scenario.add_hatch(what_if_hatch_date, what_if_chicks)
+        if add_what_if_order and what_if_customer:
+            scenario.add_order(what_if_customer, what_if_count, what_if_order_date)
+        st.write(f"**{scenario.name}** (from data version {scenario.version}): "
+                 + ("; ".join(scenario.changes) if scenario.changes else "no changes yet"))
+        if st.button("Delete scenario"):
+            del scenarios[scenario.name]
+            st.rerun()
+
+        st.markdown("#### Compare scenarios")
+        compared = st.multiselect("Scenarios to compare", list(scenarios), default=list(scenarios))
+        policy = get_shared_store().derived['allocation_policy']
+        forecasts = {}
+        for name in compared:
+            forecasts[name] = scenarios[name].forecast(datetime.date.today(), get_hatch_models(),
+                                                       policy['split'], policy['window_days'])
+        st.dataframe([{
+            "Scenario": name,
+            "Changes": len(scenarios[name].changes),
+            "Open orders": f.open_orders,
+            "Filled": f.filled,
+            "Last pickup": str(f.last_pickup or "—"),
+        } for name, f in forecasts.items()])
+
+        compare_query = st.text_input("Compare pickups for customers starting with", key='scenario_customer')
+        compare_orders = {}
+        if compare_query:
+            orders = st.session_state.chicks_orders
+            for customer in get_customer_index().search(compare_query, limit=50):
+                for i in customer.orders:
+                    if not orders[i]['picked_up']:
+                        compare_orders[id(orders[i])] = orders[i]
+        hypothetical = set()
+        for name in compared:
+            for order in scenarios[name].orders:
+                compare_orders[id(order)] = order
+                hypothetical.add(id(order))
+
+        def scenario_row(order):
+            # strings throughout: a column mixes dates with "not filled" / "—"
+            row = {
+                "Customer": order['name'],
+                "Order Qty": order['order_count'],
+                "Order Date": str(order['order_date']),
+                "Current": "—" if id(order) in hypothetical else str(order['pickup_date'] or "not filled"),
+            }
+            for name, f in forecasts.items():
+                if id(order) in f.dates:
+                    row[name] = str(f.dates[id(order)] or "not filled")
+                else:
+                    row[name] = "—"
+            return row
+
+        if compare_orders:
+            paged_table('scenario_orders', list(compare_orders.values()), scenario_row)
+        else:
+            st.info("Add an order to a scenario or search for a customer to compare pickup dates")
+
+# Make sure journaled events from this run are on disk
+try:
+    get_journal().sync()
+except Exception:
+    pass
+
+# --- Diagnostics ---
+with st.expander("⏱️ Diagnostics"):
+    timings.enabled = st.checkbox("Collect timings", value=timings.enabled,
+                                  help="Times each panel and helper; shared by all sessions of this server.")
+    section_stats = timings.stats()
+    if section_stats:
+        st.caption(f"Most recent {timings.capacity} calls per section; times in milliseconds")
+        st.dataframe([{
+            'Section': name,
+            'Calls': stat['calls'],
+            'p50': round(stat['p50'] * 1000, 1),
+            'p95': round(stat['p95'] * 1000, 1),
+            'Max': round(stat['max'] * 1000, 1),
+            'Last': round(stat['last'] * 1000, 1),
+        } for name, stat in sorted(section_stats.items(), key=lambda item: -item[1]['p95'])])
+    else:
+        st.info("No timings collected yet")
+    counters = timings.counters()
+    if counters:
+        st.write(", ".join(f"{name}: {n}" for name, n in sorted(counters.items())))
+    col_dump, col_reset = st.columns(2)
+    col_dump.download_button("Download timings (JSON)", data=json.dumps(timings.dump(), indent=2),
+                             file_name="farm_timings.json", mime="application/json")
+    if col_reset.button("Reset timings"):
+        timings.reset()
+        st.rerun()
+
+if timings.enabled:
+    timings.record('rerun', time.perf_counter() - _rerun_started)
 
 # -- END OF APP --
 st.markdown("---")
 st.caption(
-    "Built for demonstration. Data resets on rerun unless persisted externally."
+    "Built for demonstration. Changes are journaled to .streamlit/journal/ and recovered on startup."
 )
\ No newline at end of file
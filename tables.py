@@ -0,0 +1,66 @@
+"""Server-side filtering, sorting and paging for large tables.
+
+The app keeps whole record lists in memory but should only build and send
+the rows a user is looking at. `select()` narrows and orders the records
+(without building any rows), `page()` slices out one page, and
+`page_columns()` does the same for column-oriented tables such as the
+per-date summaries. Pages are capped at `ROW_CAP` rows.
+"""
+import math
+
+PAGE_SIZES = (25, 50, 100, 250)
+ROW_CAP = 250
+
+
+def _sort_key(field):
+    # None sorts last in ascending order, whatever the field type
+    def key(item):
+        value = item[field]
+        return (value is None, value if value is not None else 0)
+    return key
+
+
+def select(items, date_field=None, start=None, end=None, sort_field=None, descending=False, predicate=None):
+    """Records of `items` inside the date range, optionally filtered and sorted.
+
+    Records without a date are dropped only when a range is given. Returns
+    `items` itself when there is nothing to do.
+    """
+    selected = items
+    if date_field and (start is not None or end is not None):
+        selected = [
+            item for item in selected
+            if item[date_field] is not None
+            and (start is None or item[date_field] >= start)
+            and (end is None or item[date_field] <= end)
+        ]
+    if predicate is not None:
+        selected = [item for item in selected if predicate(item)]
+    if sort_field:
+        selected = sorted(selected, key=_sort_key(sort_field), reverse=descending)
+    return selected
+
+
+def page(items, number, size):
+    """`(rows, number, pages)`: the 1-based page `number` of `items`, clamped to a valid page."""
+    size = max(1, min(int(size), ROW_CAP))
+    pages = max(1, math.ceil(len(items) / size))
+    number = min(max(1, int(number)), pages)
+    start = (number - 1) * size
+    return items[start:start + size], number, pages
+
+
+def page_columns(columns, number, size, date_column=None, start=None, end=None):
+    """Like `page()` for a dict of equal-length columns; returns `(columns, number, pages, total)`.
+
+    With `date_column` set, rows outside `start`..`end` are dropped first.
+    """
+    names = list(columns)
+    length = len(columns[names[0]]) if names else 0
+    index = range(length)
+    if date_column is not None and (start is not None or end is not None):
+        dates = columns[date_column]
+        index = [i for i in index
+                 if dates[i] is not None and (start is None or dates[i] >= start) and (end is None or dates[i] <= end)]
+    rows, number, pages = page(index, number, size)
+    return {name: [columns[name][i] for i in rows] for name in names}, number, pages, len(index)
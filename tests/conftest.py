@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+
+from farm_state import egg_arrival, new_state, order_placed
+from records import HatchRecord, Order, Sale
+from shared_store import SharedStore
+
+
+@pytest.fixture
+def make_state():
+    """Factory for a small farm state with `n_orders` orders, the second one collected."""
+    def make(n_orders=30, day=datetime.date(2024, 1, 1)):
+        state = new_state()
+        state['egg_inventory'][day] = 50
+        state['hatchery'] = [HatchRecord(day, 'Shed', 10)]
+        state['chicks_orders'] = [Order(f'c{i}', i % 5 + 1, day) for i in range(n_orders)]
+        if n_orders > 1:
+            state['chicks_orders'][1].pickup_date = day + datetime.timedelta(days=19)
+            state['chicks_orders'][1].picked_up = True
+        state['chicks_inventory'] = 7
+        state['sales'] = [Sale('Chick', 'A', 2, day)]
+        state['processed_hatch_dates'] = ['2023-12-01']
+        return state
+    return make
+
+
+@pytest.fixture
+def make_store():
+    """Factory for a `SharedStore` built through events from `{date: eggs}` and `[(name, count, date)]`."""
+    def make(eggs=None, orders=()):
+        store = SharedStore(new_state())
+        for d, n in (eggs or {}).items():
+            store.commit(egg_arrival(d, n))
+        for name, n, d in orders:
+            store.commit(order_placed(name, n, d))
+        return store
+    return make
@@ -0,0 +1,68 @@
+import datetime
+import random
+
+from aggregates import availability_table, date_totals
+from records import Order
+
+
+def test_date_totals_sums_and_sorts():
+    d1, d2 = datetime.date(2024, 1, 2), datetime.date(2024, 1, 1)
+    dates, totals = date_totals([(d1, 3), (d2, 4), (None, 9), (d1, 5)])
+    assert dates == [d2, d1]
+    assert totals.tolist() == [4, 8]
+    empty_dates, empty_totals = date_totals([])
+    assert empty_dates == [] and len(empty_totals) == 0
+
+
+def test_availability_table_matches_daily_loop():
+    rng = random.Random(1)
+    start = datetime.date(2024, 5, 1)
+    end = start + datetime.timedelta(days=90)
+    eggs = {start + datetime.timedelta(days=rng.randint(-40, 80)): rng.randint(1, 500) for _ in range(30)}
+    orders = [Order(str(i), rng.randint(1, 50), start,
+                    rng.choice([None, start + datetime.timedelta(days=rng.randint(-5, 100))])) for i in range(200)]
+
+    # reference: the original per-day loop
+    eggs_by_hatch_day = {}
+    for incubation_date, egg_count in eggs.items():
+        hatch_day = incubation_date + datetime.timedelta(weeks=3)
+        eggs_by_hatch_day[hatch_day] = eggs_by_hatch_day.get(hatch_day, 0) + int(egg_count * 0.85)
+    allocated_by_date = {}
+    for o in orders:
+        if o.pickup_date is not None:
+            allocated_by_date[o.pickup_date] = allocated_by_date.get(o.pickup_date, 0) + o.order_count
+    expected = []
+    cur, cum_h, cum_a = start, 0, 0
+    while cur <= end:
+        h, a = eggs_by_hatch_day.get(cur, 0), allocated_by_date.get(cur, 0)
+        cum_h += h
+        cum_a += a
+        expected.append((cur, h, a, max(0, h - a), cum_h, cum_a, max(0, cum_h - cum_a)))
+        cur += datetime.timedelta(days=1)
+
+    table = availability_table(eggs, orders, start, end)
+    got = list(zip(*(table[c] if c == "Date" else table[c].tolist() for c in table)))
+    assert got == expected
+
+
+def test_summary_totals_and_memoisation():
+    from aggregates import build_summary, cached_summary
+    from farm_state import new_state
+    from records import HatchRecord, Sale
+    d = datetime.date(2024, 1, 1)
+    state = new_state()
+    state['egg_inventory'][d] = 100
+    state['hatchery'] = [HatchRecord(d, 'X', 10), HatchRecord(d, 'Y', 5)]
+    state['chicks_orders'] = [Order('A', 4, d, d, True), Order('B', 6, d, d), Order('C', 1, d)]
+    state['sales'] = [Sale('Chick', 'A', 2, d), Sale('Cock', 'B', 1, d), Sale('Chick', 'C', 3, d)]
+    s = build_summary(state)
+    assert (s.total_orders, s.total_ordered_chicks, s.pending_orders) == (3, 11, 2)
+    assert (s.total_picked, s.pending_chicks_with_date) == (4, 6)
+    assert (s.total_eggs, s.forecast_chicks, s.total_hatched) == (100, 85, 15)
+    assert s.sales_totals == {'Chick': 5, 'Cock': 1}
+    assert s.chick_sales_by_date[1].tolist() == [5]
+
+    cache = {}
+    first = cached_summary(cache, state, (1, 1))
+    assert cached_summary(cache, state, (1, 1)) is first
+    assert cached_summary(cache, state, (2, 1)) is not first
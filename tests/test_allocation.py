@@ -0,0 +1,200 @@
+import datetime
+import random
+
+from allocation import FenwickTree, MaxSegmentTree, allocate_fifo, allocate_split, build_availability
+from records import Order
+
+
+def linear_allocate(orders, availability, today):
+    # Reference implementation: the original per-order scan over sorted dates
+    all_orders = sorted(orders, key=lambda x: x.get('order_date') or datetime.date.min)
+    stock = {d: availability[d] for d in sorted(availability.keys())}
+    for order in all_orders:
+        if order.get('picked_up'):
+            continue
+        order_qty = int(order.get('order_count', 0) or 0)
+        order['pickup_date'] = None
+        if order_qty <= 0:
+            continue
+        od = order.get('order_date')
+        if not isinstance(od, datetime.date):
+            od = today
+        earliest_allowed = max(today, od)
+        for d in sorted(stock.keys()):
+            if d < earliest_allowed:
+                continue
+            if stock.get(d, 0) >= order_qty:
+                stock[d] -= order_qty
+                order['pickup_date'] = d
+                break
+    return all_orders
+
+
+def test_segment_tree_find_first_matches_scan():
+    rng = random.Random(7)
+    values = [rng.randint(0, 20) for _ in range(37)]
+    tree = MaxSegmentTree(values)
+    for lo in range(40):
+        for qty in range(1, 23):
+            expected = next((i for i in range(lo, len(values)) if values[i] >= qty), -1)
+            assert tree.find_first(lo, qty) == expected
+
+
+def test_segment_tree_add_updates_maximum():
+    tree = MaxSegmentTree([5, 0, 3])
+    assert tree.find_first(0, 5) == 0
+    tree.add(0, -5)
+    assert tree.find_first(0, 4) == -1
+    tree.add(1, 9)
+    assert tree.find_first(0, 4) == 1
+    assert tree.get(1) == 9
+
+
+def test_allocate_fifo_matches_linear_reference():
+    rng = random.Random(42)
+    today = datetime.date(2024, 3, 1)
+    for _ in range(25):
+        hatchery = [
+            {'date': today + datetime.timedelta(days=rng.randint(-5, 60)), 'location': 'X', 'chicks': rng.randint(0, 80)}
+            for _ in range(rng.randint(0, 15))
+        ]
+        eggs = {today + datetime.timedelta(days=rng.randint(-30, 30)): rng.randint(0, 120) for _ in range(10)}
+        availability = build_availability(rng.randint(0, 50), hatchery, eggs, today)
+        orders = []
+        for i in range(rng.randint(1, 60)):
+            od = rng.choice([None, today + datetime.timedelta(days=rng.randint(-10, 40))])
+            orders.append({'name': str(i), 'order_count': rng.randint(0, 90), 'order_date': od,
+                           'pickup_date': None, 'picked_up': rng.random() < 0.1})
+        expected = [dict(o) for o in orders]
+        linear_allocate(expected, availability, today)
+        allocate_fifo(orders, availability, today)
+        assert [o['pickup_date'] for o in orders] == [o['pickup_date'] for o in expected]
+
+
+def test_incremental_allocator_matches_full_recompute():
+    from allocation import IncrementalAllocator
+    rng = random.Random(3)
+    today = datetime.date(2024, 3, 1)
+    hatchery = [{'date': today + datetime.timedelta(days=d), 'location': 'X', 'chicks': 40} for d in range(0, 30, 3)]
+    eggs = {today: 200}
+    orders = []
+    engine = IncrementalAllocator()
+    inventory = 25
+    for step in range(200):
+        action = rng.random()
+        if action < 0.5:
+            orders.append({'name': str(step), 'order_count': rng.randint(1, 60),
+                           'order_date': today + datetime.timedelta(days=rng.randint(-5, 20)),
+                           'pickup_date': None, 'picked_up': False})
+        elif action < 0.65:
+            hatchery.append({'date': today + datetime.timedelta(days=rng.randint(0, 40)), 'location': 'Y', 'chicks': rng.randint(1, 50)})
+        elif action < 0.8:
+            d = today + datetime.timedelta(days=rng.randint(-21, 10))
+            eggs[d] = eggs.get(d, 0) + rng.randint(1, 100)
+        elif orders:
+            order = rng.choice(orders)
+            if not order['picked_up'] and order['pickup_date'] == today:
+                order['picked_up'] = True
+                inventory = max(0, inventory - order['order_count'])
+                engine.mark_order_changed(order)
+        availability = build_availability(inventory, hatchery, eggs, today)
+        result = engine.refresh(orders, availability, today)
+        expected = [dict(o) for o in orders]
+        linear_allocate(expected, availability, today)
+        assert [o['pickup_date'] for o in orders] == [o['pickup_date'] for o in expected]
+        assert len(result) == len(orders)
+
+
+def test_incremental_allocator_only_touches_dirty_suffix():
+    from allocation import IncrementalAllocator
+    today = datetime.date(2024, 3, 1)
+    orders = [{'name': str(i), 'order_count': 1, 'order_date': today, 'pickup_date': None, 'picked_up': False}
+              for i in range(10)]
+    engine = IncrementalAllocator()
+    engine.refresh(orders, {today: 10}, today)
+    calls = []
+    original = engine._allocate_from
+    engine._allocate_from = lambda start: (calls.append(start), original(start))
+    orders.append({'name': 'late', 'order_count': 1, 'order_date': today + datetime.timedelta(days=1),
+                   'pickup_date': None, 'picked_up': False})
+    engine.refresh(orders, {today: 10, today + datetime.timedelta(days=1): 1}, today)
+    assert calls == [10]
+    assert orders[-1]['pickup_date'] == today + datetime.timedelta(days=1)
+
+
+def test_fenwick_tree_sums_and_search_match_scan():
+    rng = random.Random(11)
+    values = [rng.randint(0, 9) for _ in range(45)]
+    tree = FenwickTree(values)
+    for _ in range(100):
+        i = rng.randrange(len(values))
+        delta = -rng.randint(0, values[i])
+        values[i] += delta
+        tree.add(i, delta)
+        lo = rng.randrange(len(values) + 1)
+        hi = rng.randrange(lo, len(values) + 1)
+        assert tree.range_sum(lo, hi) == sum(values[lo:hi])
+        target = rng.randint(1, sum(values) + 3)
+        expected = next((k for k in range(len(values)) if sum(values[:k + 1]) >= target), len(values))
+        assert tree.search(target) == expected
+    assert tree.total == sum(values)
+
+
+def linear_split(orders, availability, today, window):
+    # Reference: try completion dates in order, filling greedily from the window start
+    stock = dict(availability)
+    days = sorted(d for d in stock if d >= today)
+    result = {}
+    for order in sorted(orders, key=lambda o: o.order_date):
+        if order.picked_up:
+            continue
+        lo = max(today, order.order_date)
+        result[order.name] = []
+        for end in days:
+            if end < lo:
+                continue
+            start = lo if window is None else max(lo, end - datetime.timedelta(days=window - 1))
+            if sum(stock[d] for d in days if start <= d <= end) >= order.order_count:
+                remaining = order.order_count
+                for d in days:
+                    if start <= d and remaining and stock[d]:
+                        take = min(stock[d], remaining)
+                        stock[d] -= take
+                        remaining -= take
+                        result[order.name].append((d, take))
+                break
+    return result
+
+
+def test_allocate_split_fills_across_dates_within_window():
+    today = datetime.date(2024, 5, 1)
+    day = datetime.timedelta(days=1)
+    availability = {today: 200, today + day: 100, today + 3 * day: 250, today + 9 * day: 400}
+    orders = [Order('big', 500, today), Order('small', 50, today), Order('done', 10, today, today, True)]
+    fifo, parts = allocate_split(orders, availability, today)
+    assert parts[id(orders[0])] == [(today, 200), (today + day, 100), (today + 3 * day, 200)]
+    assert orders[0].pickup_date == today + 3 * day
+    assert parts[id(orders[1])] == [(today + 3 * day, 50)]
+    assert id(orders[2]) not in parts and orders[2].pickup_date == today
+
+    # no 3-day window holds 500, so only the small order is filled; 4 days do
+    orders = [Order('big', 500, today), Order('small', 50, today)]
+    _, parts = allocate_split(orders, availability, today, window_days=3)
+    assert orders[0].pickup_date is None and parts[id(orders[0])] == []
+    assert orders[1].pickup_date == today
+    allocate_split(orders, availability, today, window_days=4)
+    assert orders[0].pickup_date == today + 3 * day
+    _, parts = allocate_split([Order('huge', 5000, today)], availability, today, window_days=3)
+    assert list(parts.values()) == [[]]
+
+
+def test_allocate_split_matches_linear_reference():
+    rng = random.Random(5)
+    today = datetime.date(2024, 5, 1)
+    for window in (None, 1, 4):
+        availability = {today + datetime.timedelta(days=rng.randint(0, 40)): rng.randint(0, 60) for _ in range(25)}
+        orders = [Order(str(i), rng.randint(1, 120), today + datetime.timedelta(days=rng.randint(-5, 30)),
+                        picked_up=rng.random() < 0.1) for i in range(80)]
+        expected = linear_split(orders, availability, today, window)
+        _, parts = allocate_split(orders, availability, today, window)
+        assert {o.name: parts[id(o)] for o in orders if not o.picked_up} == expected
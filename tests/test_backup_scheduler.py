@@ -0,0 +1,57 @@
+import threading
+import time
+
+from backup_scheduler import BackupScheduler
+
+
+def test_requests_queued_behind_a_running_backup_are_merged():
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return f'backup-{len(calls)}'
+
+    scheduler = BackupScheduler(run, lambda: 0.0).start()
+    try:
+        assert scheduler.request('save')
+        assert started.wait(5)
+        # one backup is running; the next request queues and the rest merge into it
+        assert scheduler.request('save')
+        assert not scheduler.request('save')
+        assert not scheduler.request('load')
+        release.set()
+        assert scheduler.wait_idle(5)
+        status = scheduler.status()
+        assert len(calls) == 2
+        assert status['runs'] == 2 and status['merged'] == 2
+        assert status['last_path'] == 'backup-2' and status['failures'] == 0
+    finally:
+        scheduler.stop(5)
+
+
+def test_failures_are_recorded_and_interval_backups_run_when_due():
+    ages = [None]
+
+    def run():
+        if ages[0] is None:
+            ages[0] = 0.0
+            raise OSError('disk full')
+        return 'ok'
+
+    scheduler = BackupScheduler(run, lambda: ages[0], check_interval=0.01).start()
+    try:
+        scheduler.configure(True, 1)
+        deadline = time.monotonic() + 5
+        while scheduler.status()['runs'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        status = scheduler.status()
+        # the failed run does not repeat: the age check now reports a fresh backup
+        assert status['runs'] == 1 and status['failures'] == 1
+        assert status['last_reason'] == 'interval' and 'disk full' in status['last_error']
+    finally:
+        scheduler.stop(5)
@@ -0,0 +1,100 @@
+import datetime
+import os
+import threading
+
+import backups
+from records import Order
+
+
+def test_unchanged_partitions_are_not_rewritten(tmp_path, make_state):
+    d = str(tmp_path)
+    state = make_state(1000)
+    t0 = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    _, first = backups.create_backup(state, d, chunk_rows=100, now=t0)
+    assert first['new_chunks'] == first['chunks']
+    # change one order in the middle and append one more
+    state['chicks_orders'][450].picked_up = True
+    state['chicks_orders'].append(Order('late', 1, None))
+    _, second = backups.create_backup(state, d, chunk_rows=100, now=t0 + datetime.timedelta(seconds=1))
+    assert second['chunks'] == first['chunks'] + 1
+    assert second['new_chunks'] == 2
+    # only the two changed order partitions were serialised and hashed again
+    assert second['unchanged_chunks'] == second['chunks'] - 2
+
+
+def test_backups_in_the_same_instant_keep_both_manifests(tmp_path, make_state):
+    d = str(tmp_path)
+    t0 = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    first, _ = backups.create_backup(make_state(5), d, now=t0)
+    second, _ = backups.create_backup(make_state(6), d, now=t0)
+    assert first != second
+    assert len(backups.read_manifest(first)['tables']['chicks_orders.csv']) == 1
+    assert backups.read_manifest(second)['tables']['chicks_orders.csv'][0]['rows'] == 6
+
+
+def test_manifest_rows_round_trip(tmp_path, make_state):
+    d = str(tmp_path)
+    state = make_state(250)
+    path, _ = backups.create_backup(state, d, chunk_rows=100)
+    manifest = backups.read_manifest(path)
+    rows = list(backups.iter_member_rows(manifest, backups.chunk_store(d), 'chicks_orders.csv'))
+    assert len(rows) == 250
+    assert rows[0] == ['c0', '1', '2024-01-01', '', 'False']
+    assert list(backups.iter_member_rows(manifest, backups.chunk_store(d), 'processed_hatch_dates.csv')) == [['2023-12-01']]
+
+
+def test_collect_garbage_keeps_chunks_still_referenced(tmp_path, make_state):
+    d = str(tmp_path)
+    t0 = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    old, _ = backups.create_backup(make_state(10), d, now=t0)
+    new, _ = backups.create_backup(make_state(20), d, now=t0 + datetime.timedelta(seconds=1))
+    os.remove(old)
+    assert backups.collect_garbage(d) == 1
+    manifest = backups.read_manifest(new)
+    assert len(list(backups.iter_member_rows(manifest, backups.chunk_store(d), 'chicks_orders.csv'))) == 20
+
+
+def test_collect_garbage_waits_for_a_backup_in_progress(tmp_path, monkeypatch, make_state):
+    d = str(tmp_path)
+    put = backups.ChunkStore.put
+    collectors = []
+
+    def put_then_collect(self, data):
+        result = put(self, data)
+        if not collectors:
+            collectors.append(threading.Thread(target=backups.collect_garbage, args=(d,)))
+            collectors[0].start()
+            collectors[0].join(0.2)
+        return result
+
+    monkeypatch.setattr(backups.ChunkStore, 'put', put_then_collect)
+    path, _ = backups.create_backup(make_state(250), d, chunk_rows=100)
+    collectors[0].join()
+    chunks = backups.chunk_store(d)
+    for refs in backups.read_manifest(path)['tables'].values():
+        assert all(os.path.exists(chunks.path(ref['hash'])) for ref in refs)
+
+
+def test_catalog_tracks_changes_without_rescanning(tmp_path, make_state):
+    d = str(tmp_path / 'backups')
+    catalog = backups.BackupCatalog(d)
+    assert catalog.entries() == [] and catalog.latest_age_days() is None
+    t0 = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    paths = [backups.create_backup(make_state(5), d, now=t0 + datetime.timedelta(seconds=i))[0] for i in range(3)]
+    for i, p in enumerate(paths):
+        os.utime(p, (1700000000 + i, 1700000000 + i))
+        catalog.add(p)
+    names = [os.path.basename(p) for p in paths]
+    assert [b['name'] for b in catalog.entries()] == names[::-1]
+
+    catalog.move(names[0], 'backups', 'trash')
+    assert [t['name'] for t in catalog.entries('trash')] == [names[0]]
+    catalog.remove(names[0], 'trash')
+    assert catalog.entries('trash') == []
+    assert catalog.rotate(1) == [names[1]]
+    assert [b['name'] for b in catalog.entries()] == [names[2]]
+
+    # a fresh catalog reads the saved index; a file added behind its back forces a rescan
+    assert [b['name'] for b in backups.BackupCatalog(d).entries()] == [b['name'] for b in catalog.entries()]
+    open(os.path.join(d, 'farm_backup_manual.zip'), 'wb').close()
+    assert 'farm_backup_manual.zip' in [b['name'] for b in catalog.entries()]
@@ -0,0 +1,56 @@
+import datetime
+import io
+
+import pytest
+
+import exporter
+from bulk_import import BulkImport, detect_kind
+from farm_state import apply_event, new_state
+from records import HatchRecord, Order, Sale
+
+
+def test_rows_are_validated_in_batches_with_line_numbers():
+    text = io.StringIO(
+        "Order_Count,Name,order_date\n"
+        "3,Alice,2024-01-02\n"
+        "0,Bob,2024-01-02\n"
+        "\n"
+        "2,,2024-01-03\n"
+        "4,Carol,not a date\n"
+        "5,Dan,\n"
+    )
+    importer = BulkImport(batch_rows=2)
+    assert importer.add_csv(text, 'orders.csv') == 'orders'
+    assert importer.counts['orders'] == 2
+    assert [(e.line, e.message) for e in importer.errors][:2] == [
+        (3, 'order_count must be at least 1'), (5, 'name is required')]
+    assert importer.errors[2].line == 6 and importer.error_count == 3
+
+
+def test_export_zip_imports_as_one_event():
+    d = datetime.date(2024, 1, 1)
+    source = new_state()
+    source['egg_inventory'][d] = 40
+    source['hatchery'] = [HatchRecord(d, 'Shed', 10)]
+    source['chicks_orders'] = [Order('A', 3, d), Order('B', 2, d, d, True)]
+    source['sales'] = [Sale('Chick', 'C', 1, d)]
+    buf = io.BytesIO()
+    exporter.write_export_zip(source, buf)
+    buf.seek(0)
+
+    importer = BulkImport()
+    importer.add_file(buf, 'backup.zip')
+    assert importer.error_count == 0 and importer.accepted == 5
+    state = new_state()
+    state['egg_inventory'][d] = 5
+    apply_event(state, importer.event())
+    assert state['egg_inventory'][d] == 45
+    assert state['chicks_orders'] == source['chicks_orders']
+    # +10 hatched, -2 collected, -1 sold
+    assert state['chicks_inventory'] == 7
+
+
+def test_unrecognised_header_is_rejected():
+    assert detect_kind(['date', 'eggs']) == 'eggs'
+    with pytest.raises(ValueError, match='unrecognised header'):
+        BulkImport().add_csv(io.StringIO("foo,bar\n1,2\n"), 'x.csv')
@@ -0,0 +1,43 @@
+import datetime
+
+from customers import CustomerIndex, normalise
+from records import Order, Sale
+
+D = datetime.date(2024, 6, 1)
+
+
+def test_normalise_folds_case_and_spacing():
+    assert normalise('  Tendai   MOYO ') == 'tendai moyo'
+    assert normalise(None) == ''
+
+
+def test_refresh_indexes_appended_records_and_rebuilds_on_swap():
+    orders = [Order('Tendai Moyo', 10, D), Order('rudo banda', 5, D, D, True), Order('tendai  moyo', 20, D)]
+    sales = [Sale('Chick', 'Rudo Banda', 3, D)]
+    index = CustomerIndex().refresh(orders, sales)
+    assert len(index) == 2
+    assert index.get('TENDAI MOYO').orders == [0, 2]
+    assert index.get('Tendai Moyo').name == 'Tendai Moyo'
+
+    orders.append(Order('Chipo Dube', 1, D))
+    sales.append(Sale('Cock', 'Tendai Moyo', 2, D))
+    index.refresh(orders, sales)
+    assert index.get('chipo dube').orders == [3]
+    assert index.get('tendai moyo').sales == [1]
+
+    pending, collected, bought = index.history('Rudo Banda')
+    assert pending == [] and collected == [orders[1]] and bought == [sales[0]]
+    assert index.history('nobody') == ([], [], [])
+
+    index.refresh([Order('Farai Ncube', 1, D)], [])
+    assert [c.name for c in index.search('')] == ['Farai Ncube']
+
+
+def test_search_matches_name_and_word_prefixes():
+    orders = [Order(name, 1, D) for name in ('Tendai Moyo', 'Tatenda Moyo', 'Moyo Farms', 'Tsitsi Ncube')]
+    index = CustomerIndex().refresh(orders, [])
+    assert [c.name for c in index.search('t')] == ['Tatenda Moyo', 'Tendai Moyo', 'Tsitsi Ncube']
+    assert [c.name for c in index.search('MOY')] == ['Moyo Farms', 'Tatenda Moyo', 'Tendai Moyo']
+    assert [c.name for c in index.search('tendai m')] == ['Tendai Moyo']
+    assert index.search('x') == []
+    assert len(index.search('', limit=2)) == 2
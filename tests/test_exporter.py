@@ -0,0 +1,39 @@
+import csv
+import datetime
+import io
+import json
+import zipfile
+
+import exporter
+
+
+def test_streamed_archive_contents(make_state):
+    state = make_state(2500)
+    buf = io.BytesIO()
+    exporter.write_export_zip(state, buf, chunk_rows=100)
+    with zipfile.ZipFile(buf) as z:
+        assert sorted(z.namelist()) == ['chicks_orders.csv', 'egg_inventory.csv', 'hatchery.csv', 'meta.json', 'sales.csv']
+        rows = list(csv.reader(io.TextIOWrapper(z.open('chicks_orders.csv'), encoding='utf-8', newline='')))
+        assert rows[0] == ['name', 'order_count', 'order_date', 'pickup_date', 'picked_up']
+        assert len(rows) == 2501
+        assert rows[1] == ['c0', '1', '2024-01-01', '', 'False']
+        assert json.loads(z.read('meta.json'))['chicks_inventory'] == 7
+
+
+def test_export_cache_rebuilds_only_on_a_new_key(make_state):
+    state = make_state(10)
+    cache = exporter.ExportCache(max_memory=1024)
+    calls = []
+
+    def get_state():
+        calls.append(1)
+        return state
+
+    first = cache.read((1, 0), get_state)
+    assert cache.read((1, 0), get_state) == first
+    assert len(calls) == 1
+    # a forecast change with the same data version still rebuilds
+    state['chicks_orders'][0].pickup_date = datetime.date(2024, 2, 1)
+    assert cache.read((1, 1), get_state) != first
+    assert len(calls) == 2
+    cache.close()
@@ -0,0 +1,83 @@
+import datetime
+import random
+
+import pytest
+
+from aggregates import availability_table
+from allocation import allocate_fifo, build_availability
+from hatch_models import HatchModel, HatchModels, simulate_pickups
+from hatching import HatchQueue
+from records import Order
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+def _models():
+    models = HatchModels()
+    models.set_source_model('Contract Farmer', HatchModel(0.5, 20, 0.0, 0.0))
+    models.assign(TODAY - datetime.timedelta(days=10), 'Contract Farmer')
+    models.set_override(TODAY - datetime.timedelta(days=5), HatchModel(1.0, 18))
+    return models
+
+
+def test_models_per_source_and_batch_round_trip(tmp_path):
+    models = _models()
+    assert models.model_for(TODAY - datetime.timedelta(days=10)).rate == 0.5
+    assert models.model_for(TODAY - datetime.timedelta(days=5)).incubation_days == 18
+    assert models.model_for(TODAY) == HatchModel()
+    assert models.version == 3
+    with pytest.raises(ValueError):
+        HatchModel(rate=1.5)
+
+    path = str(tmp_path / 'models.json')
+    models.save(path)
+    loaded = HatchModels.load(path)
+    assert loaded.to_dict() == models.to_dict()
+    assert HatchModels.load(str(tmp_path / 'missing.json')).to_dict() == HatchModels().to_dict()
+
+
+def test_deterministic_paths_use_the_batch_models():
+    models = _models()
+    eggs = {TODAY - datetime.timedelta(days=10): 100, TODAY - datetime.timedelta(days=5): 100, TODAY: 100}
+    availability = build_availability(0, [], eggs, TODAY, models)
+    assert availability == {
+        TODAY: 0,
+        TODAY + datetime.timedelta(days=10): 50,
+        TODAY + datetime.timedelta(days=13): 100,
+        TODAY + datetime.timedelta(days=21): 85,
+    }
+    table = availability_table(eggs, [], TODAY, TODAY + datetime.timedelta(days=21), models)
+    assert table["Hatched (est)"].sum() == 235 and table["Hatched (est)"][13] == 100
+
+    queue = HatchQueue(models).refresh(eggs, [])
+    assert queue.next_hatch_day() == TODAY + datetime.timedelta(days=10)
+    assert queue.due(TODAY + datetime.timedelta(days=13)) == [
+        (TODAY - datetime.timedelta(days=10), TODAY + datetime.timedelta(days=10), 50),
+        (TODAY - datetime.timedelta(days=5), TODAY + datetime.timedelta(days=13), 100),
+    ]
+
+
+def test_simulation_without_spread_matches_the_point_forecast():
+    rng = random.Random(3)
+    models = HatchModels({'Own Farm': HatchModel(1.0, 21, 0.0, 0.0)})
+    eggs = {TODAY - datetime.timedelta(days=rng.randint(0, 20)): rng.randint(10, 60) for _ in range(15)}
+    orders = [Order(str(i), rng.randint(1, 40), TODAY - datetime.timedelta(days=rng.randint(0, 30)))
+              for i in range(60)]
+    orders[0].picked_up = True
+    ranges = simulate_pickups(orders, 25, [], eggs, models, TODAY, runs=50, seed=1)
+    allocate_fifo(orders, build_availability(25, [], eggs, TODAY, models), TODAY)
+    assert len(ranges) == 59
+    for order, p50, p90, filled in ranges:
+        assert p50 == p90 == order.pickup_date
+        assert filled == (1.0 if order.pickup_date else 0.0)
+
+
+def test_simulation_spread_gives_later_p90():
+    models = HatchModels({'Own Farm': HatchModel(0.8, 21, 0.1, 1.5)})
+    eggs = {TODAY - datetime.timedelta(days=d): 100 for d in range(0, 21, 3)}
+    orders = [Order(str(i), 20, TODAY) for i in range(25)]
+    ranges = simulate_pickups(orders, 0, [], eggs, models, TODAY, runs=500, seed=7)
+    assert all(p50 is None or p90 is None or p50 <= p90 for _, p50, p90, _ in ranges)
+    assert any(p50 != p90 for _, p50, p90, _ in ranges)
+    assert ranges[0][3] == 1.0 and ranges[-1][3] < 1.0
+    assert simulate_pickups(orders, 0, [], eggs, models, TODAY, runs=500, seed=7) == ranges
@@ -0,0 +1,63 @@
+import datetime
+import time
+from collections import defaultdict
+
+from farm_state import egg_arrival
+from hatching import HatchJob, HatchQueue, process_due
+from journal import Journal
+
+D = datetime.date(2024, 4, 1)
+EGGS = {D + datetime.timedelta(days=offset): eggs for offset, eggs in ((0, 100), (5, 200), (30, 50))}
+
+
+def test_queue_pops_only_matured_batches_once(make_store):
+    store = make_store(EGGS)
+    queue = HatchQueue()
+    assert process_due(store, queue, store.commit, today=D + datetime.timedelta(days=20)) == 0
+    assert queue.next_hatch_day() == D + datetime.timedelta(days=21)
+
+    assert process_due(store, queue, store.commit, today=D + datetime.timedelta(days=26)) == 2
+    state = store.state
+    assert list(state['egg_inventory']) == [D + datetime.timedelta(days=30)]
+    assert state['chicks_inventory'] == 85 + 170
+    assert state['processed_hatch_dates'] == [D.isoformat(), (D + datetime.timedelta(days=5)).isoformat()]
+    assert process_due(store, queue, store.commit, today=D + datetime.timedelta(days=26)) == 0
+
+    # a batch added later is picked up without rescanning unchanged data
+    store.commit(egg_arrival(D + datetime.timedelta(days=1), 10))
+    assert process_due(store, queue, store.commit, today=D + datetime.timedelta(days=26)) == 1
+    assert state['chicks_inventory'] == 85 + 170 + 8
+
+
+def test_processed_dates_are_never_hatched_twice():
+    queue = HatchQueue()
+    eggs = defaultdict(int, {D: 100})
+    queue.refresh(eggs, [D.isoformat()])
+    assert queue.due(D + datetime.timedelta(days=30)) == []
+    # a swapped processed list rebuilds the queue
+    queue.refresh(dict(eggs), [])
+    assert queue.due(D + datetime.timedelta(days=30)) == [(D, D + datetime.timedelta(days=21), 85)]
+
+
+def test_job_processes_matured_batches_in_the_background(make_store):
+    store = make_store({datetime.date.today() - datetime.timedelta(days=30): 100})
+    job = HatchJob(store, HatchQueue(), check_interval=5).start()
+    try:
+        deadline = time.monotonic() + 5
+        while job.status()['hatched'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        status = job.status()
+        assert status['hatched'] == 1 and status['last_error'] is None
+        assert store.state['chicks_inventory'] == 85 and not store.state['egg_inventory']
+    finally:
+        job.stop(5)
+
+
+def test_job_syncs_its_events_to_the_journal(tmp_path, make_store):
+    store = make_store(EGGS)
+    store.journal = Journal(str(tmp_path))
+    job = HatchJob(store, HatchQueue())
+    assert job.run_once(today=D + datetime.timedelta(days=26)) == 2
+    with open(store.journal.log_path, encoding='utf-8') as f:
+        assert f.read().count('"auto_hatch"') == 2
+    store.journal.close()
@@ -0,0 +1,36 @@
+import json
+
+from instrumentation import Instrumentation, percentile
+
+
+def test_ring_buffer_keeps_recent_samples_but_counts_all_calls():
+    timings = Instrumentation(capacity=10)
+    for i in range(1, 26):
+        timings.record('forecast', i / 1000)
+    stats = timings.stats()['forecast']
+    assert stats['calls'] == 25 and stats['samples'] == 10
+    # samples 16..25 ms remain
+    assert stats['p50'] == 0.020 and stats['p95'] == 0.025 and stats['last'] == 0.025
+    assert percentile([1, 2, 3, 4], 50) == 2
+
+
+def test_sections_decorators_and_switch():
+    timings = Instrumentation()
+
+    @timings.timed()
+    def helper(x):
+        return x * 2
+
+    assert helper(2) == 4
+    with timings.section('panel: orders'):
+        pass
+    timings.count('event: order')
+    timings.enabled = False
+    helper(3)
+    timings.count('event: order')
+    dump = json.loads(json.dumps(timings.dump()))
+    assert dump['sections']['helper']['calls'] == 1
+    assert set(dump['sections']) == {'helper', 'panel: orders'}
+    assert dump['counters'] == {'event: order': 1}
+    timings.reset()
+    assert timings.stats() == {}
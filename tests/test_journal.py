@@ -0,0 +1,72 @@
+import datetime
+
+import farm_state
+from farm_state import apply_event, new_state, payload_to_state, state_to_payload
+from journal import Journal
+
+
+def replay(journal):
+    payload, events = journal.recover()
+    state = payload_to_state(payload) if payload else new_state()
+    for event in events:
+        apply_event(state, event)
+    return state
+
+
+def test_events_mutate_state():
+    d = datetime.date(2024, 2, 1)
+    state = new_state()
+    apply_event(state, farm_state.egg_arrival(d, 100))
+    apply_event(state, farm_state.hatch_recorded(d, 'Shed', 20))
+    apply_event(state, farm_state.order_placed('A', 15, d))
+    apply_event(state, farm_state.order_collected(0, d))
+    apply_event(state, farm_state.sale_logged('Chick', 'B', 3, d))
+    apply_event(state, farm_state.auto_hatch(d, d + datetime.timedelta(weeks=3), 85))
+    assert dict(state['egg_inventory']) == {}
+    assert state['chicks_orders'][0]['picked_up'] is True
+    assert state['chicks_inventory'] == 20 - 15 - 3 + 85
+    assert [h['location'] for h in state['hatchery']] == ['Shed', 'Auto Hatch']
+    assert state['processed_hatch_dates'] == ['2024-02-01']
+
+
+def test_recover_replays_journal_tail_after_snapshot(tmp_path):
+    d = datetime.date(2024, 2, 1)
+    journal = Journal(str(tmp_path), batch_size=2)
+    state = new_state()
+    for event in [farm_state.egg_arrival(d, 10), farm_state.order_placed('A', 4, d)]:
+        apply_event(state, event)
+        journal.append(event)
+    journal.snapshot(state_to_payload(state))
+    for event in [farm_state.hatch_recorded(d, 'X', 7), farm_state.order_placed('B', 2, d)]:
+        apply_event(state, event)
+        journal.append(event)
+    journal.close()
+
+    recovered_journal = Journal(str(tmp_path))
+    recovered = replay(recovered_journal)
+    assert state_to_payload(recovered) == state_to_payload(state)
+    assert recovered_journal.seq == 4
+    # appends continue the sequence after recovery
+    assert recovered_journal.append(farm_state.egg_arrival(d, 1)) == 5
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    d = datetime.date(2024, 2, 1)
+    journal = Journal(str(tmp_path))
+    journal.append(farm_state.egg_arrival(d, 10))
+    journal.close()
+    with open(journal.log_path, 'a', encoding='utf-8') as f:
+        f.write('{"s":2,"t":"eg')
+    journal = Journal(str(tmp_path))
+    recovered = replay(journal)
+    assert recovered['egg_inventory'][d] == 10
+
+    # events written after the crash survive the next recovery
+    assert journal.append(farm_state.egg_arrival(d, 5)) == 2
+    journal.append(farm_state.order_placed('A', 3, d))
+    journal.close()
+    journal = Journal(str(tmp_path))
+    recovered = replay(journal)
+    assert recovered['egg_inventory'][d] == 15
+    assert len(recovered['chicks_orders']) == 1
+    assert journal.seq == 3
@@ -0,0 +1,36 @@
+import datetime
+
+import pytest
+
+from records import HatchRecord, Order, Sale, normalise_list
+
+
+def test_from_mapping_validates_and_parses_once():
+    o = Order.from_mapping({'name': 'A', 'order_count': '5', 'order_date': '2024-01-02'})
+    assert o.order_count == 5
+    assert o.order_date == datetime.date(2024, 1, 2)
+    assert o.pickup_date is None and o.picked_up is False
+    h = HatchRecord.from_mapping({'date': '2024-01-03', 'location': 'X', 'chicks': None})
+    assert h.chicks == 0
+    with pytest.raises(ValueError):
+        Sale.from_mapping({'type': 'Chick', 'name': 'B', 'count': -1, 'date': None})
+
+
+def test_records_keep_dict_style_access():
+    o = Order('A', 3, None)
+    o['pickup_date'] = datetime.date(2024, 1, 5)
+    assert o['pickup_date'] == o.pickup_date
+    assert o.get('missing', 7) == 7
+    assert o == {'name': 'A', 'order_count': 3, 'order_date': None,
+                 'pickup_date': datetime.date(2024, 1, 5), 'picked_up': False}
+    with pytest.raises(KeyError):
+        o['missing'] = 1
+    assert not hasattr(o, '__dict__')
+
+
+def test_normalise_list_replaces_dicts_in_place():
+    items = [{'name': 'A', 'order_count': 1, 'order_date': None}, Order('B', 2, None)]
+    second = items[1]
+    normalise_list(items, Order)
+    assert all(isinstance(o, Order) for o in items)
+    assert items[1] is second
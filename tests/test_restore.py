@@ -0,0 +1,48 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+import backups
+import exporter
+import restore
+from farm_state import state_to_payload
+
+
+def test_zip_round_trip(make_state):
+    state = make_state()
+    buf = io.BytesIO()
+    exporter.write_export_zip(state, buf, chunk_rows=7)
+    buf.seek(0)
+    assert state_to_payload(restore.restore_zip(buf)) == state_to_payload(state)
+
+
+def test_zip_with_wrong_count_is_rejected(make_state):
+    buf = io.BytesIO()
+    exporter.write_export_zip(make_state(), buf)
+    out = io.BytesIO()
+    with zipfile.ZipFile(buf) as src, zipfile.ZipFile(out, 'w') as dst:
+        for name in src.namelist():
+            data = src.read(name)
+            if name == 'meta.json':
+                meta = json.loads(data)
+                meta['counts']['chicks_orders.csv'] = 31
+                data = json.dumps(meta).encode()
+            dst.writestr(name, data)
+    out.seek(0)
+    with pytest.raises(restore.RestoreError, match='expected 31 rows, found 30'):
+        restore.restore_zip(out)
+
+
+def test_manifest_round_trip_and_missing_chunk(tmp_path, make_state):
+    d = str(tmp_path)
+    state = make_state()
+    path, _ = backups.create_backup(state, d, chunk_rows=8)
+    assert state_to_payload(restore.restore_backup(path, d)) == state_to_payload(state)
+
+    ref = backups.read_manifest(path)['tables']['chicks_orders.csv'][1]
+    os.remove(backups.chunk_store(d).path(ref['hash']))
+    with pytest.raises(restore.RestoreError, match='missing chunk'):
+        restore.restore_backup(path, d)
@@ -0,0 +1,82 @@
+import copy
+import datetime
+import random
+
+from allocation import allocate_fifo, build_availability, plan_fifo
+from farm_state import new_state, order_collected, order_placed
+from hatch_models import HatchModel, HatchModels
+from records import Order
+from scenarios import Scenario
+
+TODAY = datetime.date(2024, 6, 3)
+DAY = datetime.timedelta(days=1)
+EGGS = {TODAY - 10 * DAY: 100}
+ORDERS = [('Rudo', 50, TODAY - 20 * DAY), ('Tendai', 80, TODAY - 20 * DAY)]
+
+
+def test_plan_fifo_matches_allocate_fifo_without_mutating():
+    rng = random.Random(2)
+    availability = {TODAY + rng.randint(0, 30) * DAY: rng.randint(0, 50) for _ in range(20)}
+    orders = [Order(str(i), rng.randint(1, 40), TODAY + rng.randint(-5, 20) * DAY, None, rng.random() < 0.1)
+              for i in range(60)]
+    before = copy.deepcopy(orders)
+    plan = plan_fifo(orders, availability, TODAY)
+    assert orders == before
+    allocate_fifo(orders, availability, TODAY)
+    assert [(o.name, d) for o, d in plan] == [(o.name, o.pickup_date) for o in sorted(orders, key=lambda o: o.order_date)]
+
+
+def test_scenario_overlays_hypotheticals_without_touching_the_data(make_store):
+    store = make_store(EGGS, ORDERS)
+    version, state = store.view()
+    base = Scenario('Base', state, version)
+    now = base.forecast(TODAY)
+    rudo, tendai = state['chicks_orders']
+    assert now.dates[id(rudo)] == TODAY + 11 * DAY and now.dates[id(tendai)] is None
+
+    more = base.fork('More eggs')
+    more.add_eggs(TODAY - 10 * DAY, 100)
+    walk_in = more.add_order('Walk-in', 50, TODAY)
+    planned = more.forecast(TODAY)
+    assert planned.dates[id(tendai)] == TODAY + 11 * DAY
+    assert planned.dates[id(walk_in)] is None
+    assert (planned.open_orders, planned.filled) == (3, 2)
+    # FIFO: the earliest order takes the extra hatch and the walk-in gets what it freed
+    more.add_hatch(TODAY + 2 * DAY, 60)
+    planned = more.forecast(TODAY)
+    assert planned.dates[id(rudo)] == TODAY + 2 * DAY and planned.dates[id(walk_in)] == TODAY + 11 * DAY
+
+    # the base scenario, the real state and later real changes are unaffected
+    assert base.forecast(TODAY) is now and base.changes == [] and id(walk_in) not in now.dates
+    assert store.state['egg_inventory'] == {TODAY - 10 * DAY: 100}
+    assert len(store.state['chicks_orders']) == 2 and rudo.pickup_date is None
+    store.commit(order_placed('Later', 5, TODAY))
+    assert len(list(base.all_orders())) == 2
+    assert len(list(more.all_orders())) == 3
+
+
+def test_scenario_egg_source_uses_that_sources_model():
+    models = HatchModels({'Contract Farmer': HatchModel(0.5, 18, 0.0, 0.0)})
+    scenario = Scenario('s', new_state())
+    order = scenario.add_order('A', 60, TODAY)
+    scenario.add_eggs(TODAY, 100, 'Contract Farmer')
+    assert scenario.forecast(TODAY, models).dates[id(order)] is None
+    scenario.add_eggs(TODAY, 40)
+    forecast = scenario.forecast(TODAY, models)
+    assert forecast.dates[id(order)] == TODAY + 18 * DAY
+    assert build_availability(0, [], scenario.egg_inventory(), TODAY, models)[TODAY + 21 * DAY] == 119
+
+
+def test_orders_collected_after_the_fork_stay_open_in_the_scenario(make_store):
+    store = make_store(EGGS, ORDERS)
+    version, state = store.view()
+    scenario = Scenario('Before pickup', state, version)
+    rudo, tendai = state['chicks_orders']
+    store.commit(order_collected(0, TODAY))
+    assert rudo.picked_up
+    # the pinned inventory never had Rudo's chicks taken out, so Rudo still holds the hatch
+    forecast = scenario.forecast(TODAY)
+    assert forecast.dates[id(rudo)] == TODAY + 11 * DAY and forecast.dates[id(tendai)] is None
+    assert (forecast.open_orders, forecast.filled) == (2, 1)
+    assert [o.picked_up for o in scenario.all_orders()] == [False, False]
+    assert not scenario.fork('Copy').forecast(TODAY, split=True).dates[id(tendai)]
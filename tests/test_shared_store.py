@@ -0,0 +1,58 @@
+import datetime
+import threading
+
+import farm_state
+from farm_state import new_state
+from journal import Journal
+from shared_store import RWLock, SharedStore
+
+
+def test_concurrent_orders_are_not_lost(tmp_path):
+    store = SharedStore(new_state(), journal=Journal(str(tmp_path)))
+    today = datetime.date.today()
+
+    def place(prefix):
+        for i in range(200):
+            store.commit(farm_state.order_placed(f'{prefix}{i}', 1, today))
+
+    threads = [threading.Thread(target=place, args=(p,)) for p in 'ABCD']
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store.state['chicks_orders']) == 800
+    assert store.version == 800
+    _, events = Journal(str(tmp_path)).recover()
+    assert len(events) == 800
+
+
+def test_egg_inventory_is_copy_on_write():
+    store = SharedStore(new_state())
+    d = datetime.date(2024, 1, 1)
+    before = store.state['egg_inventory']
+    store.commit(farm_state.egg_arrival(d, 10))
+    assert store.state['egg_inventory'] is not before
+    assert d not in before
+    assert store.state['egg_inventory'][d] == 10
+
+
+def test_write_lock_excludes_readers_and_is_reentrant():
+    lock = RWLock()
+    seen = []
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+        reader = threading.Thread(target=lambda: (lock.acquire_read(), seen.append('read'), lock.release_read()))
+        reader.start()
+        reader.join(0.1)
+        assert seen == []
+    reader.join(1)
+    assert seen == ['read']
+
+
+def test_replace_bumps_version():
+    store = SharedStore(new_state())
+    version, view = store.view()
+    assert version == 0
+    assert store.replace(new_state()) == 1
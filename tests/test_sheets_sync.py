@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from farm_state import state_to_payload
+from records import Order
+from sheets_sync import FakeSheetTransport, RateLimitError, SheetsSync, changed_ranges
+
+
+def test_changed_ranges_groups_runs_and_blanks_the_tail():
+    old = [['h'], ['a'], ['b'], ['c'], ['d'], ['e']]
+    new = [['h'], ['a'], ['B'], ['C'], ['d']]
+    assert changed_ranges(old, new) == [(3, [['B'], ['C']]), (6, [['']])]
+
+
+def test_second_sync_sends_only_changed_rows_in_one_call(make_state):
+    fake = FakeSheetTransport()
+    sync = SheetsSync(fake)
+    state = make_state(50)
+    first = sync.sync(state)
+    assert first['calls'] == 1
+    fake.calls.clear()
+
+    state['chicks_orders'][20].pickup_date = datetime.date(2024, 1, 22)
+    state['chicks_orders'][20].picked_up = True
+    state['chicks_orders'].append(Order('new', 1, None))
+    stats = sync.sync(state)
+    assert fake.calls == [('batch_update', 2)]
+    assert stats == {'rows': 2, 'ranges': 2, 'calls': 1}
+
+    assert state_to_payload(SheetsSync(fake).load()) == state_to_payload(state)
+
+
+def test_rate_limits_back_off_then_give_up(make_state):
+    waits = []
+    fake = FakeSheetTransport(throttle=3)
+    sync = SheetsSync(fake, max_retries=3, sleep=waits.append)
+    sync.sync(make_state(3))
+    assert len(waits) == 3 and waits[0] < waits[1] < waits[2]
+
+    fake.throttle = 10
+    with pytest.raises(RateLimitError):
+        SheetsSync(fake, max_retries=2, sleep=lambda s: None).sync(make_state(3))
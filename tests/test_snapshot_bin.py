@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import snapshot_bin
+from farm_state import state_to_payload
+from records import HatchRecord
+
+
+def test_round_trip_and_interned_strings(tmp_path, make_state):
+    path = str(tmp_path / 'data.farmsnap')
+    state = make_state(3)
+    state['hatchery'].append(HatchRecord(state['hatchery'][0].date, None, 5))
+    state['sales'][0].name = 'c0'
+    snapshot_bin.write_snapshot(state, path)
+    assert state_to_payload(snapshot_bin.load_snapshot(path)) == state_to_payload(state)
+    with snapshot_bin.SnapshotFile(path) as snap:
+        # strings are interned: 'c0' is stored once, None not at all
+        assert len(snap._strings) == 5
+        orders = snap.to_state()['chicks_orders']
+        assert len(orders) == 3 and orders[1] == state['chicks_orders'][1]
+        # each distinct name was decoded once and is shared by its records
+        assert orders[0].name is snap.to_state()['sales'][0].name
+
+
+def test_json_conversion_both_ways(tmp_path, make_state):
+    src = tmp_path / 'data.json'
+    src.write_text(json.dumps(state_to_payload(make_state())))
+    snapshot_bin.json_to_snapshot(str(src), str(tmp_path / 'data.farmsnap'))
+    snapshot_bin.snapshot_to_json(str(tmp_path / 'data.farmsnap'), str(tmp_path / 'back.json'))
+    assert json.loads((tmp_path / 'back.json').read_text()) == json.loads(src.read_text())
+
+
+def test_rejects_truncated_and_foreign_files(tmp_path, make_state):
+    path = tmp_path / 'data.farmsnap'
+    snapshot_bin.write_snapshot(make_state(), str(path))
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError, match='expected'):
+        snapshot_bin.load_snapshot(str(path))
+    path.write_bytes(b'{"egg_inventory": {}}' + b' ' * 64)
+    with pytest.raises(ValueError, match='Not a farm snapshot'):
+        snapshot_bin.load_snapshot(str(path))
@@ -0,0 +1,56 @@
+import pytest
+
+import sqlite_store
+from records import Order, Sale
+from sqlite_store import SQLiteStore
+
+
+def test_round_trip(tmp_path, make_state):
+    path = str(tmp_path / 'farm.db')
+    state = make_state(3)
+    store = SQLiteStore(path)
+    store.save(state)
+    store.close()
+    loaded = SQLiteStore(path).load()
+    assert loaded['egg_inventory'] == state['egg_inventory']
+    assert loaded['hatchery'] == state['hatchery']
+    assert loaded['chicks_orders'] == state['chicks_orders']
+    assert loaded['chicks_orders'][1]['picked_up'] is True
+    assert loaded['chicks_inventory'] == 7
+    assert loaded['sales'] == state['sales']
+    assert loaded['processed_hatch_dates'] == ['2023-12-01']
+    assert SQLiteStore(path).load(['chicks_inventory', 'sales']) == {'chicks_inventory': 7, 'sales': state['sales']}
+
+
+def test_save_writes_only_changed_rows(tmp_path, make_state):
+    store = SQLiteStore(str(tmp_path / 'farm.db'))
+    state = make_state(3)
+    assert store.save(state) > 0
+    assert store.save(state) == 0
+    state['chicks_orders'][0]['picked_up'] = True
+    state['sales'].append({'type': 'Cock', 'name': 'D', 'count': 1, 'date': None})
+    assert store.save(state) == 2
+    # a fresh connection diffs against what is already on disk
+    assert SQLiteStore(store.path).save(state) == 0
+
+
+def test_failed_save_is_written_in_full_on_retry(tmp_path, make_state, monkeypatch):
+    store = SQLiteStore(str(tmp_path / 'farm.db'))
+    state = make_state(1)
+    store.save(state)
+    state['chicks_orders'].append(Order('c1', 2, None))
+    state['sales'].append(Sale('Cock', 'D', 1, None))
+    rows = sqlite_store.state_rows
+
+    def fail_on_sales(state, table):
+        if table == 'sales':
+            raise RuntimeError('disk gone')
+        return rows(state, table)
+
+    monkeypatch.setattr(sqlite_store, 'state_rows', fail_on_sales)
+    with pytest.raises(RuntimeError):
+        store.save(state)
+    monkeypatch.setattr(sqlite_store, 'state_rows', rows)
+    assert store.save(state) == 2
+    loaded = SQLiteStore(store.path).load()
+    assert len(loaded['chicks_orders']) == 2 and len(loaded['sales']) == 2
@@ -0,0 +1,49 @@
+import datetime
+
+import numpy as np
+
+import tables
+from records import Order
+
+
+def _orders():
+    d = datetime.date(2024, 3, 1)
+    return [Order(f"c{i}", i + 1, d + datetime.timedelta(days=i),
+                  None if i % 3 == 0 else d + datetime.timedelta(days=30 - i)) for i in range(10)]
+
+
+def test_select_filters_dates_and_sorts_with_none_last():
+    orders = _orders()
+    assert tables.select(orders) is orders
+    start, end = datetime.date(2024, 3, 3), datetime.date(2024, 3, 6)
+    assert [o.name for o in tables.select(orders, 'order_date', start, end)] == ['c2', 'c3', 'c4', 'c5']
+    # records without the date only drop out when a range is set
+    assert len(tables.select(orders, 'pickup_date', start=datetime.date(2024, 1, 1))) == 6
+    by_pickup = tables.select(orders, sort_field='pickup_date')
+    assert [o.name for o in by_pickup[:3]] == ['c8', 'c7', 'c5']
+    assert all(o.pickup_date is None for o in by_pickup[-4:])
+    assert tables.select(orders, sort_field='order_count', descending=True)[0].name == 'c9'
+    assert [o.name for o in tables.select(orders, predicate=lambda o: o.order_count > 8)] == ['c8', 'c9']
+
+
+def test_page_clamps_number_and_size():
+    items = list(range(23))
+    assert tables.page(items, 1, 10) == (list(range(10)), 1, 3)
+    assert tables.page(items, 3, 10) == ([20, 21, 22], 3, 3)
+    assert tables.page(items, 99, 10) == ([20, 21, 22], 3, 3)
+    assert tables.page(items, 0, 10)[1] == 1
+    assert tables.page([], 5, 10) == ([], 1, 1)
+    rows, _, pages = tables.page(list(range(1000)), 1, 10 ** 6)
+    assert len(rows) == tables.ROW_CAP and pages == 4
+
+
+def test_page_columns_filters_by_date():
+    d = datetime.date(2024, 1, 1)
+    dates = [d + datetime.timedelta(days=i) for i in range(30)]
+    columns = {"Date": dates, "Count": np.arange(30)}
+    data, number, pages, total = tables.page_columns(columns, 2, 25)
+    assert (number, pages, total) == (2, 2, 30)
+    assert data["Date"] == dates[25:] and list(data["Count"]) == [25, 26, 27, 28, 29]
+    data, number, pages, total = tables.page_columns(columns, 1, 25, "Date", dates[10], dates[12])
+    assert total == 3 and list(data["Count"]) == [10, 11, 12]
+    assert tables.page_columns({"Date": []}, 1, 25) == ({"Date": []}, 1, 1, 0)